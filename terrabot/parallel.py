@@ -0,0 +1,34 @@
+"""Fanning tasks over whole games out to worker processes, for the self-play and log replay
+runners.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Iterator, List, Sequence, TypeVar
+
+from terrabot.sim.data.maps import DEFAULT_MAP
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def _initialize_worker():
+    # Build the map's lookup tables once per process rather than during the first game
+    DEFAULT_MAP.index
+
+
+def split_tasks(items: Sequence[T], items_per_task: int) -> List[Sequence[T]]:
+    return [items[i:i + items_per_task] for i in range(0, len(items), items_per_task)]
+
+
+def run_tasks(
+        function: Callable[..., List[R]],
+        tasks: Iterable[Sequence[T]],
+        *args: Any,
+        num_workers: int = None) -> Iterator[R]:
+    """Call function(task, *args) for each task over a pool of num_workers processes (by default
+    one per core), yielding the results of each task as soon as it finishes. Results arrive in
+    completion order. The function and its arguments must be picklable.
+    """
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_initialize_worker) as executor:
+        futures = [executor.submit(function, x, *args) for x in tasks]
+        for future in as_completed(futures):
+            yield from future.result()
@@ -0,0 +1,100 @@
+"""Replay recorded game logs through the simulator, fanned out over worker processes.
+
+Each log (see terrabot.sim.notation) is parsed and played one line at a time, so a log is never
+held in memory whole, and a log which the simulator rejects is reported with the line at fault
+rather than stopping the run. Only paths go to the workers and only small ReplayResults come back.
+
+Usage:
+    python -m terrabot.replay logs/ --workers 64
+"""
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from terrabot.parallel import run_tasks, split_tasks
+from terrabot.sim.action import Phase
+from terrabot.sim.notation import read_game
+
+
+@dataclass(frozen=True)
+class ReplayResult:
+    path: str
+    num_moves: int # moves replayed successfully
+    completed: bool # True if the log played through to Phase.OVER
+    error: str # None if every line was replayed
+    duration: float # seconds
+
+
+def replay_log(path: str) -> ReplayResult:
+    start = time.perf_counter()
+    num_moves = 0
+    completed = False
+    error = None
+    try:
+        with open(path) as file:
+            game_state, moves = read_game(file)
+            for _, game_state in moves:
+                num_moves += 1
+        completed = game_state.phase == Phase.OVER
+    except (OSError, ValueError) as e:
+        error = str(e)
+    return ReplayResult(path, num_moves, completed, error, time.perf_counter() - start)
+
+
+def _replay_logs(paths: Sequence[str]) -> List[ReplayResult]:
+    return [replay_log(x) for x in paths]
+
+
+def find_logs(paths: Iterable[str]) -> Tuple[str, ...]:
+    """The given files, and every file in the given directories, recursively, in sorted order."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, filenames in os.walk(path):
+                found.extend(os.path.join(directory, x) for x in filenames)
+        else:
+            found.append(path)
+    return tuple(sorted(found))
+
+
+def replay_logs(
+        paths: Sequence[str],
+        num_workers: int = None,
+        logs_per_task: int = 16) -> Iterator[ReplayResult]:
+    """Replay every log over a pool of num_workers processes (by default one per core), yielding
+    each ReplayResult as soon as its task finishes. Results arrive in completion order.
+    """
+    return run_tasks(_replay_logs, split_tasks(paths, logs_per_task), num_workers=num_workers)
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description="Replay game logs and report the throughput.")
+    parser.add_argument("paths", nargs="+", help="log files, or directories of them")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--logs-per-task", type=int, default=16)
+    parser.add_argument("--show-errors", action="store_true")
+    args = parser.parse_args(argv)
+
+    paths = find_logs(args.paths)
+    start = time.perf_counter()
+    num_completed = 0
+    num_moves = 0
+    errors = []
+    for result in replay_logs(paths, args.workers, args.logs_per_task):
+        num_completed += result.completed
+        num_moves += result.num_moves
+        if result.error is not None:
+            errors.append(f"{result.path}: {result.error}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} games ({num_completed} completed, {len(errors)} failed), "
+            f"{num_moves} moves in {elapsed:.2f}s: {len(paths) / elapsed:.1f} games/s, "
+            f"{num_moves / elapsed:.0f} moves/s")
+    if args.show_errors:
+        for error in sorted(errors):
+            print(error)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Self-play: whole games played end to end by a policy, fanned out over worker processes.
+
+Each game is identified by its own seed, and everything random about the game (turn order, the
+setup, and the policy's choices) is derived from that seed alone. A game therefore plays out the
+same way whichever worker runs it and whatever else that worker ran before. Game seeds are derived
+from (batch seed, game index) with util.derive_seed(), so a batch can be split into shards by
+index range across processes or machines, and any single game regenerated without replaying the
+rest of its batch.
+
+Only seeds go to the workers and only small GameResults come back, so the work per task is a whole
+game and the inter-process traffic is a few hundred bytes. Games are independent and share nothing,
+so throughput should grow with the number of worker processes until they outnumber the cores, but
+this has only been measured on a single core and how far it scales is unverified.
+
+Usage:
+    python -m terrabot.selfplay --games 1000 --workers 64
+"""
+import argparse
+import time
+from dataclasses import dataclass
+from random import Random
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+from terrabot.parallel import run_tasks, split_tasks
+from terrabot.sim.action import ActionExecution, Phase, get_required_conversions
+from terrabot.sim.game import KEEP_NO_HISTORY, GameState, Setup
+from terrabot.sim.player import PlayerMetadata
+from terrabot.util import create_rng, derive_seed
+
+# Games which haven't ended after this many plies are abandoned, e.g. if a policy never passes
+MAX_PLIES = 5000
+
+Policy = Callable[[GameState, Random], ActionExecution]
+
+
+def random_policy(game_state: GameState, rng: Random) -> ActionExecution:
+    return rng.choice(game_state.get_available_executions())
+
+
+@dataclass(frozen=True)
+class GameResult:
+    seed: int
+    factions: Tuple[str, ...] # by initial turn position
+    victory_points: Tuple[int, ...] # by initial turn position
+    num_plies: int
+    completed: bool # False if the game was abandoned before Phase.OVER
+    duration: float # seconds
+
+    def get_winners(self) -> Tuple[int, ...]:
+        """Initial turn positions of the players with the most victory points."""
+        best = max(self.victory_points)
+        return tuple(i for i, x in enumerate(self.victory_points) if x == best)
+
+
+def play_game(
+        seed: int,
+        num_players: int = 4,
+        policy: Policy = random_policy,
+        max_plies: int = MAX_PLIES) -> GameResult:
+    """Play one game from a random setup to the end, with every player using the policy. Leech is
+    accepted or declined at random, and the cheapest conversions are made to pay for each action.
+    """
+    start = time.perf_counter()
+
+    # Separate streams, so that e.g. changing the policy doesn't change the setup
+    setup_rng = create_rng(seed, "setup")
+    rng = create_rng(seed, "policy")
+
+    player_metadata = tuple(PlayerMetadata(f"player{i}") for i in range(num_players))
+    # Nothing looks back at earlier states, so don't keep them alive
+    game_state = GameState.create(
+            player_metadata, setup=Setup.create_random_setup(num_players, setup_rng), rng=setup_rng,
+            history_policy=KEEP_NO_HISTORY)
+
+    num_plies = 0
+    while game_state.phase != Phase.OVER and num_plies < max_plies:
+        if not game_state.get_available_actions():
+            break
+        execution = policy(game_state, rng)
+        leech_decisions = ()
+        conversions = ()
+        if game_state.phase == Phase.TURN:
+            num_leech = len(game_state.active_player.player_state.leech_opportunities)
+            leech_decisions = tuple(rng.random() < 0.5 for _ in range(num_leech))
+            prepared_state = game_state.apply_pre_action_changes(leech_decisions) \
+                    if leech_decisions else game_state
+            conversions = get_required_conversions(prepared_state, execution)
+            if conversions is None:
+                # The points paid for leech left too few to convert into coins
+                leech_decisions = (False,) * num_leech
+                conversions = get_required_conversions(game_state, execution)
+        game_state = game_state.submit(execution, leech_decisions, conversions)
+        num_plies += 1
+
+    return GameResult(
+            seed = seed,
+            factions = tuple(x.faction.name if x.faction is not None else None
+                    for x in game_state.players),
+            victory_points = tuple(x.player_state.resources.victory_points
+                    if x.player_state is not None else 0 for x in game_state.players),
+            num_plies = num_plies,
+            completed = game_state.phase == Phase.OVER,
+            duration = time.perf_counter() - start)
+
+
+def _play_games(seeds: Sequence[int], num_players: int, policy: Policy, max_plies: int) \
+        -> List[GameResult]:
+    return [play_game(x, num_players, policy, max_plies) for x in seeds]
+
+
+def get_game_seed(batch_seed: int, game_index: int) -> int:
+    return derive_seed(batch_seed, game_index)
+
+
+def get_game_seeds(batch_seed: int, num_games: int, first_game_index: int = 0) -> Tuple[int, ...]:
+    return tuple(get_game_seed(batch_seed, i)
+            for i in range(first_game_index, first_game_index + num_games))
+
+
+def run_self_play(
+        num_games: int,
+        seed: int = 0,
+        first_game_index: int = 0,
+        num_players: int = 4,
+        num_workers: int = None,
+        games_per_task: int = 1,
+        policy: Policy = random_policy,
+        max_plies: int = MAX_PLIES) -> Iterator[GameResult]:
+    """Play games first_game_index to first_game_index + num_games - 1 of the batch with the given
+    seed over a pool of num_workers processes (by default one per core), yielding each GameResult
+    as soon as its task finishes. Results arrive in completion order, not seed order.
+
+    The policy must be picklable, i.e. a module level function. Raising games_per_task reduces
+    the per-task overhead for very fast policies, at the cost of coarser streaming.
+    """
+    seeds = get_game_seeds(seed, num_games, first_game_index)
+    return run_tasks(_play_games, split_tasks(seeds, games_per_task), num_players, policy,
+            max_plies, num_workers=num_workers)
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description="Play random self-play games in parallel.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--games-per-task", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--first-game", type=int, default=0,
+            help="index of the first game of the batch to play, to split a batch into shards")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    num_completed = 0
+    num_plies = 0
+    for result in run_self_play(args.games, args.seed, args.first_game, args.players,
+            args.workers, args.games_per_task):
+        num_completed += result.completed
+        num_plies += result.num_plies
+    elapsed = time.perf_counter() - start
+    print(f"{args.games} games ({num_completed} completed), {num_plies} plies "
+            f"in {elapsed:.2f}s: {args.games / elapsed:.1f} games/s, "
+            f"{num_plies / elapsed:.0f} plies/s")
+
+
+if __name__ == "__main__":
+    main()
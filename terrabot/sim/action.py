@@ -2,16 +2,22 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from enum import Enum, auto
-from typing import Tuple
+from typing import Iterator, List, Optional, Sequence, Tuple
 
 from frozendict import frozendict
 
-from terrabot.sim.cult import CultDelta
-from terrabot.sim.map import Terrain
+from terrabot.sim.batch import get_affordable_costs
+from terrabot.sim.bitboard import TERRAINS, Bitboard
+from terrabot.sim.cult import NO_CULT_STEPS, Cult, CultDelta
+from terrabot.sim.data.factions import FACTIONS
+from terrabot.sim.event import EventType
+from terrabot.sim.leech import get_leech_opportunities
+from terrabot.sim.map import Terrain, get_terrain_distance
 from terrabot.sim.player import Faction
-from terrabot.sim.resource import ResourceDelta, Conversion, LeechOpportunity
-from terrabot.sim.structure import Structure
-from terrabot.sim.tile import Tile
+from terrabot.sim.resource import NO_RESOURCES, ResourceDelta, Conversion
+from terrabot.sim.structure import STRUCTURE_LIMITS, Structure, StructureType
+from terrabot.sim.tile import Tile, TileType
+from terrabot.util import count_bits, iterate_bits
 
 class Phase(Enum):
     SELECT_FACTION = auto()
@@ -30,6 +36,9 @@ class Phase(Enum):
     CULT_TRACK_DECISION = auto()
 
 
+FINAL_ROUND = 6
+
+
 @dataclass
 class Step:
     """A Step represents one set of changes that receives a LogEntry and an iteration of the
@@ -37,16 +46,23 @@ class Step:
     """
     description: str
     passed: bool = False
-    resource_delta: ResourceDelta = ResourceDelta()
+    resource_delta: ResourceDelta = NO_RESOURCES
     new_structures: Tuple[Structure, ...] = ()
+    terrain_changes: frozendict = frozendict() # map by location_id
     new_tiles: Tuple[Tile, ...] = ()
     returned_tile: Tile = None
-    cult_delta: CultDelta = CultDelta()
+    cult_delta: CultDelta = NO_CULT_STEPS
+    # Steps of the space beside the track in cult_delta which the player's priest now occupies
+    priest_space: int = 0
+    dig_level_delta: int = 0
+    ship_level_delta: int = 0
 
     new_leech_opportunities: frozendict = frozendict() # map by player_id
     new_cultist_steps: frozendict = frozendict() # map by player_id
     new_town_tile_decisions: int = 0
     new_favor_tile_decisions: int = 0
+    new_cult_key_decisions: int = 0
+    new_bonus_spade_decisions: int = 0
 
     action_slot_expended: str = None # by action_id
 
@@ -76,13 +92,211 @@ class Action(ABC):
     The action may have multiple options or versions. For example, the "BON1 (spd)" Action allows
     digging on any adjacent Hex. "BON1 (spd) H8, build D" would be an ActionExecution based on that
     Action.
+
+    Executions are offered if the active player can pay their cost, possibly after converting
+    resources. The conversions aren't part of the execution, see get_required_conversions().
     """
     action_id: str
 
     #@abstractmethod
-    def get_available_executions(self, game_state: 'GameState') -> Tuple["Action", ...]:
+    def get_available_executions(self, game_state: 'GameState') -> Iterator[ActionExecution]:
+        """Yield each available execution, most promising first."""
         raise NotImplementedError
 
+    def count_available_executions(self, game_state: 'GameState') -> int:
+        """Equivalent to counting get_available_executions(), which subclasses may override with
+        something that doesn't construct each ActionExecution.
+        """
+        return sum(1 for _ in self.get_available_executions(game_state))
+
+
+# Colour names used by the usual game log notation, e.g. "transform F3 to blue"
+_TERRAIN_COLOURS = frozendict({
+    Terrain.DESERT: "yellow",
+    Terrain.FIELD: "brown",
+    Terrain.SWAMP: "black",
+    Terrain.LAKE: "blue",
+    Terrain.FOREST: "green",
+    Terrain.MOUNTAIN: "gray",
+    Terrain.WASTELAND: "red"})
+
+_STRUCTURE_ABBREVIATIONS = frozendict({
+    StructureType.DWELLING: "D",
+    StructureType.TRADING_POST: "TP",
+    StructureType.TEMPLE: "TE",
+    StructureType.SANCTUARY: "SA",
+    StructureType.STRONGHOLD: "SH",
+    StructureType.BRIDGE: "BR"})
+
+_BUILD_EVENTS = frozendict({
+    StructureType.DWELLING: EventType.BUILD_DWELLING,
+    StructureType.TRADING_POST: EventType.BUILD_TRADING_POST,
+    StructureType.TEMPLE: EventType.BUILD_TEMPLE,
+    StructureType.SANCTUARY: EventType.BUILD_SANCTUARY,
+    StructureType.STRONGHOLD: EventType.BUILD_STRONGHOLD})
+
+
+def get_event_resources(game_state: 'GameState', event_type: EventType, count: int = 1) \
+        -> ResourceDelta:
+    """Resources the active player receives from the current round tile and their own tiles and
+    faction when an event happens count times.
+    """
+    resources = game_state.active_player.player_state.event_resources.get(event_type)
+    if resources is None or not count:
+        return NO_RESOURCES
+    return resources if count == 1 else resources * count
+
+
+def get_affordable(game_state: 'GameState', costs: Sequence[ResourceDelta]) -> List[bool]:
+    """Whether the active player could pay each cost, possibly after conversions. Most costs are
+    settled by the batch check, and the conversion planner is only consulted for the rest.
+    """
+    player = game_state.active_player
+    resources = player.player_state.resources
+    return [ok or resources.could_afford(cost, player.faction)[0]
+            for ok, cost in zip(get_affordable_costs(resources, costs), costs)]
+
+
+def get_required_conversions(game_state: 'GameState', execution: ActionExecution) \
+        -> Optional[Tuple[Conversion, ...]]:
+    """The cheapest conversions which let the active player pay for the execution, or None if they
+    can't pay for it at all.
+    """
+    player = game_state.active_player
+    resources = player.player_state.resources
+    if get_affordable_costs(resources, (execution.cost,))[0]:
+        return ()
+    return resources.could_afford(execution.cost, player.faction)[1]
+
+
+def _has_neighbours(board: Bitboard, player_id: str, hex_id: int) -> bool:
+    """Whether another player has a structure directly next to the hex."""
+    others = board.occupied & ~board.for_player(player_id).occupied
+    return bool(board.get_neighbourhood_mask(hex_id) & others)
+
+
+def _count_structures(board: Bitboard, player_id: str, structure_type: StructureType) -> int:
+    player = board.for_player(player_id)
+    if structure_type == StructureType.BRIDGE:
+        return count_bits(player.bridges)
+    return count_bits(player.get_structure_mask(structure_type))
+
+
+def _get_player_action_slot(action_id: str, player_id: str) -> str:
+    """Slots of actions on a player's own tiles are expended per player, since e.g. several players
+    may each have a copy of FAV6.
+    """
+    return f"{action_id}/{player_id}"
+
+
+def _get_build_steps(game_state: 'GameState', structure: Structure) \
+        -> Tuple[ResourceDelta, frozendict]:
+    """The event resources and leech opportunities resulting from a new or upgraded structure."""
+    board = game_state.board
+    resources = get_event_resources(game_state, _BUILD_EVENTS[structure.structure_type])
+    leech_opportunities = get_leech_opportunities(
+            board, game_state.active_player_id, board.get_hex_id(structure.location))
+    return resources, leech_opportunities
+
+
+#------------------------------------
+# Transforming terrain, with or without free spades
+@dataclass
+class _TransformOption:
+    from_terrain: Terrain
+    to_terrain: Terrain
+    build_dwelling: bool
+    cost: ResourceDelta
+
+
+def _get_transformable_mask(game_state: 'GameState') -> int:
+    """Unoccupied land the active player could reach."""
+    player = game_state.active_player
+    board = game_state.board
+    shipping = player.faction.get_shipping(player.player_state)
+    return board.get_reachable_mask(player.player_id, shipping) \
+            & board.map_index.land_mask & ~board.occupied
+
+
+def _get_transform_options(
+        game_state: 'GameState',
+        free_spades: int = 0,
+        base_cost: ResourceDelta = NO_RESOURCES) -> List[_TransformOption]:
+    """Every affordable way of transforming (and possibly building on) a hex of each terrain, with
+    the options which build a dwelling first and otherwise fewest spades first. Which hexes each
+    option applies to only depends on the hex's terrain.
+    """
+    player = game_state.active_player
+    faction = player.faction
+    player_state = player.player_state
+    spade_cost = faction.get_dig_cost(player_state)
+    can_build = _count_structures(game_state.board, player.player_id, StructureType.DWELLING) \
+            < STRUCTURE_LIMITS[StructureType.DWELLING]
+
+    options = []
+    for from_terrain in TERRAINS:
+        if from_terrain == Terrain.RIVER:
+            continue
+        for to_terrain in TERRAINS:
+            if to_terrain == Terrain.RIVER:
+                continue
+            spades = get_terrain_distance(from_terrain, to_terrain)
+            if free_spades and not spades:
+                continue
+            cost = base_cost + spade_cost * max(0, spades - free_spades)
+            if to_terrain == faction.home_terrain and can_build:
+                options.append(_TransformOption(
+                        from_terrain, to_terrain, True, cost + faction.dwelling_cost))
+            if spades:
+                options.append(_TransformOption(from_terrain, to_terrain, False, cost))
+
+    affordable = get_affordable(game_state, [x.cost for x in options])
+    options = [x for x, ok in zip(options, affordable) if ok]
+    options.sort(key = lambda x: (
+            not x.build_dwelling, get_terrain_distance(x.from_terrain, x.to_terrain)))
+    return options
+
+
+def _iterate_transform_executions(
+        game_state: 'GameState',
+        free_spades: int = 0,
+        base_cost: ResourceDelta = NO_RESOURCES,
+        action_slot: str = None) -> Iterator["TransformAndBuildActionExecution"]:
+    board = game_state.board
+    location_ids = board.map_index.location_ids
+    transformable = _get_transformable_mask(game_state)
+    if not transformable:
+        return
+    for option in _get_transform_options(game_state, free_spades, base_cost):
+        mask = transformable & board.get_terrain_mask(option.from_terrain)
+        for hex_id in iterate_bits(mask):
+            yield TransformAndBuildActionExecution(
+                    cost = option.cost,
+                    location = location_ids[hex_id],
+                    new_terrain = option.to_terrain \
+                            if option.to_terrain != option.from_terrain else None,
+                    build_dwelling = option.build_dwelling,
+                    free_spades = free_spades,
+                    action_slot = action_slot)
+
+
+def _count_transform_executions(
+        game_state: 'GameState',
+        free_spades: int = 0,
+        base_cost: ResourceDelta = NO_RESOURCES) -> int:
+    board = game_state.board
+    transformable = _get_transformable_mask(game_state)
+    if not transformable:
+        return 0
+    counts = {}
+    total = 0
+    for option in _get_transform_options(game_state, free_spades, base_cost):
+        if option.from_terrain not in counts:
+            counts[option.from_terrain] = \
+                    count_bits(transformable & board.get_terrain_mask(option.from_terrain))
+        total += counts[option.from_terrain]
+    return total
+
 
 #------------------------------------
 # Always available actions
@@ -92,29 +306,244 @@ class TransformAndBuildActionExecution(ActionExecution):
     new_terrain: Terrain = None
     build_dwelling: bool = False
 
+    # Spades provided by a power or tile action, and that action's slot
+    free_spades: int = 0
+    action_slot: str = None
+
+    def compute(self, game_state: 'GameState') -> Step:
+        board = game_state.board
+        hex_id = board.get_hex_id(self.location)
+        if board.occupied & (1 << hex_id):
+            raise ValueError(f"Hex {self.location} is occupied")
+
+        lines = []
+        if self.action_slot is not None:
+            lines.append(f"action {self.action_slot.split('/')[0]}")
+        resource_delta = -self.cost
+        terrain_changes = frozendict()
+        if self.new_terrain is not None:
+            spades = get_terrain_distance(board.get_terrain(hex_id), self.new_terrain)
+            resource_delta = resource_delta + get_event_resources(game_state, EventType.DIG, spades)
+            terrain_changes = frozendict({self.location: self.new_terrain})
+            lines.append(f"transform {self.location} to {_TERRAIN_COLOURS[self.new_terrain]}")
+
+        new_structures = ()
+        leech_opportunities = frozendict()
+        if self.build_dwelling:
+            structure = Structure(StructureType.DWELLING, self.location)
+            build_resources, leech_opportunities = _get_build_steps(game_state, structure)
+            resource_delta = resource_delta + build_resources
+            new_structures = (structure,)
+            lines.append(f"build {self.location}")
+
+        return Step(
+                description = ". ".join(lines),
+                resource_delta = resource_delta,
+                new_structures = new_structures,
+                terrain_changes = terrain_changes,
+                new_leech_opportunities = leech_opportunities,
+                action_slot_expended = self.action_slot)
+
+
 @dataclass
 class TransformAndBuildAction(Action):
-    pass
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[TransformAndBuildActionExecution]:
+        return _iterate_transform_executions(game_state)
+
+    def count_available_executions(self, game_state: 'GameState') -> int:
+        return _count_transform_executions(game_state)
+
+
+@dataclass
+class AdvanceDigActionExecution(ActionExecution):
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = "advance dig",
+                resource_delta = ResourceDelta(victory_points=6) - self.cost,
+                dig_level_delta = 1)
+
 
 @dataclass
 class AdvanceDigAction(Action):
-    pass
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[AdvanceDigActionExecution]:
+        player = game_state.active_player
+        faction = player.faction
+        cost = faction.dig_advance_cost
+        if player.player_state.dig_level < faction.max_dig_level \
+                and get_affordable(game_state, (cost,))[0]:
+            yield AdvanceDigActionExecution(cost)
+
+
+@dataclass
+class AdvanceShipActionExecution(ActionExecution):
+    def compute(self, game_state: 'GameState') -> Step:
+        new_level = game_state.active_player.player_state.ship_level + 1
+        return Step(
+                description = "advance ship",
+                resource_delta = ResourceDelta(victory_points=new_level + 1) - self.cost,
+                ship_level_delta = 1)
+
 
 @dataclass
 class AdvanceShipAction(Action):
-    pass
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[AdvanceShipActionExecution]:
+        player = game_state.active_player
+        faction = player.faction
+        cost = faction.shipping_advance_cost
+        if player.player_state.ship_level < faction.max_ship_level \
+                and get_affordable(game_state, (cost,))[0]:
+            yield AdvanceShipActionExecution(cost)
+
+
+@dataclass
+class UpgradeStructureActionExecution(ActionExecution):
+    location: str # by location_id
+    structure_type: StructureType
+
+    def compute(self, game_state: 'GameState') -> Step:
+        structure = Structure(self.structure_type, self.location)
+        build_resources, leech_opportunities = _get_build_steps(game_state, structure)
+        favor_tiles = 1 if self.structure_type in _FAVOR_TILE_STRUCTURES else 0
+        return Step(
+                description = f"upgrade {self.location} to "
+                        + _STRUCTURE_ABBREVIATIONS[self.structure_type],
+                resource_delta = build_resources - self.cost,
+                new_structures = (structure,),
+                new_leech_opportunities = leech_opportunities,
+                new_favor_tile_decisions = favor_tiles)
+
+
+_FAVOR_TILE_STRUCTURES = (StructureType.TEMPLE, StructureType.SANCTUARY)
+
+# (from, to) in bot-friendly order
+_UPGRADES = (
+        (StructureType.TRADING_POST, StructureType.STRONGHOLD),
+        (StructureType.TEMPLE, StructureType.SANCTUARY),
+        (StructureType.TRADING_POST, StructureType.TEMPLE),
+        (StructureType.DWELLING, StructureType.TRADING_POST))
+
 
 @dataclass
 class UpgradeStructureAction(Action):
-    pass
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[UpgradeStructureActionExecution]:
+        location_ids = game_state.board.map_index.location_ids
+        for hex_id, to_type, cost in self._iterate_upgrades(game_state):
+            yield UpgradeStructureActionExecution(cost, location_ids[hex_id], to_type)
+
+    def count_available_executions(self, game_state: 'GameState') -> int:
+        return sum(1 for _ in self._iterate_upgrades(game_state))
+
+    def _iterate_upgrades(self, game_state: 'GameState') \
+            -> Iterator[Tuple[int, StructureType, ResourceDelta]]:
+        player = game_state.active_player
+        faction = player.faction
+        board = game_state.board
+        player_board = board.for_player(player.player_id)
+
+        for from_type, to_type in _UPGRADES:
+            mask = player_board.get_structure_mask(from_type)
+            if not mask or _count_structures(board, player.player_id, to_type) \
+                    >= STRUCTURE_LIMITS[to_type]:
+                continue
+            costs = faction.rules.building_costs[to_type]
+            affordable = get_affordable(game_state, costs)
+            if not any(affordable):
+                continue
+            for hex_id in iterate_bits(mask):
+                has_neighbours = to_type == StructureType.TRADING_POST \
+                        and _has_neighbours(board, player.player_id, hex_id)
+                if affordable[has_neighbours]:
+                    yield hex_id, to_type, costs[has_neighbours]
+
+
+@dataclass
+class SendPriestActionExecution(ActionExecution):
+    cult: Cult
+    # 1, or the steps of one of the track's PRIEST_SPACE_STEPS, where the priest then stays
+    steps: int = 1
+
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = f"send p to {self.cult.name} for {self.steps}",
+                resource_delta = -self.cost,
+                cult_delta = CultDelta((self.cult,) * self.steps),
+                priest_space = self.steps if self.steps > 1 else 0)
+
+
+_PRIEST_COST = ResourceDelta(priests=1)
+
+
+def _get_advanceable_cults(game_state: 'GameState') -> Tuple[Cult, ...]:
+    player = game_state.active_player
+    return game_state.get_cult_tracks().get_advanceable_cults(
+            player.initial_turn_position, player.player_state.towns.num_towns)
+
 
 @dataclass
 class SendPriestAction(Action):
-    pass
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[SendPriestActionExecution]:
+        if not get_affordable(game_state, (_PRIEST_COST,))[0]:
+            return
+        tracks = game_state.get_cult_tracks()
+        for cult in _get_advanceable_cults(game_state):
+            for steps in tracks.get_open_priest_spaces(cult):
+                yield SendPriestActionExecution(_PRIEST_COST, cult, steps)
+            yield SendPriestActionExecution(_PRIEST_COST, cult)
+
+
+@dataclass
+class PassActionExecution(ActionExecution):
+    bonus_tile: Tile = None
+
+    def compute(self, game_state: 'GameState') -> Step:
+        player = game_state.active_player
+        bonus_tiles = player.player_state.tiles.bonus_tiles
+        points = player.faction.get_pass_points(player.player_state)
+        resource_delta = -self.cost + ResourceDelta(victory_points=points) \
+                if points else -self.cost
+        if self.bonus_tile is not None:
+            resource_delta = resource_delta + _get_bonus_tile_coins(game_state, self.bonus_tile)
+        return Step(
+                description = "pass" if self.bonus_tile is None else f"pass {self.bonus_tile.name}",
+                passed = True,
+                resource_delta = resource_delta,
+                new_tiles = (self.bonus_tile,) if self.bonus_tile is not None else (),
+                returned_tile = bonus_tiles[0] if bonus_tiles else None)
+
+
+def _get_bonus_tile_coins(game_state: 'GameState', tile: Tile) -> ResourceDelta:
+    """The coins left on a bonus tile in the pool, which go to whoever takes it."""
+    coins = game_state.bonus_tile_coins.get(tile.name)
+    return ResourceDelta(coins=coins) if coins else NO_RESOURCES
+
+
+def _get_selectable_tiles(tiles: Tuple[Tile, ...], excluded: Tuple[Tile, ...] = ()) \
+        -> Tuple[Tile, ...]:
+    """One of each distinct tile, by name, which isn't among the excluded tiles."""
+    names = {x.name for x in excluded}
+    selectable = []
+    for tile in tiles:
+        if tile.name not in names:
+            names.add(tile.name)
+            selectable.append(tile)
+    return tuple(selectable)
+
 
 @dataclass
 class PassAction(Action):
-    pass
+    def get_available_executions(self, game_state: 'GameState') -> Iterator[PassActionExecution]:
+        # No bonus tile is taken when passing in the final round
+        tiles = _get_selectable_tiles(game_state.pool.bonus_tiles) \
+                if game_state.round < FINAL_ROUND else ()
+        if not tiles:
+            yield PassActionExecution(NO_RESOURCES)
+        for tile in tiles:
+            yield PassActionExecution(NO_RESOURCES, tile)
 
 #------------------------------------
 # Power Actions
@@ -122,27 +551,132 @@ class PassAction(Action):
 class PowerAction(Action):
     power_cost: int
 
+    def _get_power_cost(self, game_state: 'GameState') -> ResourceDelta:
+        """The power cost, or None if the action slot is taken or the power can't be paid."""
+        if self.action_id in game_state.expended_action_slots:
+            return None
+        cost = ResourceDelta(power=self.power_cost)
+        if not get_affordable(game_state, (cost,))[0]:
+            return None
+        return cost
+
 @dataclass
 class SpadePowerAction(PowerAction):
     spades_provided: int
 
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[TransformAndBuildActionExecution]:
+        cost = self._get_power_cost(game_state)
+        if cost is None:
+            return iter(())
+        return _iterate_transform_executions(
+                game_state, self.spades_provided, cost, self.action_id)
+
+    def count_available_executions(self, game_state: 'GameState') -> int:
+        cost = self._get_power_cost(game_state)
+        if cost is None:
+            return 0
+        return _count_transform_executions(game_state, self.spades_provided, cost)
+
+
+@dataclass
+class BuildBridgeActionExecution(ActionExecution):
+    location: str # by location_id of the BridgeSlot
+    action_slot: str = None
+
+    def compute(self, game_state: 'GameState') -> Step:
+        board = game_state.board
+        first, second = board.map_index.bridge_endpoints[
+                board.map_index.bridge_ids_by_location[self.location]]
+        location_ids = board.map_index.location_ids
+        return Step(
+                description = f"action {self.action_slot}. "
+                        + f"bridge {location_ids[first]}:{location_ids[second]}",
+                resource_delta = -self.cost,
+                new_structures = (Structure(StructureType.BRIDGE, self.location),),
+                action_slot_expended = self.action_slot)
+
+
 @dataclass
 class BridgePowerAction(PowerAction):
-    pass
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[BuildBridgeActionExecution]:
+        cost = self._get_power_cost(game_state)
+        board = game_state.board
+        player_id = game_state.active_player_id
+        if cost is None or _count_structures(board, player_id, StructureType.BRIDGE) \
+                >= STRUCTURE_LIMITS[StructureType.BRIDGE]:
+            return
+
+        map_index = board.map_index
+        occupied = board.for_player(player_id).occupied
+        for bridge_id, (first, second) in enumerate(map_index.bridge_endpoints):
+            if not board.bridges & (1 << bridge_id) \
+                    and occupied & ((1 << first) | (1 << second)):
+                yield BuildBridgeActionExecution(
+                        cost, map_index.bridge_location_ids[bridge_id], self.action_id)
+
+
+@dataclass
+class ResourceActionExecution(ActionExecution):
+    resources_provided: ResourceDelta
+    action_slot: str = None
+
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = f"action {self.action_slot}",
+                resource_delta = self.resources_provided - self.cost,
+                action_slot_expended = self.action_slot)
+
 
 @dataclass
 class ResourcePowerAction(PowerAction):
     resources_provided: ResourceDelta
 
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[ResourceActionExecution]:
+        cost = self._get_power_cost(game_state)
+        if cost is not None:
+            yield ResourceActionExecution(cost, self.resources_provided, self.action_id)
+
 #------------------------------------
 # Special Actions
 @dataclass
 class FactionSpecialAction(Action):
     pass
 
+@dataclass
+class CultStepActionExecution(ActionExecution):
+    cult: Cult
+    action_slot: str = None
+
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = f"action {self.action_slot.split('/')[0]}. +{self.cult.name}",
+                resource_delta = -self.cost,
+                cult_delta = CultDelta((self.cult,)),
+                action_slot_expended = self.action_slot)
+
+
 @dataclass
 class TileSlotAction(Action):
-    pass
+    """The action of a bonus or favor tile. Its slot is expended per player."""
+    spades_provided: int = 0
+    cult_steps_provided: int = 0
+
+    def get_action_slot(self, player_id: str) -> str:
+        return _get_player_action_slot(self.action_id, player_id)
+
+    def get_available_executions(self, game_state: 'GameState') -> Iterator[ActionExecution]:
+        action_slot = self.get_action_slot(game_state.active_player_id)
+        if action_slot in game_state.expended_action_slots:
+            return
+        if self.spades_provided:
+            yield from _iterate_transform_executions(
+                    game_state, self.spades_provided, NO_RESOURCES, action_slot)
+        if self.cult_steps_provided:
+            for cult in _get_advanceable_cults(game_state):
+                yield CultStepActionExecution(NO_RESOURCES, cult, action_slot)
 
 #------------------------------------
 # Off-Turn Actions
@@ -150,42 +684,172 @@ class TileSlotAction(Action):
 class OffTurnAction(Action):
     phase: Phase
 
+@dataclass
+class SelectFactionActionExecution(ActionExecution):
+    faction: Faction
+
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = f"select {self.faction.name.lower()}",
+                faction_selected = self.faction)
+
+
 @dataclass
 class SelectFactionAction(OffTurnAction):
-    action_id = "Action-SelectFaction"
-    phase = Phase.SELECT_FACTION
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[SelectFactionActionExecution]:
+        taken_terrains = {x.faction.home_terrain for x in game_state.players
+                if x.faction is not None}
+        for faction in FACTIONS:
+            if faction.home_terrain not in taken_terrains:
+                yield SelectFactionActionExecution(NO_RESOURCES, faction)
+
+
+@dataclass
+class PlaceInitialDwellingActionExecution(ActionExecution):
+    location: str # by location_id
+
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = f"build {self.location}",
+                new_structures = (Structure(StructureType.DWELLING, self.location),))
+
 
 @dataclass
 class PlaceInitialDwellingAction(OffTurnAction):
-    action_id = "Action-PlaceInitialDwelling"
-    phase = Phase.PLACE_INITIAL_DWELLING
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[PlaceInitialDwellingActionExecution]:
+        location_ids = game_state.board.map_index.location_ids
+        for hex_id in iterate_bits(self._get_mask(game_state)):
+            yield PlaceInitialDwellingActionExecution(NO_RESOURCES, location_ids[hex_id])
+
+    def count_available_executions(self, game_state: 'GameState') -> int:
+        return count_bits(self._get_mask(game_state))
+
+    def _get_mask(self, game_state: 'GameState') -> int:
+        board = game_state.board
+        return board.get_terrain_mask(game_state.active_player.faction.home_terrain) \
+                & ~board.occupied
+
+
+@dataclass
+class SelectTileActionExecution(ActionExecution):
+    tile: Tile
+
+    def compute(self, game_state: 'GameState') -> Step:
+        tile = self.tile
+        resource_delta = tile.immediate_resources - self.cost
+        if tile.tile_type == TileType.BONUS:
+            description = f"pass {tile.name}"
+            resource_delta = resource_delta + _get_bonus_tile_coins(game_state, tile)
+        else:
+            description = f"+{tile.name}"
+        if tile.tile_type == TileType.TOWN:
+            resource_delta = resource_delta + get_event_resources(game_state, EventType.BUILD_TOWN)
+        return Step(
+                description = description,
+                resource_delta = resource_delta,
+                new_tiles = (tile,),
+                cult_delta = tile.immediate_cult,
+                new_town_tile_decisions = -1 if tile.tile_type == TileType.TOWN else 0,
+                new_favor_tile_decisions = -1 if tile.tile_type == TileType.FAVOR else 0)
+
 
 @dataclass
 class SelectInitialBonusTileAction(OffTurnAction):
-    action_id = "Action-SelectInitialBonusTile"
-    phase = Phase.SELECT_INITIAL_BONUS_TILE
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[SelectTileActionExecution]:
+        for tile in _get_selectable_tiles(game_state.pool.bonus_tiles):
+            yield SelectTileActionExecution(NO_RESOURCES, tile)
 
 @dataclass
 class SelectTownTileAction(OffTurnAction):
-    action_id = "Action-SelectTownTile"
-    phase = Phase.SELECT_TOWN_TILE
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[SelectTileActionExecution]:
+        for tile in _get_selectable_tiles(game_state.pool.town_tiles):
+            yield SelectTileActionExecution(NO_RESOURCES, tile)
 
 @dataclass
 class SelectFavorTileAction(OffTurnAction):
-    action_id = "Action-SelectFavorTile"
-    phase = Phase.SELECT_FAVOR_TILE
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[SelectTileActionExecution]:
+        owned = game_state.active_player.player_state.tiles.favor_tiles
+        for tile in _get_selectable_tiles(game_state.pool.favor_tiles, owned):
+            yield SelectTileActionExecution(NO_RESOURCES, tile)
 
 @dataclass
 class MakeLeechDecisionAction(OffTurnAction):
-    action_id = "Action-MakeLeechDecision"
-    phase = Phase.LEECH_DECISION
+    pass
+
+@dataclass
+class BonusSpadeActionExecution(ActionExecution):
+    """Transform a hex with spades from the round tile's cult bonus. No dwelling can be built."""
+    location: str # by location_id
+    new_terrain: Terrain
+
+    def compute(self, game_state: 'GameState') -> Step:
+        board = game_state.board
+        hex_id = board.get_hex_id(self.location)
+        if board.occupied & (1 << hex_id):
+            raise ValueError(f"Hex {self.location} is occupied")
+        spades = get_terrain_distance(board.get_terrain(hex_id), self.new_terrain)
+        return Step(
+                description = f"transform {self.location} to {_TERRAIN_COLOURS[self.new_terrain]}",
+                resource_delta = get_event_resources(game_state, EventType.DIG, spades) - self.cost,
+                terrain_changes = frozendict({self.location: self.new_terrain}),
+                new_bonus_spade_decisions = -spades)
+
+@dataclass
+class DeclineBonusSpadesActionExecution(ActionExecution):
+    """Forfeit whatever spades from the round tile's cult bonus are left."""
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = "decline spades",
+                new_bonus_spade_decisions =
+                        -game_state.active_player.player_state.bonus_spade_decisions)
 
 @dataclass
 class MakeBonusSpadeDecisionAction(OffTurnAction):
-    action_id = "Action-MakeBonusSpadeDecision"
-    phase = Phase.BONUS_SPADE_DECISION
+    """Use the spades earned from the round tile's cult bonus at the end of a round, one hex at a
+    time, or decline the rest.
+    """
+    def get_available_executions(self, game_state: 'GameState') -> Iterator[ActionExecution]:
+        board = game_state.board
+        location_ids = board.map_index.location_ids
+        spades = game_state.active_player.player_state.bonus_spade_decisions
+        transformable = _get_transformable_mask(game_state)
+        for from_terrain in TERRAINS:
+            mask = transformable & board.get_terrain_mask(from_terrain)
+            if from_terrain == Terrain.RIVER or not mask:
+                continue
+            for to_terrain in TERRAINS:
+                if to_terrain != Terrain.RIVER \
+                        and 0 < get_terrain_distance(from_terrain, to_terrain) <= spades:
+                    for hex_id in iterate_bits(mask):
+                        yield BonusSpadeActionExecution(
+                                NO_RESOURCES, location_ids[hex_id], to_terrain)
+        yield DeclineBonusSpadesActionExecution(NO_RESOURCES)
 
 @dataclass
 class MakeCultistDecisionAction(OffTurnAction):
-    action_id = "Action-MakeCultistDecision"
-    phase = Phase.CULTIST_DECISION
+    pass
+
+@dataclass
+class CultKeyDecisionActionExecution(ActionExecution):
+    cult: Cult
+
+    def compute(self, game_state: 'GameState') -> Step:
+        return Step(
+                description = f"key {self.cult.name}",
+                cult_delta = CultDelta((self.cult,)),
+                new_cult_key_decisions = -1)
+
+@dataclass
+class MakeCultTrackDecisionAction(OffTurnAction):
+    """Choose which track to use a key on, when a player reached step 10 of more tracks at once
+    than they have keys for.
+    """
+    def get_available_executions(self, game_state: 'GameState') \
+            -> Iterator[CultKeyDecisionActionExecution]:
+        for cult in game_state.active_player.player_state.contested_cults:
+            yield CultKeyDecisionActionExecution(NO_RESOURCES, cult)
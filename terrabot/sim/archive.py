@@ -0,0 +1,198 @@
+"""Indexed game archive with random access to any position, read through mmap.
+
+Layout, with all fixed-width integers little-endian:
+
+    header      magic, format version, keyframe interval K
+    games       one block per game (see below), back to back
+    index       one fixed-width entry per game: the game block's offset and its number of plies
+    trailer     the index's offset, the number of games, and the magic again
+
+A game block starts with a table of segment offsets. Segment i holds the encoded GameState after
+ply i * K (the keyframe) followed by the encoded moves from there to the next keyframe. Reading
+game k, ply p is then two index lookups, one keyframe decode and at most K - 1 replayed moves,
+wherever the game sits in the file. The OS pages in only the blocks which are touched, so the
+archive is never read sequentially or held in memory whole.
+
+The index is written when the writer is closed, so an archive can't be read while it is being
+written. Reopening a closed archive for writing appends new games and rewrites the index.
+"""
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterator, Tuple
+
+from terrabot.sim.codec import CODEC_VERSION, GameRecord, Move, decode_game_state, \
+        decode_moves, encode_game_state, encode_moves
+from terrabot.sim.game import GameState
+
+INDEXED_ARCHIVE_MAGIC = b"TBGX"
+
+DEFAULT_KEYFRAME_INTERVAL = 32
+
+_HEADER = struct.Struct("<4sHI") # magic, codec version, keyframe interval
+_INDEX_ENTRY = struct.Struct("<QI") # game offset, number of plies
+_TRAILER = struct.Struct("<QQ4s") # index offset, number of games, magic
+_SEGMENT_OFFSET = struct.Struct("<Q")
+_STATE_LENGTH = struct.Struct("<I")
+
+
+def _get_num_segments(num_plies: int, keyframe_interval: int) -> int:
+    return num_plies // keyframe_interval + 1
+
+
+def _read_header(data, size: int) -> int:
+    """Validate the header and trailer, returning the keyframe interval."""
+    if size < _HEADER.size + _TRAILER.size:
+        raise ValueError("Not an indexed game archive, or it wasn't closed")
+    magic, version, keyframe_interval = _HEADER.unpack_from(data, 0)
+    _, _, trailer_magic = _TRAILER.unpack_from(data, size - _TRAILER.size)
+    if magic != INDEXED_ARCHIVE_MAGIC or trailer_magic != INDEXED_ARCHIVE_MAGIC:
+        raise ValueError("Not an indexed game archive, or it wasn't closed")
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported game archive version {version}, expected {CODEC_VERSION}")
+    return keyframe_interval
+
+
+class IndexedArchiveWriter:
+    """Appends GameRecords to an indexed archive, creating it if necessary."""
+
+    def __init__(self, path: str, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        if keyframe_interval < 1:
+            raise ValueError("The keyframe interval must be positive")
+        self._offsets = array("Q")
+        self._num_plies = array("I")
+
+        if os.path.exists(path) and os.path.getsize(path):
+            self.file = open(path, "r+b")
+            self._load_index()
+        else:
+            self.file = open(path, "w+b")
+            self.keyframe_interval = keyframe_interval
+            self.file.write(_HEADER.pack(INDEXED_ARCHIVE_MAGIC, CODEC_VERSION, keyframe_interval))
+
+    def _load_index(self):
+        """Read the existing index, then cut it off so that new games overwrite it."""
+        with mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            self.keyframe_interval = _read_header(data, size)
+            index_offset, num_games, _ = _TRAILER.unpack_from(data, size - _TRAILER.size)
+            for offset, num_plies in _INDEX_ENTRY.iter_unpack(
+                    data[index_offset:index_offset + num_games * _INDEX_ENTRY.size]):
+                self._offsets.append(offset)
+                self._num_plies.append(num_plies)
+        self.file.truncate(index_offset)
+        self.file.seek(index_offset)
+
+    def write(self, record: GameRecord):
+        interval = self.keyframe_interval
+        num_plies = len(record.moves)
+        num_segments = _get_num_segments(num_plies, interval)
+
+        segments = []
+        for ply, game_state in enumerate(record.iterate_states()):
+            if ply % interval == 0:
+                state_data = encode_game_state(game_state)
+                segments.append(_STATE_LENGTH.pack(len(state_data)) + state_data
+                        + encode_moves(record.moves[ply:ply + interval]))
+
+        offset = self.file.tell()
+        segment_offset = offset + num_segments * _SEGMENT_OFFSET.size
+        for segment in segments:
+            self.file.write(_SEGMENT_OFFSET.pack(segment_offset))
+            segment_offset += len(segment)
+        for segment in segments:
+            self.file.write(segment)
+
+        self._offsets.append(offset)
+        self._num_plies.append(num_plies)
+
+    def close(self):
+        index_offset = self.file.tell()
+        for offset, num_plies in zip(self._offsets, self._num_plies):
+            self.file.write(_INDEX_ENTRY.pack(offset, num_plies))
+        self.file.write(_TRAILER.pack(index_offset, len(self._offsets), INDEXED_ARCHIVE_MAGIC))
+        self.file.close()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __enter__(self) -> "IndexedArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class IndexedArchive:
+    """Read-only random access to the games and positions of an indexed archive."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self._data)
+        self.keyframe_interval = _read_header(self._data, size)
+        self._index_offset, self._num_games, _ = \
+                _TRAILER.unpack_from(self._data, size - _TRAILER.size)
+
+    def __len__(self) -> int:
+        return self._num_games
+
+    def _get_index_entry(self, game_index: int) -> Tuple[int, int]:
+        if not 0 <= game_index < self._num_games:
+            raise IndexError(game_index)
+        return _INDEX_ENTRY.unpack_from(
+                self._data, self._index_offset + game_index * _INDEX_ENTRY.size)
+
+    def get_num_plies(self, game_index: int) -> int:
+        return self._get_index_entry(game_index)[1]
+
+    def _read_segment(self, game_offset: int, segment_index: int) \
+            -> Tuple[GameState, Tuple[Move, ...]]:
+        data = self._data
+        (offset,) = _SEGMENT_OFFSET.unpack_from(
+                data, game_offset + segment_index * _SEGMENT_OFFSET.size)
+        (state_length,) = _STATE_LENGTH.unpack_from(data, offset)
+        offset += _STATE_LENGTH.size
+        view = memoryview(data)
+        try:
+            game_state = decode_game_state(view[offset:offset + state_length])
+            moves = decode_moves(view[offset + state_length:])
+        finally:
+            view.release()
+        return game_state, moves
+
+    def get_game_state(self, game_index: int, ply: int) -> GameState:
+        """The GameState after the given number of plies of a game, replayed from the nearest
+        keyframe at or before it.
+        """
+        game_offset, num_plies = self._get_index_entry(game_index)
+        if not 0 <= ply <= num_plies:
+            raise IndexError(ply)
+        game_state, moves = self._read_segment(game_offset, ply // self.keyframe_interval)
+        for move in moves[:ply % self.keyframe_interval]:
+            game_state = move.apply(game_state)
+        return game_state
+
+    def get_moves(self, game_index: int) -> Tuple[Move, ...]:
+        game_offset, num_plies = self._get_index_entry(game_index)
+        moves = ()
+        for i in range(_get_num_segments(num_plies, self.keyframe_interval)):
+            moves += self._read_segment(game_offset, i)[1]
+        return moves
+
+    def get_record(self, game_index: int) -> GameRecord:
+        return GameRecord(self.get_game_state(game_index, 0), self.get_moves(game_index))
+
+    def iterate_game_states(self, game_index: int) -> Iterator[GameState]:
+        """Every position of a game, in order."""
+        return self.get_record(game_index).iterate_states()
+
+    def close(self):
+        self._data.close()
+
+    def __enter__(self) -> "IndexedArchive":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,180 @@
+"""Batch resource arithmetic over many candidate ResourceDeltas.
+
+Move generation tests many candidate costs against one PlayerResourceState. Doing that with
+PlayerResourceState.add() allocates a ResourceDelta, a PowerBowlState and a PlayerResourceState
+per candidate, and raises on unaffordable power. ResourceDeltaBatch instead stores N deltas as one
+row-major (N x 5) integer array, and apply_resource_delta_batch() computes every resulting state,
+whether it is feasible, and how much power must be burned, in a single pass over plain integers.
+"""
+from array import array
+from enum import IntEnum
+from typing import Iterable, Sequence
+
+from terrabot.sim.resource import PlayerResourceState, PowerBowlState, ResourceDelta
+
+class DeltaColumn(IntEnum):
+    COINS = 0
+    WORKERS = 1
+    PRIESTS = 2
+    POWER = 3
+    VICTORY_POINTS = 4
+
+
+NUM_DELTA_COLUMNS = len(DeltaColumn)
+
+
+class ResultColumn(IntEnum):
+    COINS = 0
+    WORKERS = 1
+    PRIESTS = 2
+    POWER_BOWL_ONE = 3
+    POWER_BOWL_TWO = 4
+    POWER_BOWL_THREE = 5
+    VICTORY_POINTS = 6
+
+
+NUM_RESULT_COLUMNS = len(ResultColumn)
+
+
+class ResourceDeltaBatch:
+    """N ResourceDeltas as a row-major (N x 5) array of (coins, workers, priests, power, VP)."""
+
+    def __init__(self, data: array):
+        if len(data) % NUM_DELTA_COLUMNS:
+            raise ValueError(f"Batch data must have {NUM_DELTA_COLUMNS} columns")
+        self.data = data
+
+    @staticmethod
+    def from_deltas(deltas: Iterable[ResourceDelta]) -> "ResourceDeltaBatch":
+        data = array("i")
+        for x in deltas:
+            data.extend((x.coins, x.workers, x.priests, x.power, x.victory_points))
+        return ResourceDeltaBatch(data)
+
+    @staticmethod
+    def from_rows(rows: Iterable[Sequence[int]]) -> "ResourceDeltaBatch":
+        data = array("i")
+        for row in rows:
+            if len(row) != NUM_DELTA_COLUMNS:
+                raise ValueError(f"Expected {NUM_DELTA_COLUMNS} columns, found {len(row)}")
+            data.extend(row)
+        return ResourceDeltaBatch(data)
+
+    def negated(self) -> "ResourceDeltaBatch":
+        """Useful for turning a batch of costs into a batch of deltas."""
+        return ResourceDeltaBatch(array(self.data.typecode, (-x for x in self.data)))
+
+    def get_delta(self, index: int) -> ResourceDelta:
+        start = index * NUM_DELTA_COLUMNS
+        return ResourceDelta(*self.data[start:start + NUM_DELTA_COLUMNS])
+
+    def __len__(self) -> int:
+        return len(self.data) // NUM_DELTA_COLUMNS
+
+
+class ResourceBatchResult:
+    """The outcome of applying each delta of a batch to the same PlayerResourceState.
+
+    resulting is a row-major (N x 7) array laid out according to ResultColumn. feasible is a
+    mask with 1 where the delta leaves no quantity negative and its power can be paid. burn is the
+    number of power which must be burned to pay each delta's power.
+    """
+
+    def __init__(self, base: PlayerResourceState, resulting: array, feasible: bytearray,
+            burn: array):
+        self.base = base
+        self.resulting = resulting
+        self.feasible = feasible
+        self.burn = burn
+
+    def get_resource_state(self, index: int) -> PlayerResourceState:
+        start = index * NUM_RESULT_COLUMNS
+        coins, workers, priests, bowl_one, bowl_two, bowl_three, victory_points = \
+                self.resulting[start:start + NUM_RESULT_COLUMNS]
+        return PlayerResourceState(
+                coins = coins,
+                workers = workers,
+                priests = priests,
+                priest_pool_size = self.base.priest_pool_size,
+                power = PowerBowlState.create(bowl_one, bowl_two, bowl_three),
+                victory_points = victory_points)
+
+    def get_feasible_indices(self) -> Sequence[int]:
+        return [i for i, x in enumerate(self.feasible) if x]
+
+    def __len__(self) -> int:
+        return len(self.feasible)
+
+
+def apply_resource_delta_batch(
+        resources: PlayerResourceState,
+        batch: ResourceDeltaBatch) -> ResourceBatchResult:
+    """Equivalent to resources.add(delta) for every delta in the batch, except that infeasible
+    deltas are reported in the feasibility mask rather than raising.
+    """
+    coins = resources.coins
+    workers = resources.workers
+    priests = resources.priests
+    victory_points = resources.victory_points
+    bowl_one = resources.power.bowl_one
+    bowl_two = resources.power.bowl_two
+    bowl_three = resources.power.bowl_three
+    capacity = 2 * bowl_one + bowl_two
+    available_power = bowl_three + (bowl_two // 2)
+    num_tokens = bowl_one + bowl_two + bowl_three
+
+    data = batch.data
+    n = len(batch)
+    resulting = array("i", bytes(4 * n * NUM_RESULT_COLUMNS)) if n else array("i")
+    feasible = bytearray(n)
+    burn = array("i", bytes(4 * n)) if n else array("i")
+
+    for i in range(n):
+        d = i * NUM_DELTA_COLUMNS
+        r = i * NUM_RESULT_COLUMNS
+        new_coins = coins + data[d]
+        new_workers = workers + data[d + 1]
+        new_priests = priests + data[d + 2]
+        power = data[d + 3]
+        new_victory_points = victory_points + data[d + 4]
+        ok = new_coins >= 0 and new_workers >= 0 and new_priests >= 0 and new_victory_points >= 0
+
+        # Closed form of PowerBowlState.gain/spend
+        if power >= 0:
+            if power >= capacity:
+                b1, b2, b3 = 0, 0, num_tokens
+            elif power <= bowl_one:
+                b1, b2, b3 = bowl_one - power, bowl_two + power, bowl_three
+            else:
+                excess = power - bowl_one
+                b1, b2, b3 = 0, bowl_one + bowl_two - excess, bowl_three + excess
+        else:
+            spent = -power
+            if spent > available_power:
+                ok = False
+                b1, b2, b3 = bowl_one, bowl_two, bowl_three
+            elif spent <= bowl_three:
+                b1, b2, b3 = bowl_one + spent, bowl_two, bowl_three - spent
+            else:
+                burned = spent - bowl_three
+                burn[i] = burned
+                b1, b2, b3 = bowl_one + spent, bowl_two - 2 * burned, 0
+
+        resulting[r] = new_coins
+        resulting[r + 1] = new_workers
+        resulting[r + 2] = new_priests
+        resulting[r + 3] = b1
+        resulting[r + 4] = b2
+        resulting[r + 5] = b3
+        resulting[r + 6] = new_victory_points
+        feasible[i] = ok
+
+    return ResourceBatchResult(resources, resulting, feasible, burn)
+
+
+def get_affordable_costs(
+        resources: PlayerResourceState,
+        costs: Sequence[ResourceDelta]) -> Sequence[bool]:
+    """Feasibility mask for paying each of the given costs, without any conversions."""
+    result = apply_resource_delta_batch(resources, ResourceDeltaBatch.from_deltas(costs).negated())
+    return [bool(x) for x in result.feasible]
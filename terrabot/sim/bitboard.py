@@ -0,0 +1,222 @@
+"""Bitboard representation of what is built where, and of each hex's current terrain.
+
+Sets of hexes are Python ints with bit i set for the hex with id i in the Map's MapIndex (and, for
+bridges, bit i set for the bridge slot with bridge id i). Board queries which would otherwise loop
+over Map.hexes, such as "hexes adjacent to my structures" or "players with a structure next to
+this hex", become a handful of bitwise operations. Each player's direct adjacency and shipping
+reach are maintained incrementally as structures and bridges are added.
+
+Bitboards are immutable, like the GameState which holds them. The with_*() methods return a new
+Bitboard sharing everything that didn't change.
+"""
+from dataclasses import dataclass, field, replace
+from typing import Optional, Tuple
+
+from frozendict import frozendict
+
+from terrabot.sim.map import MAX_SHIPPING, Map, MapIndex, Terrain
+from terrabot.sim.structure import StructureType
+from terrabot.util import tuple_replace
+
+# Every StructureType built on a hex, in the order used to index PlayerBitboard.structures
+HEX_STRUCTURE_TYPES = (
+        StructureType.DWELLING,
+        StructureType.TRADING_POST,
+        StructureType.TEMPLE,
+        StructureType.SANCTUARY,
+        StructureType.STRONGHOLD)
+
+_STRUCTURE_TYPE_INDEX = frozendict({x: i for i, x in enumerate(HEX_STRUCTURE_TYPES)})
+
+TERRAINS = tuple(Terrain)
+
+_TERRAIN_INDEX = frozendict({x: i for i, x in enumerate(TERRAINS)})
+
+
+@dataclass(frozen=True)
+class PlayerBitboard:
+    structures: Tuple[int, ...] = (0,) * len(HEX_STRUCTURE_TYPES) # by HEX_STRUCTURE_TYPES
+    occupied: int = 0
+    bridges: int = 0 # by bridge id
+
+    # Hexes directly adjacent to the player's structures, including across any bridge, whether or
+    # not they are occupied. Maintained incrementally.
+    adjacent: int = 0
+
+    # shipping_reach[s] is the set of land hexes reachable across at most s river hexes from the
+    # player's structures. Maintained incrementally.
+    shipping_reach: Tuple[int, ...] = (0,) * (MAX_SHIPPING + 1)
+
+    def get_structure_mask(self, structure_type: StructureType) -> int:
+        return self.structures[_STRUCTURE_TYPE_INDEX[structure_type]]
+
+    def get_reachable_mask(self, shipping: int) -> int:
+        """Hexes directly or indirectly adjacent to the player's structures."""
+        return self.adjacent | self.shipping_reach[min(shipping, MAX_SHIPPING)]
+
+
+@dataclass(frozen=True)
+class Bitboard:
+    map_index: MapIndex = field(repr=False, compare=False)
+    player_ids: Tuple[str, ...]
+    players: Tuple[PlayerBitboard, ...]
+    terrains: Tuple[int, ...] # by TERRAINS
+    occupied: int = 0
+    bridges: int = 0
+
+    # bridge_adjacency[i] is the set of hexes connected to hex i by a built bridge
+    bridge_adjacency: Tuple[int, ...] = field(default=(), repr=False)
+
+    @staticmethod
+    def create(map_: Map, player_ids: Tuple[str, ...]) -> "Bitboard":
+        map_index = map_.index
+        terrains = [0] * len(TERRAINS)
+        for hex_id, terrain in enumerate(map_index.terrains):
+            terrains[_TERRAIN_INDEX[terrain]] |= 1 << hex_id
+        return Bitboard(
+                map_index = map_index,
+                player_ids = tuple(player_ids),
+                players = (PlayerBitboard(),) * len(player_ids),
+                terrains = tuple(terrains),
+                bridge_adjacency = (0,) * map_index.num_hexes)
+
+    def for_player(self, player_id: str) -> PlayerBitboard:
+        return self.players[self.player_ids.index(player_id)]
+
+    def get_hex_id(self, location_id: str) -> int:
+        return self.map_index.ids_by_location[location_id]
+
+    def get_terrain_mask(self, terrain: Terrain) -> int:
+        return self.terrains[_TERRAIN_INDEX[terrain]]
+
+    def get_terrain(self, hex_id: int) -> Terrain:
+        bit = 1 << hex_id
+        for terrain, mask in zip(TERRAINS, self.terrains):
+            if mask & bit:
+                return terrain
+        raise AssertionError(f"Hex {hex_id} has no terrain")
+
+    def get_owner(self, hex_id: int) -> Optional[str]:
+        bit = 1 << hex_id
+        if not self.occupied & bit:
+            return None
+        for player_id, player in zip(self.player_ids, self.players):
+            if player.occupied & bit:
+                return player_id
+        raise AssertionError(f"Occupied hex {hex_id} has no owner")
+
+    def get_structure_type(self, hex_id: int) -> Optional[StructureType]:
+        bit = 1 << hex_id
+        if not self.occupied & bit:
+            return None
+        for player in self.players:
+            if player.occupied & bit:
+                for structure_type, mask in zip(HEX_STRUCTURE_TYPES, player.structures):
+                    if mask & bit:
+                        return structure_type
+        raise AssertionError(f"Occupied hex {hex_id} has no structure")
+
+    def get_neighbourhood_mask(self, hex_id: int) -> int:
+        """Hexes directly adjacent to the given hex, including across bridges."""
+        return self.map_index.adjacency_masks[hex_id] | self.bridge_adjacency[hex_id]
+
+    def get_neighbouring_player_ids(self, hex_id: int, exclude_player_id: str = None) \
+            -> Tuple[str, ...]:
+        """Players with a structure directly adjacent to the hex, e.g. to receive leech."""
+        neighbourhood = self.get_neighbourhood_mask(hex_id)
+        if not neighbourhood & self.occupied:
+            return ()
+        return tuple(
+                player_id
+                for player_id, player in zip(self.player_ids, self.players)
+                if player.occupied & neighbourhood and player_id != exclude_player_id)
+
+    def get_reachable_mask(self, player_id: str, shipping: int) -> int:
+        return self.for_player(player_id).get_reachable_mask(shipping)
+
+    def get_reachable_terrain_mask(self, player_id: str, terrain: Terrain, shipping: int) -> int:
+        """Unoccupied hexes of the given terrain, e.g. a faction's home terrain, which the player
+        could reach.
+        """
+        return self.get_reachable_mask(player_id, shipping) \
+                & self.get_terrain_mask(terrain) & ~self.occupied
+
+    def with_structure(self, player_id: str, structure_type: StructureType, hex_id: int) \
+            -> "Bitboard":
+        """Build or upgrade to the given structure. Any structure the player already had on the
+        hex is replaced.
+        """
+        if structure_type == StructureType.BRIDGE:
+            raise ValueError("Use with_bridge() for bridges")
+
+        bit = 1 << hex_id
+        owner = self.get_owner(hex_id)
+        if owner is not None and owner != player_id:
+            raise ValueError(f"Hex {self.map_index.location_ids[hex_id]} is occupied by {owner}")
+
+        position = self.player_ids.index(player_id)
+        player = self.players[position]
+        type_index = _STRUCTURE_TYPE_INDEX[structure_type]
+        structures = tuple(
+                (x | bit) if i == type_index else (x & ~bit)
+                for i, x in enumerate(player.structures))
+
+        if player.occupied & bit:
+            new_player = replace(player, structures = structures)
+        else:
+            map_index = self.map_index
+            new_player = replace(player,
+                    structures = structures,
+                    occupied = player.occupied | bit,
+                    adjacent = player.adjacent | self.get_neighbourhood_mask(hex_id),
+                    shipping_reach = tuple(
+                            reach | masks[hex_id]
+                            for reach, masks in zip(
+                                    player.shipping_reach, map_index.shipping_masks)))
+
+        return replace(self,
+                players = tuple_replace(self.players, position, new_player),
+                occupied = self.occupied | bit)
+
+    def with_bridge(self, player_id: str, bridge_id: int) -> "Bitboard":
+        bridge_bit = 1 << bridge_id
+        if self.bridges & bridge_bit:
+            raise ValueError(f"Bridge {self.map_index.bridge_location_ids[bridge_id]} is built")
+
+        first, second = self.map_index.bridge_endpoints[bridge_id]
+        first_bit, second_bit = 1 << first, 1 << second
+        bridge_adjacency = tuple_replace(
+                self.bridge_adjacency, first, self.bridge_adjacency[first] | second_bit)
+        bridge_adjacency = tuple_replace(
+                bridge_adjacency, second, bridge_adjacency[second] | first_bit)
+
+        players = list(self.players)
+        for position, player in enumerate(players):
+            adjacent = player.adjacent
+            if player.occupied & first_bit:
+                adjacent |= second_bit
+            if player.occupied & second_bit:
+                adjacent |= first_bit
+            bridges = player.bridges | bridge_bit \
+                    if self.player_ids[position] == player_id else player.bridges
+            if adjacent != player.adjacent or bridges != player.bridges:
+                players[position] = replace(player, adjacent = adjacent, bridges = bridges)
+
+        return replace(self,
+                players = tuple(players),
+                bridges = self.bridges | bridge_bit,
+                bridge_adjacency = bridge_adjacency)
+
+    def with_terrain(self, hex_id: int, terrain: Terrain) -> "Bitboard":
+        bit = 1 << hex_id
+        target = _TERRAIN_INDEX[terrain]
+        terrains = tuple(
+                (x | bit) if i == target else (x & ~bit) for i, x in enumerate(self.terrains))
+        return replace(self, terrains = terrains)
+
+    def with_location_structure(self, player_id: str, structure_type: StructureType,
+            location_id: str) -> "Bitboard":
+        """with_structure() or with_bridge(), by location_id."""
+        if structure_type == StructureType.BRIDGE:
+            return self.with_bridge(player_id, self.map_index.bridge_ids_by_location[location_id])
+        return self.with_structure(player_id, structure_type, self.get_hex_id(location_id))
@@ -0,0 +1,608 @@
+"""Compact, versioned binary encoding of GameStates and move lists, and a streaming game archive.
+
+Enumerations and game data are written as small integer ids: Terrain, StructureType, Cult, Phase
+and ResourceType by declaration order, and tiles, factions, actions, hexes and bridge slots by
+their position in the tables below. Integers are LEB128 varints (zigzag encoded where they may be
+negative), so a typical position takes a few hundred bytes and a move a handful.
+
+The id tables are part of the format. Only append to them, and bump CODEC_VERSION when doing so
+or when changing the layout of anything encoded here.
+
+An archive is a header followed by length-prefixed GameRecords (an initial GameState and the moves
+played from it). Records are only ever appended, and are read back one at a time, so an archive
+of any size can be extended or iterated without loading it whole.
+
+Only the default map is supported, and history (previous_state, the log) isn't encoded: a decoded
+GameState starts a new history.
+"""
+import struct
+from dataclasses import dataclass, fields, replace
+from typing import BinaryIO, Callable, Iterator, Tuple
+
+from frozendict import frozendict
+
+from terrabot.sim.action import ActionExecution, AdvanceDigActionExecution, \
+        AdvanceShipActionExecution, BonusSpadeActionExecution, BuildBridgeActionExecution, \
+        CultKeyDecisionActionExecution, CultStepActionExecution, \
+        DeclineBonusSpadesActionExecution, PassActionExecution, Phase, \
+        PlaceInitialDwellingActionExecution, ResourceActionExecution, \
+        SelectFactionActionExecution, SelectTileActionExecution, SendPriestActionExecution, \
+        TransformAndBuildActionExecution, UpgradeStructureActionExecution
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.cult import Cult
+from terrabot.sim.data.actions import ALL_ACTIONS
+from terrabot.sim.data.factions import FACTIONS
+from terrabot.sim.data.maps import DEFAULT_MAP
+from terrabot.sim.data.tiles import BONUS_TILES, FAVOR_TILES, ROUND_TILES, TOWN_TILES
+from terrabot.sim.game import GameState, Move, Setup
+from terrabot.sim.map import Terrain
+from terrabot.sim.packed import NUM_PLAYER_FIELDS, pack_player_state, unpack_player_state
+from terrabot.sim.player import Player, PlayerMetadata, PlayerState
+from terrabot.sim.resource import Conversion, LeechOpportunity, ResourceDelta, ResourceType
+from terrabot.sim.structure import PlayerStructureState, Structure, StructureType
+from terrabot.sim.tile import TileSet
+from terrabot.sim.town import TownTracker, apply_structures
+
+CODEC_VERSION = 4
+
+ARCHIVE_MAGIC = b"TBGA"
+
+# Enumerations, by declaration order
+TERRAINS = tuple(Terrain)
+STRUCTURE_TYPES = tuple(StructureType)
+CULTS = tuple(Cult)
+PHASES = tuple(Phase)
+RESOURCE_TYPES = tuple(ResourceType)
+
+# Every distinct tile. Favor and town tiles have several identical copies, which share an id.
+TILES = tuple({x.name: x for x in ROUND_TILES + BONUS_TILES + FAVOR_TILES + TOWN_TILES}.values())
+
+ACTION_IDS = tuple(x.action_id for x in ALL_ACTIONS)
+
+# Every ActionExecution type which can be encoded, by type id
+EXECUTION_TYPES = (
+        TransformAndBuildActionExecution,
+        AdvanceDigActionExecution,
+        AdvanceShipActionExecution,
+        UpgradeStructureActionExecution,
+        SendPriestActionExecution,
+        PassActionExecution,
+        BuildBridgeActionExecution,
+        ResourceActionExecution,
+        CultStepActionExecution,
+        SelectFactionActionExecution,
+        PlaceInitialDwellingActionExecution,
+        SelectTileActionExecution,
+        CultKeyDecisionActionExecution,
+        BonusSpadeActionExecution,
+        DeclineBonusSpadesActionExecution)
+
+_TERRAIN_IDS = frozendict({x: i for i, x in enumerate(TERRAINS)})
+_STRUCTURE_TYPE_IDS = frozendict({x: i for i, x in enumerate(STRUCTURE_TYPES)})
+_CULT_IDS = frozendict({x: i for i, x in enumerate(CULTS)})
+_PHASE_IDS = frozendict({x: i for i, x in enumerate(PHASES)})
+_RESOURCE_TYPE_IDS = frozendict({x: i for i, x in enumerate(RESOURCE_TYPES)})
+_TILE_IDS = frozendict({x.name: i for i, x in enumerate(TILES)})
+_FACTION_IDS = frozendict({x.name: i for i, x in enumerate(FACTIONS)})
+_ACTION_IDS = frozendict({x: i for i, x in enumerate(ACTION_IDS)})
+_EXECUTION_TYPE_IDS = frozendict({x: i for i, x in enumerate(EXECUTION_TYPES)})
+
+# Structures are replayed onto the board with towns disabled, then the saved towns are restored
+_NO_TOWN_POWER_REQUIREMENT = 1 << 30
+
+_RECORD_LENGTH = struct.Struct("<I")
+
+
+class _Writer:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def uint(self, value: int):
+        if value < 0:
+            raise ValueError(f"Can't encode {value} as an unsigned integer")
+        while value > 0x7f:
+            self.buffer.append((value & 0x7f) | 0x80)
+            value >>= 7
+        self.buffer.append(value)
+
+    def int(self, value: int):
+        self.uint((value << 1) if value >= 0 else ((-value << 1) - 1))
+
+    def bool(self, value: bool):
+        self.buffer.append(1 if value else 0)
+
+    def optional(self, value_id: int):
+        """An id which may be None."""
+        self.uint(0 if value_id is None else value_id + 1)
+
+    def str(self, value: str):
+        encoded = value.encode()
+        self.uint(len(encoded))
+        self.buffer.extend(encoded)
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def uint(self) -> int:
+        data = self.data
+        value = 0
+        shift = 0
+        while True:
+            byte = data[self.offset]
+            self.offset += 1
+            value |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return value
+            shift += 7
+
+    def int(self) -> int:
+        value = self.uint()
+        return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+    def bool(self) -> bool:
+        value = self.data[self.offset]
+        self.offset += 1
+        return bool(value)
+
+    def optional(self) -> int:
+        value = self.uint()
+        return None if value == 0 else value - 1
+
+    def str(self) -> str:
+        length = self.uint()
+        value = bytes(self.data[self.offset:self.offset + length]).decode()
+        self.offset += length
+        return value
+
+
+def _check_version(reader: _Reader):
+    version = reader.uint()
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported codec version {version}, expected {CODEC_VERSION}")
+
+
+def _get_location_id(location: str) -> int:
+    """Hexes, then bridge slots."""
+    map_index = DEFAULT_MAP.index
+    if location in map_index.ids_by_location:
+        return map_index.ids_by_location[location]
+    return map_index.num_hexes + map_index.bridge_ids_by_location[location]
+
+
+def _get_location(location_id: int) -> str:
+    map_index = DEFAULT_MAP.index
+    if location_id < map_index.num_hexes:
+        return map_index.location_ids[location_id]
+    return map_index.bridge_location_ids[location_id - map_index.num_hexes]
+
+
+def _write_resources(writer: _Writer, value: ResourceDelta):
+    writer.int(value.coins)
+    writer.int(value.workers)
+    writer.int(value.priests)
+    writer.int(value.power)
+    writer.int(value.victory_points)
+
+
+def _read_resources(reader: _Reader) -> ResourceDelta:
+    return ResourceDelta(reader.int(), reader.int(), reader.int(), reader.int(), reader.int())
+
+
+def _write_tiles(writer: _Writer, tiles):
+    writer.uint(len(tiles))
+    for tile in tiles:
+        writer.uint(_TILE_IDS[tile.name])
+
+
+def _read_tiles(reader: _Reader) -> tuple:
+    return tuple(TILES[reader.uint()] for _ in range(reader.uint()))
+
+
+def _write_tile_set(writer: _Writer, tile_set: TileSet):
+    _write_tiles(writer, tile_set.bonus_tiles)
+    _write_tiles(writer, tile_set.favor_tiles)
+    _write_tiles(writer, tile_set.town_tiles)
+
+
+def _read_tile_set(reader: _Reader) -> TileSet:
+    return TileSet(_read_tiles(reader), _read_tiles(reader), _read_tiles(reader))
+
+
+def _write_uints(writer: _Writer, values: Tuple[int, ...]):
+    writer.uint(len(values))
+    for value in values:
+        writer.uint(value)
+
+
+def _read_uints(reader: _Reader) -> Tuple[int, ...]:
+    return tuple(reader.uint() for _ in range(reader.uint()))
+
+
+def _write_action_slot(writer: _Writer, action_slot: str):
+    """An action id, and the turn position of the player it belongs to if it isn't shared."""
+    if action_slot is None:
+        writer.optional(None)
+        return
+    action_id, _, player_id = action_slot.partition("/")
+    writer.optional(_ACTION_IDS[action_id])
+    writer.optional(int(player_id[len("player"):]) if player_id else None)
+
+
+def _read_action_slot(reader: _Reader) -> str:
+    action_index = reader.optional()
+    if action_index is None:
+        return None
+    action_id = ACTION_IDS[action_index]
+    position = reader.optional()
+    if position is None:
+        return action_id
+    return f"{action_id}/{Player.create_player_id(position)}"
+
+
+def _optional_codec(ids: frozendict, values: tuple, key: Callable = lambda x: x):
+    def write(writer: _Writer, value):
+        writer.optional(None if value is None else ids[key(value)])
+    def read(reader: _Reader):
+        index = reader.optional()
+        return None if index is None else values[index]
+    return write, read
+
+
+# (write, read) by ActionExecution field name
+_FIELD_CODECS = frozendict({
+    "cost": (_write_resources, _read_resources),
+    "resources_provided": (_write_resources, _read_resources),
+    "location": (lambda w, x: w.uint(_get_location_id(x)), lambda r: _get_location(r.uint())),
+    "new_terrain": _optional_codec(_TERRAIN_IDS, TERRAINS),
+    "structure_type": _optional_codec(_STRUCTURE_TYPE_IDS, STRUCTURE_TYPES),
+    "cult": _optional_codec(_CULT_IDS, CULTS),
+    "build_dwelling": (_Writer.bool, _Reader.bool),
+    "free_spades": (_Writer.uint, _Reader.uint),
+    "steps": (_Writer.uint, _Reader.uint),
+    "action_slot": (_write_action_slot, _read_action_slot),
+    "bonus_tile": _optional_codec(_TILE_IDS, TILES, lambda x: x.name),
+    "tile": _optional_codec(_TILE_IDS, TILES, lambda x: x.name),
+    "faction": _optional_codec(_FACTION_IDS, FACTIONS, lambda x: x.name),
+})
+
+
+def _get_field_names(execution_type: type) -> Tuple[str, ...]:
+    return tuple(x.name for x in fields(execution_type))
+
+
+_FIELD_NAMES = tuple(_get_field_names(x) for x in EXECUTION_TYPES)
+
+
+def _write_execution(writer: _Writer, execution: ActionExecution):
+    type_id = _EXECUTION_TYPE_IDS.get(type(execution))
+    if type_id is None:
+        raise ValueError(f"Can't encode a {type(execution).__name__}")
+    writer.uint(type_id)
+    for name in _FIELD_NAMES[type_id]:
+        _FIELD_CODECS[name][0](writer, getattr(execution, name))
+
+
+def _read_execution(reader: _Reader) -> ActionExecution:
+    type_id = reader.uint()
+    return EXECUTION_TYPES[type_id](
+            **{x: _FIELD_CODECS[x][1](reader) for x in _FIELD_NAMES[type_id]})
+
+
+#------------------------------------
+# Moves
+def _write_conversions(writer: _Writer, conversions: Tuple[Conversion, ...]):
+    writer.uint(len(conversions))
+    for conversion in conversions:
+        writer.uint(_RESOURCE_TYPE_IDS[conversion.from_])
+        writer.uint(_RESOURCE_TYPE_IDS[conversion.to])
+        writer.uint(conversion.quantity_produced)
+
+
+def _read_conversions(reader: _Reader) -> Tuple[Conversion, ...]:
+    return tuple(
+            Conversion(RESOURCE_TYPES[reader.uint()], RESOURCE_TYPES[reader.uint()], reader.uint())
+            for _ in range(reader.uint()))
+
+
+def _write_move(writer: _Writer, move: Move):
+    _write_execution(writer, move.execution)
+    leech_decisions = move.leech_decisions
+    writer.uint(len(leech_decisions))
+    writer.uint(sum(1 << i for i, x in enumerate(leech_decisions) if x))
+    _write_conversions(writer, tuple(move.conversions_before_action))
+    _write_conversions(writer, tuple(move.conversions_after_action))
+
+
+def _read_move(reader: _Reader) -> Move:
+    execution = _read_execution(reader)
+    num_leech = reader.uint()
+    leech_mask = reader.uint()
+    return Move(
+            execution = execution,
+            leech_decisions = tuple(bool(leech_mask >> i & 1) for i in range(num_leech)),
+            conversions_before_action = _read_conversions(reader),
+            conversions_after_action = _read_conversions(reader))
+
+
+def _write_moves(writer: _Writer, moves: Tuple[Move, ...]):
+    writer.uint(len(moves))
+    for move in moves:
+        _write_move(writer, move)
+
+
+def _read_moves(reader: _Reader) -> Tuple[Move, ...]:
+    return tuple(_read_move(reader) for _ in range(reader.uint()))
+
+
+def encode_moves(moves: Tuple[Move, ...]) -> bytes:
+    writer = _Writer()
+    writer.uint(CODEC_VERSION)
+    _write_moves(writer, moves)
+    return bytes(writer.buffer)
+
+
+def decode_moves(data: bytes) -> Tuple[Move, ...]:
+    reader = _Reader(data)
+    _check_version(reader)
+    return _read_moves(reader)
+
+
+#------------------------------------
+# Game states
+def _write_player_state(writer: _Writer, player_state: PlayerState):
+    for value in pack_player_state(player_state):
+        writer.int(value)
+    _write_tile_set(writer, player_state.tiles)
+    structures = player_state.structures.structures
+    writer.uint(len(structures))
+    for structure in structures:
+        writer.uint(_STRUCTURE_TYPE_IDS[structure.structure_type])
+        writer.uint(_get_location_id(structure.location))
+    writer.bool(player_state.has_passed)
+    writer.uint(len(player_state.leech_opportunities))
+    for opportunity in player_state.leech_opportunities:
+        writer.uint(opportunity.amount)
+        writer.uint(int(opportunity.from_player_id[len("player"):]))
+    writer.uint(player_state.town_tile_decisions)
+    writer.uint(player_state.favor_tile_decisions)
+    writer.uint(player_state.cult_key_decisions)
+    _write_uints(writer, tuple(_CULT_IDS[x] for x in player_state.contested_cults))
+    writer.uint(player_state.bonus_spade_decisions)
+    writer.uint(player_state.towns.num_towns)
+    _write_uints(writer, player_state.towns.get_town_hex_ids())
+
+
+def _read_player_state(reader: _Reader) -> Tuple[PlayerState, Tuple[int, ...]]:
+    """The PlayerState, with an empty TownTracker, and the town hexes to restore."""
+    packed = tuple(reader.int() for _ in range(NUM_PLAYER_FIELDS))
+    tiles = _read_tile_set(reader)
+    structures = tuple(
+            Structure(STRUCTURE_TYPES[reader.uint()], _get_location(reader.uint()))
+            for _ in range(reader.uint()))
+    has_passed = reader.bool()
+    leech_opportunities = tuple(
+            LeechOpportunity(reader.uint(), Player.create_player_id(reader.uint()))
+            for _ in range(reader.uint()))
+    template = PlayerState(
+            tiles = tiles,
+            structures = PlayerStructureState(structures),
+            has_passed = has_passed,
+            leech_opportunities = leech_opportunities,
+            town_tile_decisions = reader.uint(),
+            favor_tile_decisions = reader.uint(),
+            cult_key_decisions = reader.uint(),
+            contested_cults = tuple(CULTS[x] for x in _read_uints(reader)),
+            bonus_spade_decisions = reader.uint())
+    num_towns = reader.uint()
+    return unpack_player_state(packed, template), (num_towns, _read_uints(reader))
+
+
+def _write_game_state(writer: _Writer, game_state: GameState):
+    if game_state.map is not DEFAULT_MAP:
+        raise ValueError("Only games on the default map can be encoded")
+
+    writer.uint(game_state.num_players)
+    _write_tiles(writer, game_state.setup.round_tiles)
+    _write_tiles(writer, game_state.setup.bonus_tiles)
+    for player in game_state.players:
+        writer.str(player.player_metadata.name)
+        writer.optional(None if player.faction is None else _FACTION_IDS[player.faction.name])
+        writer.bool(player.player_state is not None)
+        if player.player_state is not None:
+            _write_player_state(writer, player.player_state)
+    _write_tile_set(writer, game_state.pool)
+    writer.uint(game_state.active_player_position)
+    writer.uint(game_state.round)
+    writer.uint(_PHASE_IDS[game_state.phase])
+    writer.uint(len(game_state.expended_action_slots))
+    for action_slot in game_state.expended_action_slots:
+        _write_action_slot(writer, action_slot)
+    _write_uints(writer, game_state.turn_order)
+    _write_uints(writer, game_state.pass_order)
+    writer.uint(len(game_state.bonus_tile_coins))
+    for name, coins in game_state.bonus_tile_coins.items():
+        writer.uint(_TILE_IDS[name])
+        writer.uint(coins)
+    for spaces in game_state.priest_spaces:
+        _write_uints(writer, spaces)
+
+    # Terrain which differs from the map
+    board = game_state.board
+    terrains = DEFAULT_MAP.index.terrains
+    changes = tuple(
+            (hex_id, terrain) for hex_id, terrain in enumerate(terrains)
+            if not board.get_terrain_mask(terrain) & (1 << hex_id))
+    writer.uint(len(changes))
+    for hex_id, _ in changes:
+        writer.uint(hex_id)
+        writer.uint(_TERRAIN_IDS[board.get_terrain(hex_id)])
+
+
+def _read_game_state(reader: _Reader) -> GameState:
+    num_players = reader.uint()
+    setup = Setup(_read_tiles(reader), _read_tiles(reader))
+
+    players = []
+    saved_towns = []
+    for position in range(num_players):
+        player_metadata = PlayerMetadata(reader.str())
+        faction_id = reader.optional()
+        faction = FACTIONS[faction_id] if faction_id is not None else None
+        player_state = None
+        towns = (0, ())
+        if reader.bool():
+            player_state, towns = _read_player_state(reader)
+        players.append(Player(player_metadata, position, Player.create_player_id(position),
+                faction, player_state))
+        saved_towns.append(towns)
+
+    pool = _read_tile_set(reader)
+    active_player_position = reader.uint()
+    round_ = reader.uint()
+    phase = PHASES[reader.uint()]
+    expended_action_slots = tuple(_read_action_slot(reader) for _ in range(reader.uint()))
+    turn_order = _read_uints(reader)
+    pass_order = _read_uints(reader)
+    bonus_tile_coins = frozendict(
+            (TILES[reader.uint()].name, reader.uint()) for _ in range(reader.uint()))
+    priest_spaces = tuple(_read_uints(reader) for _ in CULTS)
+
+    board = Bitboard.create(DEFAULT_MAP, tuple(x.player_id for x in players))
+    for _ in range(reader.uint()):
+        hex_id = reader.uint()
+        board = board.with_terrain(hex_id, TERRAINS[reader.uint()])
+    round_tile = setup.round_tiles[round_ - 1] if 1 <= round_ <= len(setup.round_tiles) else None
+    for position, player in enumerate(players):
+        if player.player_state is None:
+            continue
+        towns, board, _ = apply_structures(TownTracker(), board, player.player_id,
+                player.player_state.structures.structures, _NO_TOWN_POWER_REQUIREMENT)
+        num_towns, town_hex_ids = saved_towns[position]
+        player_state = player.player_state
+        players[position] = replace(player, player_state = replace(player_state,
+                towns = towns.with_towns(town_hex_ids, num_towns),
+                income = player.faction.get_income(player_state),
+                event_resources = player.faction.get_event_resources(player_state, round_tile)))
+
+    return GameState(
+            players = tuple(players),
+            num_players = num_players,
+            setup = setup,
+            pool = pool,
+            active_player_position = active_player_position,
+            round = round_,
+            phase = phase,
+            board = board,
+            expended_action_slots = expended_action_slots,
+            turn_order = turn_order,
+            pass_order = pass_order,
+            bonus_tile_coins = bonus_tile_coins,
+            priest_spaces = priest_spaces)
+
+
+def encode_game_state(game_state: GameState) -> bytes:
+    writer = _Writer()
+    writer.uint(CODEC_VERSION)
+    _write_game_state(writer, game_state)
+    return bytes(writer.buffer)
+
+
+def decode_game_state(data: bytes) -> GameState:
+    reader = _Reader(data)
+    _check_version(reader)
+    return _read_game_state(reader)
+
+
+#------------------------------------
+# Archives
+@dataclass(frozen=True)
+class GameRecord:
+    initial_state: GameState
+    moves: Tuple[Move, ...]
+
+    def iterate_states(self) -> Iterator[GameState]:
+        """The initial state, then the state after each move."""
+        game_state = self.initial_state
+        yield game_state
+        for move in self.moves:
+            game_state = move.apply(game_state)
+            yield game_state
+
+    def get_final_state(self) -> GameState:
+        for game_state in self.iterate_states():
+            pass
+        return game_state
+
+
+def encode_game_record(record: GameRecord) -> bytes:
+    writer = _Writer()
+    _write_game_state(writer, record.initial_state)
+    _write_moves(writer, record.moves)
+    return bytes(writer.buffer)
+
+
+def decode_game_record(data: bytes) -> GameRecord:
+    reader = _Reader(data)
+    return GameRecord(_read_game_state(reader), _read_moves(reader))
+
+
+def _get_archive_header() -> bytes:
+    writer = _Writer()
+    writer.uint(CODEC_VERSION)
+    return ARCHIVE_MAGIC + bytes(writer.buffer)
+
+
+def _read_archive_header(file: BinaryIO):
+    header = _get_archive_header()
+    found = file.read(len(header))
+    if found[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+        raise ValueError("Not a game archive")
+    if found != header:
+        raise ValueError(f"Unsupported game archive version, expected {CODEC_VERSION}")
+
+
+class ArchiveWriter:
+    """Appends GameRecords to an archive file, creating it if necessary."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "ab+")
+        if self.file.tell() == 0:
+            self.file.write(_get_archive_header())
+        else:
+            self.file.seek(0)
+            _read_archive_header(self.file)
+            self.file.seek(0, 2)
+
+    def write(self, record: GameRecord):
+        data = encode_game_record(record)
+        self.file.write(_RECORD_LENGTH.pack(len(data)))
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iterate_archive(path: str) -> Iterator[GameRecord]:
+    """Yield each GameRecord in an archive, reading one record at a time."""
+    with open(path, "rb") as file:
+        _read_archive_header(file)
+        while True:
+            prefix = file.read(_RECORD_LENGTH.size)
+            if not prefix:
+                return
+            if len(prefix) < _RECORD_LENGTH.size:
+                raise ValueError("Truncated game record")
+            (length,) = _RECORD_LENGTH.unpack(prefix)
+            data = file.read(length)
+            if len(data) < length:
+                raise ValueError("Truncated game record")
+            yield decode_game_record(data)
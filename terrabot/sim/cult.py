@@ -1,6 +1,10 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from enum import Enum, auto
-from typing import Tuple
+from typing import Optional, Sequence, Tuple
+
+from frozendict import frozendict
+
+from terrabot.util import get_placing_points, intern, slotted
 
 class Cult(Enum):
     FIRE = auto()
@@ -9,12 +13,46 @@ class Cult(Enum):
     AIR = auto()
 
 
-@dataclass
+CULTS = tuple(Cult)
+NUM_CULTS = len(CULTS)
+_CULT_INDEXES = frozendict({x: i for i, x in enumerate(CULTS)})
+
+MAX_CULT_POSITION = 10
+
+# Power gained by passing each position of a cult track
+_THRESHOLD_POWER = frozendict({3: 1, 5: 2, 7: 2, 10: 3})
+
+# CULT_POWER_GAINS[a][b] is the power gained by moving from position a to position b
+CULT_POWER_GAINS = tuple(
+        tuple(sum(v for k, v in _THRESHOLD_POWER.items() if a < k <= b)
+                for b in range(MAX_CULT_POSITION + 1))
+        for a in range(MAX_CULT_POSITION + 1))
+
+# Points for the most, second and third most advanced players on each track at the end of the game
+CULT_MAJORITY_POINTS = (8, 4, 2)
+
+# The spaces beside each track which a priest stays on once sent there, by the steps each advances.
+# A priest may always be sent for 1 step instead, and then returns to the supply.
+PRIEST_SPACE_STEPS = (3, 2, 2, 2)
+
+# No priests on any track
+NO_PRIESTS = ((),) * NUM_CULTS
+
+
+@slotted
+@dataclass(frozen=True)
 class CultDelta:
     steps: Tuple[Cult, ...] = ()
+    counts: Tuple[int, ...] = field(init=False, repr=False, compare=False) # steps, in CULTS order
+
+    def __post_init__(self):
+        object.__setattr__(self, "counts", tuple(self.steps.count(x) for x in CULTS))
 
     def by_cult(self, cult) -> int:
-        return self.steps.count(cult)
+        return self.counts[_CULT_INDEXES[cult]]
+
+
+NO_CULT_STEPS = intern(CultDelta())
 
 
 @dataclass
@@ -24,26 +62,125 @@ class PlayerCultState:
     earth: int = 0
     air: int = 0
 
-    def by_cult(self, cult) -> Cult:
-        if cult == Cult.FIRE:
-            return self.fire
-        elif cult == Cult.WATER:
-            return self.water
-        elif cult == Cult.EARTH:
-            return self.earth
-        elif cult == Cult.AIR:
-            return self.air
-        else:
-            raise AssertionError("Unrecognized Cult")
+    def by_cult(self, cult) -> int:
+        return self.get_positions()[_CULT_INDEXES[cult]]
 
+    def get_positions(self) -> Tuple[int, ...]:
+        """Positions in CULTS order."""
+        return (self.fire, self.water, self.earth, self.air)
 
-@dataclass
+    def add(self, cult_delta: CultDelta) -> "PlayerCultState":
+        """Move without regard to keys or power, as when placing the starting cult steps. Moves
+        during the game go through CultTrackState.advance().
+        """
+        return PlayerCultState(*(min(x + y, MAX_CULT_POSITION)
+                for x, y in zip(self.get_positions(), cult_delta.counts)))
+
+
+@dataclass(frozen=True)
+class CultAdvance:
+    """The outcome of moving one player along the cult tracks."""
+    cult_state: PlayerCultState
+    power: int # gained from the positions passed
+    # Tracks the player could enter step 10 of but has too few keys for all of, left at step 9
+    # until they choose which of them to use their keys on
+    contested_cults: Tuple[Cult, ...] = ()
+    num_key_decisions: int = 0
+
+
+@dataclass(frozen=True)
 class CultTrackState:
-    player_states: Tuple[PlayerCultState, ...]
-    priest_slots_fire: Tuple[str, str, str, str]
-    priest_slots_fire: Tuple[str, str, str, str]
+    """Every player's position on every cult track, as a flat 4 x N array in CULTS order, so that
+    positions[i * num_players + p] is the position on CULTS[i] of the player in turn position p.
+
+    Only one player may occupy step 10 of each track, and entering it takes a key. Players earn a
+    key with each town and use one up for each track they are at the top of.
+
+    priest_spaces holds the steps of the occupied PRIEST_SPACE_STEPS of each track, in CULTS order
+    and largest first.
+    """
+    num_players: int
+    positions: Tuple[int, ...]
+    priest_spaces: Tuple[Tuple[int, ...], ...] = NO_PRIESTS
+
+    @staticmethod
+    def create(cult_states: Sequence[Optional[PlayerCultState]],
+            priest_spaces: Tuple[Tuple[int, ...], ...] = NO_PRIESTS) -> "CultTrackState":
+        """From each player's PlayerCultState in turn position order, or None before they have
+        one.
+        """
+        rows = [x.get_positions() if x is not None else (0,) * NUM_CULTS for x in cult_states]
+        return CultTrackState(len(rows), tuple(x[i] for i in range(NUM_CULTS) for x in rows),
+                priest_spaces)
+
+    def get_player_positions(self, player_index: int) -> Tuple[int, ...]:
+        return self.positions[player_index::self.num_players]
+
+    def _is_top_taken(self, cult_index: int, player_index: int) -> bool:
+        start = cult_index * self.num_players
+        return any(x == MAX_CULT_POSITION
+                for i, x in enumerate(self.positions[start:start + self.num_players])
+                if i != player_index)
+
+    def get_advanceable_cults(self, player_index: int, num_keys: int) -> Tuple[Cult, ...]:
+        """Tracks on which the player could move up at least one step."""
+        row = self.get_player_positions(player_index)
+        has_spare_key = num_keys > row.count(MAX_CULT_POSITION)
+        return tuple(cult for i, cult in enumerate(CULTS)
+                if row[i] < MAX_CULT_POSITION - 1 or (row[i] == MAX_CULT_POSITION - 1
+                        and has_spare_key and not self._is_top_taken(i, player_index)))
+
+    def get_open_priest_spaces(self, cult: Cult) -> Tuple[int, ...]:
+        """The steps of each kind of space beside the track a priest could still be sent to,
+        largest first.
+        """
+        open_spaces = list(PRIEST_SPACE_STEPS)
+        for steps in self.priest_spaces[_CULT_INDEXES[cult]]:
+            open_spaces.remove(steps)
+        return tuple(sorted(set(open_spaces), reverse=True))
+
+    def place_priest(self, cult: Cult, steps: int) -> "CultTrackState":
+        """Occupy one of the track's spaces advancing the given number of steps."""
+        index = _CULT_INDEXES[cult]
+        if steps not in self.get_open_priest_spaces(cult):
+            raise ValueError(f"No {steps} step space is open on the {cult.name} track")
+        spaces = tuple(sorted(self.priest_spaces[index] + (steps,), reverse=True))
+        return replace(self, priest_spaces =
+                self.priest_spaces[:index] + (spaces,) + self.priest_spaces[index + 1:])
 
-    def for_player(player_label: str) -> PlayerCultState:
-        return
+    def advance(self, player_index: int, cult_delta: CultDelta, num_keys: int) -> CultAdvance:
+        """Move a player on all four tracks at once. num_keys is the number of keys they have
+        earned, including any used up already.
+        """
+        row = self.get_player_positions(player_index)
+        targets = [min(x + y, MAX_CULT_POSITION) for x, y in zip(row, cult_delta.counts)]
+        spare_keys = num_keys - row.count(MAX_CULT_POSITION)
+        entering = [i for i in range(NUM_CULTS)
+                if targets[i] == MAX_CULT_POSITION and row[i] < MAX_CULT_POSITION]
+        contested = ()
+        if entering:
+            open_tracks = [i for i in entering if not self._is_top_taken(i, player_index)]
+            blocked = entering if len(open_tracks) > spare_keys else \
+                    [i for i in entering if i not in open_tracks]
+            for i in blocked:
+                targets[i] = MAX_CULT_POSITION - 1
+            if 0 < spare_keys < len(open_tracks):
+                contested = tuple(CULTS[i] for i in open_tracks)
 
+        power = sum(CULT_POWER_GAINS[x][y] for x, y in zip(row, targets))
+        return CultAdvance(PlayerCultState(*targets), power, contested,
+                spare_keys if contested else 0)
 
+    def get_majority_points(self, points: Tuple[int, ...] = CULT_MAJORITY_POINTS) \
+            -> Tuple[int, ...]:
+        """Each player's points for their standing on the tracks at the end of the game. Players
+        tied for a place share the points of the places they span, rounded down, and players who
+        never left step 0 of a track score nothing for it.
+        """
+        num_players = self.num_players
+        totals = [0] * num_players
+        for start in range(0, len(self.positions), num_players):
+            track = self.positions[start:start + num_players]
+            for i, track_points in enumerate(get_placing_points(track, points)):
+                totals[i] += track_points
+        return tuple(totals)
@@ -51,11 +51,17 @@ POWER_ACTIONS = (
         POWER_ACTION_4,
         POWER_ACTION_5,
         POWER_ACTION_6)
-POWER_ACTION_IDS = (x.action_id for x in POWER_ACTIONS)
+POWER_ACTION_IDS = tuple(x.action_id for x in POWER_ACTIONS)
 
-BONUS_TILE_SPADE_ACTION = TileSlotAction(action_id = "Action-BonusTile-Spade-(BON1)")
-BONUS_TILE_CULT_ACTION = TileSlotAction(action_id = "Action-BonusTile-Cult-(BON2)")
-FAVOR_TILE_CULT_ACTION = TileSlotAction(action_id = "Action-FavorTile-Cult-(FAV6)")
+BONUS_TILE_SPADE_ACTION = TileSlotAction(
+        action_id = "Action-BonusTile-Spade-(BON1)",
+        spades_provided = 1)
+BONUS_TILE_CULT_ACTION = TileSlotAction(
+        action_id = "Action-BonusTile-Cult-(BON2)",
+        cult_steps_provided = 1)
+FAVOR_TILE_CULT_ACTION = TileSlotAction(
+        action_id = "Action-FavorTile-Cult-(FAV6)",
+        cult_steps_provided = 1)
 
 TILE_SLOT_ACTIONS = (
         BONUS_TILE_SPADE_ACTION,
@@ -66,7 +72,44 @@ FACTION_SPECIAL_ACTIONS = ( )
 
 SPECIAL_ACTIONS = TILE_SLOT_ACTIONS + FACTION_SPECIAL_ACTIONS
 
-OFF_TURN_ACTIONS = ( )
+SELECT_FACTION_ACTION = SelectFactionAction(
+        action_id = "Action-SelectFaction",
+        phase = Phase.SELECT_FACTION)
+PLACE_INITIAL_DWELLING_ACTION = PlaceInitialDwellingAction(
+        action_id = "Action-PlaceInitialDwelling",
+        phase = Phase.PLACE_INITIAL_DWELLING)
+SELECT_INITIAL_BONUS_TILE_ACTION = SelectInitialBonusTileAction(
+        action_id = "Action-SelectInitialBonusTile",
+        phase = Phase.SELECT_INITIAL_BONUS_TILE)
+SELECT_TOWN_TILE_ACTION = SelectTownTileAction(
+        action_id = "Action-SelectTownTile",
+        phase = Phase.SELECT_TOWN_TILE)
+SELECT_FAVOR_TILE_ACTION = SelectFavorTileAction(
+        action_id = "Action-SelectFavorTile",
+        phase = Phase.SELECT_FAVOR_TILE)
+MAKE_LEECH_DECISION_ACTION = MakeLeechDecisionAction(
+        action_id = "Action-MakeLeechDecision",
+        phase = Phase.LEECH_DECISION)
+MAKE_BONUS_SPADE_DECISION_ACTION = MakeBonusSpadeDecisionAction(
+        action_id = "Action-MakeBonusSpadeDecision",
+        phase = Phase.BONUS_SPADE_DECISION)
+MAKE_CULTIST_DECISION_ACTION = MakeCultistDecisionAction(
+        action_id = "Action-MakeCultistDecision",
+        phase = Phase.CULTIST_DECISION)
+MAKE_CULT_TRACK_DECISION_ACTION = MakeCultTrackDecisionAction(
+        action_id = "Action-MakeCultTrackDecision",
+        phase = Phase.CULT_TRACK_DECISION)
+
+OFF_TURN_ACTIONS = (
+        SELECT_FACTION_ACTION,
+        PLACE_INITIAL_DWELLING_ACTION,
+        SELECT_INITIAL_BONUS_TILE_ACTION,
+        SELECT_TOWN_TILE_ACTION,
+        SELECT_FAVOR_TILE_ACTION,
+        MAKE_LEECH_DECISION_ACTION,
+        MAKE_BONUS_SPADE_DECISION_ACTION,
+        MAKE_CULTIST_DECISION_ACTION,
+        MAKE_CULT_TRACK_DECISION_ACTION)
 
 ALL_ACTIONS = STANDARD_ACTIONS + POWER_ACTIONS + SPECIAL_ACTIONS + OFF_TURN_ACTIONS
 
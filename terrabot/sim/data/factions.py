@@ -1,12 +1,85 @@
+from frozendict import frozendict
+
+from terrabot.sim.cult import Cult, CultDelta
+from terrabot.sim.event import PassTrigger
 from terrabot.sim.map import Terrain
 from terrabot.sim.player import Faction
-from terrabot.sim.resources import ResourceType, _DEFAULT_CONVERSION_RATES
+from terrabot.sim.resource import ResourceDelta, ResourceType, _DEFAULT_CONVERSION_RATES
+from terrabot.sim.structure import StructureType
+from terrabot.util import frozendict_with_item
 
-FACTIONS = tuple(
+# Only the home terrain, starting resources, starting cult steps, starting shipping, the
+# Alchemists' conversion of points to coins and the Engineers' points for bridges differ between
+# these factions. Otherwise every faction has the default costs and income, and no special
+# abilities or stronghold action.
+FACTIONS = (
+        Faction(
+                name = "Witches",
+                home_terrain = Terrain.FOREST,
+                starting_cult_steps = CultDelta((Cult.AIR, Cult.AIR))),
+        Faction(
+                name = "Auren",
+                home_terrain = Terrain.FOREST,
+                starting_cult_steps = CultDelta((Cult.WATER, Cult.AIR))),
         Faction(
                 name = "Alchemists",
                 home_terrain = Terrain.SWAMP,
+                starting_cult_steps = CultDelta((Cult.FIRE, Cult.WATER)),
                 resource_conversion_rates = frozendict_with_item(
-                        _DEFAULT_CONVERSION_RATES, (ResourceType.POINTS, ResourceType.COINS), 1)
-                )
-        )
+                        _DEFAULT_CONVERSION_RATES, (ResourceType.POINTS, ResourceType.COINS), 1)),
+        Faction(
+                name = "Darklings",
+                home_terrain = Terrain.SWAMP,
+                starting_resources = ResourceDelta(coins=15, workers=1, priests=1, power=7),
+                starting_cult_steps = CultDelta((Cult.WATER, Cult.EARTH))),
+        Faction(
+                name = "Halflings",
+                home_terrain = Terrain.FIELD,
+                starting_cult_steps = CultDelta((Cult.EARTH, Cult.AIR))),
+        Faction(
+                name = "Cultists",
+                home_terrain = Terrain.FIELD,
+                starting_cult_steps = CultDelta((Cult.FIRE, Cult.EARTH))),
+        Faction(
+                name = "Engineers",
+                home_terrain = Terrain.MOUNTAIN,
+                starting_resources = ResourceDelta(coins=10, workers=2, power=9),
+                stronghold_pass_trigger = PassTrigger.per_structure(3, StructureType.BRIDGE)),
+        Faction(
+                name = "Dwarves",
+                home_terrain = Terrain.MOUNTAIN,
+                starting_cult_steps = CultDelta((Cult.EARTH, Cult.EARTH))),
+        Faction(
+                name = "Mermaids",
+                home_terrain = Terrain.LAKE,
+                starting_ship_level = 1,
+                max_ship_level = 5,
+                starting_resources = ResourceDelta(coins=15, workers=3, power=9),
+                starting_cult_steps = CultDelta((Cult.WATER, Cult.WATER))),
+        Faction(
+                name = "Swarmlings",
+                home_terrain = Terrain.LAKE,
+                starting_resources = ResourceDelta(coins=20, workers=8, power=9),
+                starting_cult_steps = CultDelta((Cult.FIRE, Cult.WATER, Cult.EARTH, Cult.AIR))),
+        Faction(
+                name = "Chaos Magicians",
+                home_terrain = Terrain.WASTELAND,
+                place_last = True,
+                starting_resources = ResourceDelta(coins=15, workers=4, power=7),
+                starting_cult_steps = CultDelta((Cult.FIRE, Cult.FIRE))),
+        Faction(
+                name = "Giants",
+                home_terrain = Terrain.WASTELAND,
+                starting_cult_steps = CultDelta((Cult.FIRE, Cult.AIR))),
+        Faction(
+                name = "Fakirs",
+                home_terrain = Terrain.DESERT,
+                max_ship_level = 1,
+                starting_cult_steps = CultDelta((Cult.FIRE, Cult.AIR))),
+        Faction(
+                name = "Nomads",
+                home_terrain = Terrain.DESERT,
+                starting_resources = ResourceDelta(coins=15, workers=2, power=9),
+                starting_cult_steps = CultDelta((Cult.FIRE, Cult.EARTH))))
+
+FACTIONS_BY_NAME = frozendict({x.name: x for x in FACTIONS})
@@ -1,3 +1,23 @@
-from terrabot.sim.map import Map
+from terrabot.sim.map import Map, Terrain
 
-DEFAULT_MAP = Map((), ())
+_K = Terrain.MOUNTAIN
+_Y = Terrain.DESERT
+_U = Terrain.FIELD
+_S = Terrain.SWAMP
+_B = Terrain.LAKE
+_G = Terrain.FOREST
+_R = Terrain.WASTELAND
+_I = Terrain.RIVER
+
+_DEFAULT_MAP_ROWS = (
+        (_U, _K, _G, _B, _Y, _R, _U, _S, _R, _G, _B, _R, _S),
+        (_Y, _I, _I, _U, _S, _I, _I, _Y, _S, _I, _I, _Y),
+        (_I, _I, _S, _I, _K, _I, _G, _I, _G, _I, _K, _I, _I),
+        (_G, _B, _Y, _I, _I, _R, _B, _I, _R, _I, _R, _U),
+        (_S, _U, _R, _B, _S, _U, _K, _Y, _I, _I, _G, _S, _B),
+        (_K, _G, _I, _I, _Y, _G, _I, _I, _I, _U, _K, _U),
+        (_I, _I, _I, _K, _I, _R, _I, _G, _I, _Y, _S, _B, _Y),
+        (_Y, _B, _U, _I, _I, _I, _B, _S, _I, _K, _U, _K),
+        (_R, _S, _K, _B, _R, _G, _Y, _U, _K, _I, _B, _G, _R))
+
+DEFAULT_MAP = Map.create(_DEFAULT_MAP_ROWS)
@@ -1,38 +1,201 @@
-from terrabot.sim.cult import Cult
-from terrabot.sim.event import EventTrigger, EventType
+from terrabot.sim.cult import Cult, CultDelta
+from terrabot.sim.event import EventTrigger, EventType, PassTrigger, PassTriggerType
 from terrabot.sim.resource import ResourceDelta
+from terrabot.sim.structure import StructureType
 from terrabot.sim.tile import Tile, TileType, CultBonus
 
 ROUND_TILES = (
         Tile(
-                name = "RoundTile-4Water-Spade",
+                name = "RoundTile-Spade-1Earth-Coin-(SCORE1)",
+                tile_type = TileType.ROUND,
+                cult_bonus = CultBonus(Cult.EARTH, 1, bonus_resources=ResourceDelta(coins=1)),
+                event_trigger = EventTrigger(
+                        listens_for = EventType.DIG,
+                        provides = ResourceDelta(victory_points=2))),
+        Tile(
+                name = "RoundTile-Town-4Earth-Spade-(SCORE2)",
+                tile_type = TileType.ROUND,
+                cult_bonus = CultBonus(Cult.EARTH, 4, bonus_spades=1),
+                event_trigger = EventTrigger(
+                        listens_for = EventType.BUILD_TOWN,
+                        provides = ResourceDelta(victory_points=5))),
+        Tile(
+                name = "RoundTile-Dwelling-4Water-Priest-(SCORE3)",
+                tile_type = TileType.ROUND,
+                cult_bonus = CultBonus(Cult.WATER, 4, bonus_resources=ResourceDelta(priests=1)),
+                event_trigger = EventTrigger(
+                        listens_for = EventType.BUILD_DWELLING,
+                        provides = ResourceDelta(victory_points=2))),
+        Tile(
+                name = "RoundTile-Stronghold-2Fire-Worker-(SCORE4)",
+                tile_type = TileType.ROUND,
+                cult_bonus = CultBonus(Cult.FIRE, 2, bonus_resources=ResourceDelta(workers=1)),
+                event_trigger = EventTrigger(
+                        listens_for = (EventType.BUILD_STRONGHOLD, EventType.BUILD_SANCTUARY),
+                        provides = ResourceDelta(victory_points=5))),
+        Tile(
+                name = "RoundTile-Dwelling-4Fire-Power-(SCORE5)",
+                tile_type = TileType.ROUND,
+                cult_bonus = CultBonus(Cult.FIRE, 4, bonus_resources=ResourceDelta(power=4)),
+                event_trigger = EventTrigger(
+                        listens_for = EventType.BUILD_DWELLING,
+                        provides = ResourceDelta(victory_points=2))),
+        Tile(
+                name = "RoundTile-TradingPost-4Water-Spade-(SCORE6)",
                 tile_type = TileType.ROUND,
                 cult_bonus = CultBonus(Cult.WATER, 4, bonus_spades=1),
                 event_trigger = EventTrigger(
                         listens_for = EventType.BUILD_TRADING_POST,
                         provides = ResourceDelta(victory_points=3))),
-        None,
-        None,
-        None,
-        None,
-        None,
-        None,
-        None)
+        Tile(
+                name = "RoundTile-Stronghold-2Air-Worker-(SCORE7)",
+                tile_type = TileType.ROUND,
+                cult_bonus = CultBonus(Cult.AIR, 2, bonus_resources=ResourceDelta(workers=1)),
+                event_trigger = EventTrigger(
+                        listens_for = (EventType.BUILD_STRONGHOLD, EventType.BUILD_SANCTUARY),
+                        provides = ResourceDelta(victory_points=5))),
+        Tile(
+                name = "RoundTile-TradingPost-4Air-Spade-(SCORE8)",
+                tile_type = TileType.ROUND,
+                cult_bonus = CultBonus(Cult.AIR, 4, bonus_spades=1),
+                event_trigger = EventTrigger(
+                        listens_for = EventType.BUILD_TRADING_POST,
+                        provides = ResourceDelta(victory_points=3))))
 
 BONUS_TILES = (
-        None,
-        None,
-        None,
-        None,
-        None,
-        None,
-        None,
-        None)
-
-FAVOR_TILES = ( )
+        Tile(
+                name = "BonusTile-Spade-(BON1)",
+                tile_type = TileType.BONUS,
+                action_slot = "Action-BonusTile-Spade-(BON1)",
+                income = ResourceDelta(coins=2)),
+        Tile(
+                name = "BonusTile-Cult-(BON2)",
+                tile_type = TileType.BONUS,
+                action_slot = "Action-BonusTile-Cult-(BON2)",
+                income = ResourceDelta(coins=4)),
+        Tile(
+                name = "BonusTile-6Coin-(BON3)",
+                tile_type = TileType.BONUS,
+                income = ResourceDelta(coins=6)),
+        Tile(
+                name = "BonusTile-Shipping-(BON4)",
+                tile_type = TileType.BONUS,
+                income = ResourceDelta(power=3),
+                shipping_modifier = 1),
+        Tile(
+                name = "BonusTile-Worker-3Power-(BON5)",
+                tile_type = TileType.BONUS,
+                income = ResourceDelta(workers=1, power=3)),
+        Tile(
+                name = "BonusTile-2Worker-Stronghold-(BON6)",
+                tile_type = TileType.BONUS,
+                income = ResourceDelta(workers=2),
+                pass_trigger = PassTrigger.per_structure(
+                        4, StructureType.STRONGHOLD, StructureType.SANCTUARY)),
+        Tile(
+                name = "BonusTile-Worker-TradingPost-(BON7)",
+                tile_type = TileType.BONUS,
+                income = ResourceDelta(workers=1),
+                pass_trigger = PassTrigger.per_structure(2, StructureType.TRADING_POST)),
+        Tile(
+                name = "BonusTile-Priest-(BON8)",
+                tile_type = TileType.BONUS,
+                income = ResourceDelta(priests=1)),
+        Tile(
+                name = "BonusTile-2Coin-Dwelling-(BON9)",
+                tile_type = TileType.BONUS,
+                income = ResourceDelta(coins=2),
+                pass_trigger = PassTrigger.per_structure(1, StructureType.DWELLING)))
 
-TOWN_TILES = ( )
+_UNIQUE_FAVOR_TILES = (
+        Tile(
+                name = "FavorTile-3Fire-(FAV1)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.FIRE,) * 3)),
+        Tile(
+                name = "FavorTile-3Water-(FAV2)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.WATER,) * 3)),
+        Tile(
+                name = "FavorTile-3Earth-(FAV3)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.EARTH,) * 3)),
+        Tile(
+                name = "FavorTile-3Air-(FAV4)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.AIR,) * 3)))
 
+_TRIPLICATE_FAVOR_TILES = (
+        Tile(
+                name = "FavorTile-2Fire-Town-(FAV5)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.FIRE,) * 2),
+                town_size_modifier = -1),
+        Tile(
+                name = "FavorTile-2Water-Cult-(FAV6)",
+                tile_type = TileType.FAVOR,
+                action_slot = "Action-FavorTile-Cult-(FAV6)",
+                immediate_cult = CultDelta((Cult.WATER,) * 2)),
+        Tile(
+                name = "FavorTile-2Earth-Worker-Power-(FAV7)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.EARTH,) * 2),
+                income = ResourceDelta(workers=1, power=1)),
+        Tile(
+                name = "FavorTile-2Air-4Power-(FAV8)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.AIR,) * 2),
+                income = ResourceDelta(power=4)),
+        Tile(
+                name = "FavorTile-Fire-3Coin-(FAV9)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.FIRE,)),
+                income = ResourceDelta(coins=3)),
+        Tile(
+                name = "FavorTile-Water-TradingPost-(FAV10)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.WATER,)),
+                event_trigger = EventTrigger(
+                        listens_for = EventType.BUILD_TRADING_POST,
+                        provides = ResourceDelta(victory_points=3))),
+        Tile(
+                name = "FavorTile-Earth-Dwelling-(FAV11)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.EARTH,)),
+                event_trigger = EventTrigger(
+                        listens_for = EventType.BUILD_DWELLING,
+                        provides = ResourceDelta(victory_points=2))),
+        Tile(
+                name = "FavorTile-Air-PassTradingPost-(FAV12)",
+                tile_type = TileType.FAVOR,
+                immediate_cult = CultDelta((Cult.AIR,)),
+                pass_trigger = PassTrigger(PassTriggerType.STRUCTURES,
+                        points = (0, 2, 3, 3, 4),
+                        structure_types = (StructureType.TRADING_POST,))))
 
+FAVOR_TILES = _UNIQUE_FAVOR_TILES + tuple(x for x in _TRIPLICATE_FAVOR_TILES for _ in range(3))
 
+_UNIQUE_TOWN_TILES = (
+        Tile(
+                name = "TownTile-5VP-6Coin-(TW1)",
+                tile_type = TileType.TOWN,
+                immediate_resources = ResourceDelta(coins=6, victory_points=5)),
+        Tile(
+                name = "TownTile-7VP-2Worker-(TW2)",
+                tile_type = TileType.TOWN,
+                immediate_resources = ResourceDelta(workers=2, victory_points=7)),
+        Tile(
+                name = "TownTile-9VP-Priest-(TW3)",
+                tile_type = TileType.TOWN,
+                immediate_resources = ResourceDelta(priests=1, victory_points=9)),
+        Tile(
+                name = "TownTile-6VP-8Power-(TW4)",
+                tile_type = TileType.TOWN,
+                immediate_resources = ResourceDelta(power=8, victory_points=6)),
+        Tile(
+                name = "TownTile-8VP-Cult-(TW5)",
+                tile_type = TileType.TOWN,
+                immediate_resources = ResourceDelta(victory_points=8),
+                immediate_cult = CultDelta((Cult.FIRE, Cult.WATER, Cult.EARTH, Cult.AIR))))
 
+TOWN_TILES = tuple(x for x in _UNIQUE_TOWN_TILES for _ in range(2))
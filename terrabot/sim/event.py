@@ -1,8 +1,13 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from enum import Enum, auto
-from typing import Any, Tuple
+from typing import Callable, Mapping, Optional, Tuple
 
-from terrabot.sim.resource import ResourceDelta
+from frozendict import frozendict
+
+from terrabot.sim.resource import NO_RESOURCES, ResourceDelta
+from terrabot.sim.structure import STRUCTURE_LIMITS, StructureType
+from terrabot.util import intern
 
 class EventType(Enum):
     # Tiles
@@ -19,31 +24,91 @@ class EventType(Enum):
     # Tunnel
 
 
-@dataclass
+@dataclass(frozen=True)
 class EventTrigger:
-    listens_for: Tuple[EventType, ...]
+    listens_for: Tuple[EventType, ...] # a single EventType is also accepted
     provides: ResourceDelta
 
-    def __init__(self, listens_for: Any, provides: ResourceDelta):
-        if isinstance(listens_for, tuple):
-            self.listens_for = listens_for
-        elif isinstance(listens_for, EventType):
-            self.listens_for = tuple([listens_for])
-        else:
-            raise TypeError("Unrecognized type for parameter listens_for: {type(listens_for)}")
+    def __post_init__(self):
+        if isinstance(self.listens_for, EventType):
+            object.__setattr__(self, "listens_for", (self.listens_for,))
+        elif not isinstance(self.listens_for, tuple):
+            raise TypeError(
+                    f"Unrecognized type for parameter listens_for: {type(self.listens_for)}")
+        object.__setattr__(self, "provides", intern(self.provides))
+
+
+@lru_cache(maxsize=1 << 12)
+def sum_event_triggers(triggers: Tuple[Optional[EventTrigger], ...]) -> frozendict:
+    """The total resources the triggers provide for each EventType any of them listens for, as a
+    table which can be looked up each time an event happens. Entries which are None are skipped.
+    Players hold few distinct combinations of tiles, so most share a table with someone at some
+    point, e.g. before they have any tiles, and equal combinations share the cached table.
+    """
+    totals = {}
+    for trigger in triggers:
+        if trigger is None:
+            continue
+        for event_type in trigger.listens_for:
+            totals[event_type] = totals.get(event_type, NO_RESOURCES) + trigger.provides
+    return frozendict(totals)
+
+
+class PassTriggerType(Enum):
+    STRUCTURES = auto() # the number of standing structures of some types, bridges included
+    SHIPPING = auto() # the ship level
 
-        self.provides = provides
 
+# Counts the structure types and ship level of one player, and returns their points
+PassScorer = Callable[[Mapping[StructureType, int], int], int]
 
-@dataclass
+
+@dataclass(frozen=True)
 class PassTrigger:
-    # Bonus Tiles: Points for structures
-    # FAV12: Points for TPs
-    # Expansion Bonus Tiles: Points for shipping
-    # Engineers: Points for bridges
-    pass
+    """Points scored when passing, looked up by a count in a table. Counts beyond the end of the
+    table score its last entry.
+
+    Bonus Tiles: points for structures
+    FAV12: points for trading posts
+    Expansion Bonus Tiles: points for shipping
+    Engineers: points for bridges
+    """
+    trigger_type: PassTriggerType
+    points: Tuple[int, ...] # by count
+    structure_types: Tuple[StructureType, ...] = ()
+
+    @staticmethod
+    def per_structure(points: int, *structure_types: StructureType) -> "PassTrigger":
+        """A trigger scoring the same points for each structure of the given types."""
+        limit = sum(STRUCTURE_LIMITS[x] for x in structure_types)
+        return PassTrigger(PassTriggerType.STRUCTURES, tuple(points * i for i in range(limit + 1)),
+                structure_types)
+
+    def compile(self) -> PassScorer:
+        points = self.points
+        last = len(points) - 1
+        if self.trigger_type == PassTriggerType.SHIPPING:
+            return lambda counts, ship_level: points[min(ship_level, last)]
+        if len(self.structure_types) == 1:
+            (structure_type,) = self.structure_types
+            return lambda counts, ship_level: points[min(counts[structure_type], last)]
+        structure_types = self.structure_types
+        return lambda counts, ship_level: \
+                points[min(sum(counts[x] for x in structure_types), last)]
+
 
+def _score_nothing(counts: Mapping[StructureType, int], ship_level: int) -> int:
+    return 0
 
-class PassTriggerType:
-    STRUCTURE = auto()
 
+@lru_cache(maxsize=None)
+def compile_pass_triggers(triggers: Tuple[Optional[PassTrigger], ...]) -> PassScorer:
+    """One scorer for the total points of the triggers. Entries which are None are skipped.
+    Players hold few distinct combinations of tiles, so scorers are built once per combination.
+    """
+    scorers = tuple(x.compile() for x in triggers if x is not None)
+    if not scorers:
+        return _score_nothing
+    if len(scorers) == 1:
+        return scorers[0]
+    return lambda counts, ship_level: sum(x(counts, ship_level) for x in scorers)
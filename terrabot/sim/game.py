@@ -1,25 +1,38 @@
-from dataclasses import dataclass, field
+import random
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field, replace
 from enum import Enum, auto
-from random import sample
-from sets import Set
-from typing import Iterator, Tuple
+from random import Random
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
 from weakref import proxy, ProxyType
 
-from terrabot.sim.data.actions import STANDARD_ACTIONS, POWER_ACTIONS, \
+from frozendict import frozendict
+
+from terrabot.sim.data.actions import STANDARD_ACTIONS, POWER_ACTIONS, TILE_SLOT_ACTIONS, \
         get_off_turn_action_by_phase
 from terrabot.sim.data.maps import DEFAULT_MAP
 from terrabot.sim.data.tiles import FAVOR_TILES, TOWN_TILES, BONUS_TILES, ROUND_TILES
-from terrabot.sim.action import Action, ActionExecution, Phase, Step
-from terrabot.sim.cult import CultDelta
+from terrabot.sim.action import FINAL_ROUND, Action, ActionExecution, Phase, Step
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.cult import NO_PRIESTS, CultDelta, CultTrackState
+from terrabot.sim.leech import ACCEPT_LEECH, LeechPolicy, resolve_leech, resolve_offers
 from terrabot.sim.map import Map
-from terrabot.sim.player import Player, PlayerMetadata
+from terrabot.sim.movegen import count_available_executions, get_available_executions, \
+        iterate_available_executions
+from terrabot.sim.player import Faction, Player, PlayerMetadata, PlayerState
 from terrabot.sim.tile import Tile, TileSet
-from terrabot.sim.resource import ResourceDelta, Conversion
-from terrabot.util import shuffled
+from terrabot.sim.town import NETWORK_POINTS, apply_structures, get_network_size, \
+        get_town_power_requirement
+from terrabot.sim.resource import NO_RESOURCES, ResourceDelta, Conversion, PlayerResourceState
+from terrabot.sim.zobrist import compute_zobrist_key, get_zobrist_key_delta
+from terrabot.util import shuffled, frozendict_with_item, get_placing_points, tuple_replace
 
-@dataclass
+@dataclass(frozen=True)
 class RuleSet:
+    # Whether leech is decided as soon as it's offered, by leech_policy, rather than by each player
+    # at the start of their next turn
     require_immediate_leech: bool = False
+    leech_policy: LeechPolicy = ACCEPT_LEECH
 
     # Cultists must decide whether to
     require_immediate_cultist: bool = True
@@ -30,15 +43,20 @@ class RuleSet:
     # Whether to include town-tiles from the mini-expansion
 
 
+DEFAULT_RULE_SET = RuleSet()
+
+
 @dataclass
 class Setup:
     round_tiles: Tuple[Tile, Tile, Tile, Tile, Tile, Tile]
     bonus_tiles: Tuple[Tile, ...]
 
     @staticmethod
-    def create_random_setup(num_players: int) -> "Setup":
-        round_tiles = tuple(sample(ROUND_TILES, 6))
-        bonus_tiles = tuple(sample(BONUS_TILES, num_players + 3))
+    def create_random_setup(num_players: int, rng: Random = None) -> "Setup":
+        """Draw the round and bonus tiles with the given RNG, or else the module-level one."""
+        rng = rng if rng is not None else random
+        round_tiles = tuple(rng.sample(ROUND_TILES, 6))
+        bonus_tiles = tuple(rng.sample(BONUS_TILES, num_players + 3))
 
         return Setup(round_tiles, bonus_tiles)
 
@@ -46,14 +64,63 @@ class Setup:
 @dataclass
 class LogEntry:
     active_player_id: str
-    lines: Iterable[str, ...]
+    lines: Tuple[str, ...]
     # previous_state: "GameState" = None # Actually ProxyMappingType[GameState]
     # resulting_state: "GameState" = None # Actually ProxyMappingType[GameState]
 
 
+@dataclass(frozen=True)
+class Move:
+    """Everything passed to GameState.submit() for one ply."""
+    execution: ActionExecution
+    leech_decisions: Tuple[bool, ...] = ()
+    conversions_before_action: Tuple[Conversion, ...] = ()
+    conversions_after_action: Tuple[Conversion, ...] = ()
+
+    def apply(self, game_state: "GameState") -> "GameState":
+        return game_state.submit(self.execution, self.leech_decisions,
+                self.conversions_before_action, self.conversions_after_action)
+
+
+@dataclass(frozen=True)
+class HistoryPolicy:
+    """How much of the game before it a GameState keeps reachable through previous_state.
+
+    keep_last bounds how many plies back previous_state can go (None for no bound). If
+    keyframe_interval is set, only every keyframe_interval-th earlier state is kept, along with
+    the moves played since, and the states in between are replayed on demand. keep_last is then
+    rounded back to a keyframe. With neither set, every GameState holds its predecessor directly.
+    """
+    keep_last: int = None
+    keyframe_interval: int = None
+
+    def is_unbounded(self) -> bool:
+        return self.keep_last is None and self.keyframe_interval is None
+
+
+KEEP_ALL_HISTORY = HistoryPolicy()
+KEEP_NO_HISTORY = HistoryPolicy(keep_last=0)
+
+
+@dataclass(frozen=True)
+class History:
+    """The earlier states of a game which a GameState can reconstruct.
+
+    Under KEEP_ALL_HISTORY this is just a link to the previous state. Otherwise keyframes holds
+    earlier states (without their own history), oldest first, and moves holds every move played
+    from the first keyframe up to this state, so that any state from the first keyframe on can be
+    replayed exactly.
+    """
+    previous_state: "GameState" = None
+    ply: int = 0 # plies played since the history began
+    keyframes: Tuple["GameState", ...] = ()
+    keyframe_plies: Tuple[int, ...] = ()
+    moves: Tuple[Move, ...] = ()
+
+
 @dataclass
 class GameState:
-    players: Set[Player, ...]
+    players: Tuple[Player, ...] # ordered by initial_turn_position
     num_players: int
     setup: Setup
     pool: TileSet
@@ -61,146 +128,576 @@ class GameState:
     round: int = 0
     map: Map = DEFAULT_MAP
     phase: Phase = Phase.SELECT_FACTION
+    rule_set: RuleSet = field(default=DEFAULT_RULE_SET, repr=False, compare=False)
 
-    # History
-    previous_state: "GameState" = None
+    # What is built where, and the current terrain of each hex
+    board: Bitboard = None
+
+    # History. previous_state is reconstructed from the history, as far as the policy allows.
     most_recent_log_entry: LogEntry = None
+    history_policy: HistoryPolicy = field(default=KEEP_ALL_HISTORY, repr=False, compare=False)
+    history: History = field(default=None, repr=False, compare=False)
 
     # Action slots
     expended_action_slots: Tuple[str, ...] = ()
 
-    # Convenience fields
-    players_by_id: frozendict = field(init=False, repr=False)
-    players_by_turn: frozendict = field(init=False, repr=False)
-    active_player: Player = field(init=False, repr=False)
-    active_player_id: str = field(init=False, repr=False)
+    # Coins left on the bonus tiles in the pool, by tile name, for tiles with any
+    bonus_tile_coins: frozendict = frozendict()
+
+    # Steps of the occupied priest spaces beside each cult track. See CultTrackState.
+    priest_spaces: Tuple[Tuple[int, ...], ...] = NO_PRIESTS
+
+    # Turn positions in this round's order of play, and in the order players have passed, which is
+    # next round's order of play. turn_order defaults to the initial turn order.
+    turn_order: Tuple[int, ...] = None
+    pass_order: Tuple[int, ...] = ()
+
+    # Convenience fields. These are built once by the first GameState and then carried over (and
+    # patched for the players that changed) by GameStateEdit.commit().
+    players_by_id: frozendict = field(default=None, repr=False, compare=False)
+    players_by_turn: frozendict = field(default=None, repr=False, compare=False)
+    active_player: Player = field(init=False, repr=False, compare=False)
+    active_player_id: str = field(init=False, repr=False, compare=False)
+
+    # Every available ActionExecution, memoized by the movegen module after the first complete
+    # enumeration. Not carried over by replace().
+    available_executions: Tuple[ActionExecution, ...] = \
+            field(default=None, init=False, repr=False, compare=False)
+
+    # 64 bit Zobrist key of the position. Computed on first use by get_zobrist_key(), and from
+    # then on maintained incrementally by GameStateEdit.commit() for the states which follow.
+    zobrist_key: int = field(default=None, init=False, repr=False, compare=False)
 
     @staticmethod
     def create(
             player_metadata: Iterator[PlayerMetadata],
             randomize_turn_order: bool = True,
-            setup: Setup = None):
-
+            setup: Setup = None,
+            rng: Random = None,
+            history_policy: HistoryPolicy = KEEP_ALL_HISTORY,
+            rule_set: RuleSet = DEFAULT_RULE_SET):
+        """Create a new game. rng is used to shuffle the turn order and draw the setup, if they
+        aren't given, so that a seeded RNG reproduces the same game.
+        """
         shuffled_player_metadata = tuple(
-                shuffled(player_metadata) if randomize_turn_order else player_metadata)
-        players = frozenset(Player.create(x, pos) for x, pos in enumerate(shuffled_player_metadata)
-        num_players = len(player_metadata)
+                shuffled(player_metadata, rng) if randomize_turn_order else player_metadata)
+        players = tuple(Player.create(x, pos) for pos, x in enumerate(shuffled_player_metadata))
+        num_players = len(players)
 
-        setup = setup if setup is not None else Setup.create_random_setup(num_players)
+        setup = setup if setup is not None else Setup.create_random_setup(num_players, rng)
         pool = TileSet(
                 bonus_tiles = setup.bonus_tiles,
                 favor_tiles = FAVOR_TILES,
                 town_tiles = TOWN_TILES)
 
         return GameState(
-                players = frozenset(players),
+                players = players,
                 num_players = num_players,
                 setup = setup,
-                pool = pool)
+                pool = pool,
+                board = Bitboard.create(DEFAULT_MAP, tuple(x.player_id for x in players)),
+                history_policy = history_policy,
+                rule_set = rule_set)
 
     def get_available_actions(self) -> Tuple[Action, ...]:
-        if self.phase != Phase.TURN:
+        if self.phase == Phase.OVER:
+            return ()
+        elif self.phase != Phase.TURN:
             return tuple([self.get_applicable_off_turn_action()])
+        elif self.active_player.player_state.has_passed:
+            return ()
         else:
             power_actions = self.get_available_power_actions()
             special_actions = self.get_available_special_actions()
             return STANDARD_ACTIONS + power_actions + special_actions
 
     def get_available_power_actions(self) -> Tuple[Action, ...]:
-        return (x for x in POWER_ACTIONS if x.action_id not in self.expended_action_slots)
+        return tuple(x for x in POWER_ACTIONS if x.action_id not in self.expended_action_slots)
 
     def get_available_special_actions(self) -> Tuple[Action, ...]:
-        special_actions = self.active_player.faction.get_special_actions(
-                self.active_player.player_state)
-        return (x for x in special_actions if x.action_id not in self.expended_action_slots)
+        player = self.active_player
+        tile_action_ids = {x.action_slot for x in player.player_state.tiles.get_all()}
+        tile_actions = tuple(
+                x for x in TILE_SLOT_ACTIONS
+                if x.action_id in tile_action_ids
+                and x.get_action_slot(player.player_id) not in self.expended_action_slots)
+        faction_actions = tuple(
+                x for x in player.faction.get_special_actions(player.player_state)
+                if x.action_id not in self.expended_action_slots)
+        return tile_actions + faction_actions
+
+    def get_available_executions(self) -> Tuple[ActionExecution, ...]:
+        return get_available_executions(self)
+
+    def iterate_available_executions(self) -> Iterator[ActionExecution]:
+        return iterate_available_executions(self)
+
+    def count_available_executions(self) -> int:
+        return count_available_executions(self)
+
+    def get_zobrist_key(self) -> int:
+        if self.zobrist_key is None:
+            self.zobrist_key = compute_zobrist_key(self)
+        return self.zobrist_key
+
+    def get_cult_tracks(self) -> CultTrackState:
+        return CultTrackState.create(tuple(
+                x.player_state.cult_state if x.player_state is not None else None
+                for x in self.players), self.priest_spaces)
+
+    def get_pass_points(self) -> Tuple[int, ...]:
+        """The points each player would score for passing now, in initial turn order. Players
+        without a faction score nothing.
+        """
+        return tuple(x.faction.get_pass_points(x.player_state) if x.player_state is not None else 0
+                for x in self.players)
+
+    def _get_cult_tracks(self, edit: "GameStateEdit") -> CultTrackState:
+        player_states = (edit.get_player_state(x.player_id) for x in self.players)
+        return CultTrackState.create(
+                tuple(x.cult_state if x is not None else None for x in player_states),
+                edit.get("priest_spaces"))
+
+    def get_round_tile(self) -> Optional[Tile]:
+        if 1 <= self.round <= len(self.setup.round_tiles):
+            return self.setup.round_tiles[self.round - 1]
+        return None
 
     def get_applicable_off_turn_action(self) -> Action:
         return get_off_turn_action_by_phase(self.phase)
 
+    def edit(self) -> "GameStateEdit":
+        return GameStateEdit(self)
+
     def submit(self,
             action_execution: ActionExecution,
-            leech_decisions: Iterator[bool] = (),
+            leech_decisions: Iterable[bool] = (),
             conversions_before_action: Iterable[Conversion] = frozenset(),
             conversions_after_action: Iterable[Conversion] = frozenset()) -> "GameState":
+        """Apply one action (with its surrounding leech decisions and conversions) and return the
+        resulting GameState. All of the changes are staged on a single GameStateEdit, so only one
+        new GameState is created per call.
+        """
+        move = Move(action_execution, tuple(leech_decisions),
+                tuple(conversions_before_action), tuple(conversions_after_action))
+        return self._apply_move(move, self._get_next_history(move))
 
-        if not self.phase == Phase.TURN and \
-                (leech_decisions or pre_action_conversions or post_action_conversions):
+    def _apply_move(self, move: Move, history: Optional[History]) -> "GameState":
+        if not self.phase == Phase.TURN and (move.leech_decisions
+                or move.conversions_before_action or move.conversions_after_action):
             raise ValueError("A player may only convert resources or accept leech on their turn")
 
-        return self._reflect_leech_decisions(leech_decisions) \
-                ._reflect_conversions(conversions_before_action) \
-                ._reflect_step(action_execution.compute(self)) \
-                ._reflect_conversions(conversions_after_action) \
-                ._reflect_phase_transition()
-
-    def _reflect_leech_decisions(self, leech_decisions: Iterable[bool]) -> "GameState":
+        step = move.execution.compute(self)
+
+        edit = self.edit()
+        self._reflect_leech_decisions(edit, move.leech_decisions)
+        self._reflect_conversions(edit, move.conversions_before_action)
+        self._reflect_step(edit, step)
+        self._reflect_conversions(edit, move.conversions_after_action)
+        self._reflect_phase_transition(edit)
+        edit.set(
+                history = history,
+                most_recent_log_entry = LogEntry(self.active_player_id, (step.description,)))
+        return edit.commit()
+
+    def apply_pre_action_changes(self,
+            leech_decisions: Iterable[bool] = (),
+            conversions_before_action: Iterable[Conversion] = ()) -> "GameState":
+        """This state after the active player's leech decisions and conversions but before their
+        action, e.g. to find which executions they could then afford.
+        """
+        edit = self.edit()
+        self._reflect_leech_decisions(edit, tuple(leech_decisions))
+        self._reflect_conversions(edit, tuple(conversions_before_action))
+        return edit.commit()
+
+    def _get_next_history(self, move: Move) -> Optional[History]:
+        """The History of the state which follows this one by the given move."""
+        policy = self.history_policy
+        if policy.is_unbounded():
+            return History(previous_state = self)
+        if policy.keep_last == 0:
+            return None
+
+        history = self.history if self.history is not None else History()
+        keyframes = history.keyframes
+        keyframe_plies = history.keyframe_plies
+        if history.ply % (policy.keyframe_interval or 1) == 0:
+            keyframes += (replace(self, history = None),)
+            keyframe_plies += (history.ply,)
+        ply = history.ply + 1
+
+        # Drop the keyframes which are no longer needed to reach the oldest state kept
+        if policy.keep_last is not None:
+            first = bisect_right(keyframe_plies, ply - policy.keep_last) - 1
+            if first > 0:
+                keyframes = keyframes[first:]
+                keyframe_plies = keyframe_plies[first:]
+        moves = history.moves[len(history.moves) - (history.ply - keyframe_plies[0]):] + (move,)
+        return History(None, ply, keyframes, keyframe_plies, moves)
+
+    @property
+    def previous_state(self) -> Optional["GameState"]:
+        """The state before the last move, if the history policy kept it. States which aren't
+        kept as keyframes are replayed from the nearest earlier keyframe.
+        """
+        history = self.history
+        if history is None:
+            return None
+        if history.previous_state is not None or not history.keyframes:
+            return history.previous_state
+
+        ply = history.ply - 1
+        if ply < history.keyframe_plies[0]:
+            return None
+        index = bisect_right(history.keyframe_plies, ply) - 1
+        first_move = history.keyframe_plies[index] - history.keyframe_plies[0]
+        last_move = ply - history.keyframe_plies[0]
+        num_keyframes = bisect_left(history.keyframe_plies, ply)
+        previous_history = History(None, ply, history.keyframes[:num_keyframes],
+                history.keyframe_plies[:num_keyframes], history.moves[:last_move])
+
+        game_state = history.keyframes[index]
+        if first_move == last_move:
+            return replace(game_state, history = previous_history)
+        for move in history.moves[first_move:last_move - 1]:
+            game_state = game_state._apply_move(move, None)
+        return game_state._apply_move(history.moves[last_move - 1], previous_history)
+
+    def _reflect_leech_decisions(self, edit: "GameStateEdit", leech_decisions: Tuple[bool, ...]):
+        player_id = self.active_player_id
+        player_state = edit.get_player_state(player_id)
+        if player_state is None:
+            return
 
         if not len(leech_decisions) == len(player_state.leech_opportunities):
             raise ValueError("Wrong number of leech decisions provided. Expected {}, found {}."
-                    .format(len(leech_decisions), len(player_state.leech_decisions)))
-
-        player_state = self.active_player.player_state
-
-        leech_decisions_accepted = [
-                amount
-                for amount, taken in zip(player_state.leech_opportunities, leech_decisions)
-                if taken]
-
-        total_capacity = player_state.resources.power.get_available_capacity()
-        total_leech_delta = ResourceDelta()
-        for amount in leech_decisions_accepted:
-            capacity = total_capacity - leech_decisions_accepted.power
-            actual_amount = min(capacity, amount)
-            leech_delta = ResourceDelta(
-                    power = actual_amount,
-                    victory_points = -(actual_amount - 1))
-            total_leech_delta = total_leech_delta + leech_delta
-
-        if player_state.resources.victory_points > abs(total_leech_delta.victory_points):
-            raise ValueError("Not enough victory points to leech")
-
-        new_resource_state = player_state.resources.add(total_leech_delta)
-        new_player_state = player_state.replace(
-                resources = new_resource_state,
-                leech_opportunities = ())
-
-        return self.update_player_state(new_player_state, self.active_player_id)
+                    .format(len(player_state.leech_opportunities), len(leech_decisions)))
+        if not leech_decisions:
+            return
 
-    def _reflect_conversions(self, conversions: Iterable[Conversion]) -> ResourceDelta:
-        resource_delta = sum(x.get_resource_delta(self.active_player.faction) for x in conversions)
-        new_resource_state = self.active_player.player_state.resources.add(resource_delta)
-        return self._update_resource_state(new_resource_state, self.active_player_id)
-
-    def _reflect_phase_transition(self) -> "GameState":
-        # TODO
-        pass
-
-    def _reflect_step(self, step: Step) -> "GameState":
-        # TODO
-        pass
+        edit.update_player_state(player_id,
+                resources = resolve_leech(player_state.resources,
+                        player_state.leech_opportunities, leech_decisions),
+                leech_opportunities = ())
 
-    def _update_resource_state(self, new_resource_state: ResourceState, player_id: str) \
+    def _reflect_leech_opportunities(self, edit: "GameStateEdit", opportunities: frozendict):
+        """Offer leech to every neighbouring player of a new structure. The offers are decided at
+        once by the rule set's leech_policy if the rules require immediate leech, and otherwise
+        for the players who have passed, since they have no turn left this round to decide them.
+        """
+        if self.rule_set.require_immediate_leech:
+            immediate = opportunities
+        else:
+            immediate = {}
+            for other_player_id, opportunity in opportunities.items():
+                other_state = edit.get_player_state(other_player_id)
+                if other_state.has_passed:
+                    immediate[other_player_id] = opportunity
+                else:
+                    edit.update_player_state(other_player_id,
+                            leech_opportunities = other_state.leech_opportunities + (opportunity,))
+        if immediate:
+            resolved = resolve_offers(immediate,
+                    lambda x: edit.get_player_state(x).resources, self.rule_set.leech_policy)
+            for other_player_id, resources in resolved.items():
+                edit.update_resources(other_player_id, resources)
+
+    def _reflect_conversions(self, edit: "GameStateEdit", conversions: Iterable[Conversion]):
+        if not conversions:
+            return
+        faction = self.active_player.faction
+        resource_delta = sum(
+                (x.get_resource_delta(faction) for x in conversions), NO_RESOURCES)
+        resources = edit.get_player_state(self.active_player_id).resources
+        edit.update_resources(self.active_player_id, resources.add(resource_delta))
+
+    def _reflect_phase_transition(self, edit: "GameStateEdit"):
+        phase = self.phase
+        position = self.active_player_position
+
+        if phase == Phase.SELECT_FACTION:
+            if position + 1 < self.num_players:
+                edit.set(active_player_position = position + 1)
+            else:
+                factions = tuple(edit.get_player(x.player_id).faction for x in self.players)
+                edit.set(
+                        phase = Phase.PLACE_INITIAL_DWELLING,
+                        active_player_position = get_initial_dwelling_order(factions)[0])
+
+        elif phase == Phase.PLACE_INITIAL_DWELLING:
+            order = get_initial_dwelling_order(tuple(x.faction for x in self.players))
+            num_placed = sum(
+                    len(edit.get_player_state(x.player_id).structures.structures)
+                    for x in self.players)
+            if num_placed < len(order):
+                edit.set(active_player_position = order[num_placed])
+            else:
+                # Bonus tiles are selected in reverse turn order
+                edit.set(
+                        phase = Phase.SELECT_INITIAL_BONUS_TILE,
+                        active_player_position = self.num_players - 1)
+
+        elif phase == Phase.SELECT_INITIAL_BONUS_TILE:
+            if position > 0:
+                edit.set(active_player_position = position - 1)
+            else:
+                edit.set(phase = Phase.TURN, round = 1, active_player_position = 0)
+                self._reflect_round_start(edit)
+
+        elif phase == Phase.BONUS_SPADE_DECISION:
+            # Players use their spades in the next round's turn order, before it starts
+            for position in self.turn_order[self.turn_order.index(position):]:
+                player_id = self.players_by_turn[position].player_id
+                if edit.get_player_state(player_id).bonus_spade_decisions:
+                    edit.set(active_player_position = position)
+                    return
+            edit.set(
+                    phase = Phase.TURN,
+                    round = self.round + 1,
+                    active_player_position = self.turn_order[0])
+            self._reflect_round_start(edit)
+
+        elif phase in (Phase.TURN, Phase.SELECT_FAVOR_TILE, Phase.SELECT_TOWN_TILE,
+                Phase.CULT_TRACK_DECISION):
+            # The active player makes any decisions they earned before play moves on
+            player_state = edit.get_player_state(self.active_player_id)
+            if player_state.cult_key_decisions:
+                edit.set(phase = Phase.CULT_TRACK_DECISION)
+                return
+            if player_state.favor_tile_decisions:
+                edit.set(phase = Phase.SELECT_FAVOR_TILE)
+                return
+            if player_state.town_tile_decisions:
+                edit.set(phase = Phase.SELECT_TOWN_TILE)
+                return
+            edit.set(phase = Phase.TURN)
+
+            turn_order = self.turn_order
+            index = turn_order.index(self.active_player_position)
+            for offset in range(1, self.num_players + 1):
+                position = turn_order[(index + offset) % self.num_players]
+                player_id = self.players_by_turn[position].player_id
+                if not edit.get_player_state(player_id).has_passed:
+                    edit.set(active_player_position = position)
+                    return
+            self._reflect_round_end(edit)
+
+    def _reflect_round_end(self, edit: "GameStateEdit"):
+        """Every player has passed. Either end the game, scoring the cult track majorities and the
+        largest networks, or score the round tile's cult bonus, put a coin on each bonus tile left
+        in the pool and start the next round in the order players passed. Players who earned
+        spades from the cult bonus use them first, and the next round only starts once they have.
+        """
+        if self.round >= FINAL_ROUND:
+            cult_points = self._get_cult_tracks(edit).get_majority_points()
+            network_points = self._get_network_points(edit)
+            for player, x, y in zip(self.players, cult_points, network_points):
+                victory_points = x + y
+                if victory_points:
+                    resources = edit.get_player_state(player.player_id).resources
+                    edit.update_resources(player.player_id,
+                            resources.add(ResourceDelta(victory_points=victory_points)))
+            edit.set(phase = Phase.OVER)
+            return
+
+        round_tile = self.get_round_tile()
+        cult_bonus = round_tile.cult_bonus if round_tile is not None else None
+        for player in self.players:
+            player_state = edit.get_player_state(player.player_id)
+            changes = {"has_passed": False}
+            times = player_state.cult_state.by_cult(cult_bonus.cult) // cult_bonus.steps \
+                    if cult_bonus is not None else 0
+            if times and cult_bonus.bonus_resources != NO_RESOURCES:
+                changes["resources"] = player_state.resources.add(
+                        cult_bonus.bonus_resources * times)
+            if times and cult_bonus.bonus_spades:
+                changes["bonus_spade_decisions"] = cult_bonus.bonus_spades * times
+            edit.update_player_state(player.player_id, **changes)
+
+        bonus_tile_coins = dict(edit.get("bonus_tile_coins"))
+        for tile in edit.get("pool").bonus_tiles:
+            bonus_tile_coins[tile.name] = bonus_tile_coins.get(tile.name, 0) + 1
+
+        pass_order = edit.get("pass_order")
+        edit.set(
+                turn_order = pass_order,
+                pass_order = (),
+                active_player_position = pass_order[0],
+                expended_action_slots = (),
+                bonus_tile_coins = frozendict(bonus_tile_coins))
+        for position in pass_order:
+            player_id = self.players_by_turn[position].player_id
+            if edit.get_player_state(player_id).bonus_spade_decisions:
+                edit.set(phase = Phase.BONUS_SPADE_DECISION, active_player_position = position)
+                return
+        edit.set(round = self.round + 1)
+        self._reflect_round_start(edit)
+
+    def _get_network_points(self, edit: "GameStateEdit") -> Tuple[int, ...]:
+        """Each player's points for the size of their largest network at the end of the game."""
+        board = edit.get("board")
+        sizes = []
+        for player in self.players:
+            player_state = edit.get_player_state(player.player_id)
+            sizes.append(get_network_size(board, player.player_id,
+                    player.faction.get_shipping(player_state)) if player_state is not None else 0)
+        return get_placing_points(sizes, NETWORK_POINTS)
+
+    def _reflect_round_start(self, edit: "GameStateEdit"):
+        """Every player switches to the new round tile's event triggers and receives the income
+        cached on their PlayerState.
+        """
+        round_ = edit.get("round")
+        round_tiles = self.setup.round_tiles
+        round_tile = round_tiles[round_ - 1] if round_ <= len(round_tiles) else None
+        for player in self.players:
+            self._reflect_event_resources(edit, player.player_id, round_tile)
+            player_state = edit.get_player_state(player.player_id)
+            edit.update_resources(player.player_id,
+                    player_state.resources.add(player_state.income))
+
+    def _reflect_event_resources(self, edit: "GameStateEdit", player_id: str,
+            round_tile: Optional[Tile]):
+        faction = edit.get_player(player_id).faction
+        player_state = edit.get_player_state(player_id)
+        event_resources = faction.get_event_resources(player_state, round_tile)
+        if event_resources is not player_state.event_resources:
+            edit.update_player_state(player_id, event_resources = event_resources)
+
+    def _reflect_step(self, edit: "GameStateEdit", step: Step):
+        player_id = self.active_player_id
+
+        if step.faction_selected is not None:
+            edit.update_player(player_id,
+                    faction = step.faction_selected,
+                    player_state = PlayerState.create(step.faction_selected))
+
+        player_state = edit.get_player_state(player_id)
+        changes = {}
+        if step.passed:
+            changes["has_passed"] = True
+            edit.set(pass_order = edit.get("pass_order") + (self.active_player_position,))
+        if step.resource_delta != NO_RESOURCES:
+            changes["resources"] = player_state.resources.add(step.resource_delta)
+        if step.new_structures:
+            changes["structures"] = player_state.structures.add(step.new_structures)
+        if step.cult_delta.steps:
+            tracks = self._get_cult_tracks(edit)
+            advance = tracks.advance(self.active_player_position,
+                    step.cult_delta, player_state.towns.num_towns)
+            changes["cult_state"] = advance.cult_state
+            if advance.power:
+                resources = changes.get("resources", player_state.resources)
+                changes["resources"] = resources.add(ResourceDelta(power=advance.power))
+            if advance.num_key_decisions:
+                changes["cult_key_decisions"] = advance.num_key_decisions
+                changes["contested_cults"] = advance.contested_cults
+            elif step.new_cult_key_decisions:
+                # A key was used on one of the contested tracks
+                remaining = player_state.cult_key_decisions + step.new_cult_key_decisions
+                changes["cult_key_decisions"] = remaining
+                changes["contested_cults"] = tuple(x for x in player_state.contested_cults
+                        if x not in step.cult_delta.steps) if remaining else ()
+            if step.priest_space:
+                # The priest stays beside the track, and leaves the player's pool for good
+                edit.set(priest_spaces = tracks.place_priest(
+                        step.cult_delta.steps[0], step.priest_space).priest_spaces)
+                resources = changes.get("resources", player_state.resources)
+                changes["resources"] = replace(resources,
+                        priest_pool_size = resources.priest_pool_size - 1)
+        if step.dig_level_delta:
+            changes["dig_level"] = player_state.dig_level + step.dig_level_delta
+        if step.ship_level_delta:
+            changes["ship_level"] = player_state.ship_level + step.ship_level_delta
+        income = player_state.income
+        if step.new_tiles or step.returned_tile is not None:
+            tiles = player_state.tiles
+            pool = edit.get("pool")
+            bonus_tile_coins = edit.get("bonus_tile_coins")
+            for tile in step.new_tiles:
+                pool = pool.remove(tile)
+                tiles = tiles.add(tile)
+                income = income + tile.income
+                if tile.name in bonus_tile_coins:
+                    bonus_tile_coins = frozendict(
+                            {k: v for k, v in bonus_tile_coins.items() if k != tile.name})
+                    edit.set(bonus_tile_coins = bonus_tile_coins)
+            if step.returned_tile is not None:
+                tiles = tiles.remove(step.returned_tile)
+                pool = pool.add(step.returned_tile)
+                income = income - step.returned_tile.income
+            changes["tiles"] = tiles
+            edit.set(pool = pool)
+        town_tile_decisions = step.new_town_tile_decisions
+        if step.new_favor_tile_decisions:
+            changes["favor_tile_decisions"] = \
+                    player_state.favor_tile_decisions + step.new_favor_tile_decisions
+        if step.terrain_changes or step.new_structures:
+            board = edit.get("board")
+            for location_id, terrain in step.terrain_changes.items():
+                board = board.with_terrain(board.get_hex_id(location_id), terrain)
+            if step.new_structures:
+                income = income + edit.get_player(player_id).faction.rules.get_income_change(
+                        board, player_id, step.new_structures)
+            towns, board, new_towns = apply_structures(player_state.towns, board, player_id,
+                    step.new_structures, get_town_power_requirement(player_state.tiles))
+            changes["towns"] = towns
+            town_tile_decisions += new_towns
+            edit.set(board = board)
+        if town_tile_decisions:
+            changes["town_tile_decisions"] = \
+                    player_state.town_tile_decisions + town_tile_decisions
+        if step.new_bonus_spade_decisions:
+            changes["bonus_spade_decisions"] = \
+                    player_state.bonus_spade_decisions + step.new_bonus_spade_decisions
+        if income is not player_state.income:
+            changes["income"] = income
+        if changes:
+            edit.update_player_state(player_id, **changes)
+        if "tiles" in changes or step.faction_selected is not None:
+            self._reflect_event_resources(edit, player_id, self.get_round_tile())
+
+        if step.new_leech_opportunities:
+            self._reflect_leech_opportunities(edit, step.new_leech_opportunities)
+
+        for other_player_id, steps in step.new_cultist_steps.items():
+            other_state = edit.get_player_state(other_player_id)
+            edit.update_player_state(other_player_id,
+                    cultist_steps = other_state.cultist_steps + steps)
+
+        if step.action_slot_expended is not None:
+            edit.set(expended_action_slots =
+                    edit.get("expended_action_slots") + (step.action_slot_expended,))
+
+    def _update_resource_state(self, new_resource_state: PlayerResourceState, player_id: str) \
             -> "GameState":
         """Convenience version of the replace() method provided by python dataclasses providing
         nested replacement.
         """
-        player = self.players_by_id[player_id]
-        new_player_state = player.player_state.replace(resources = new_resource_state)
-        return self._update_player_state(new_player_state, player_id)
+        edit = self.edit()
+        edit.update_resources(player_id, new_resource_state)
+        return edit.commit()
 
     def _update_player_state(self, new_player_state: PlayerState, player_id: str) -> "GameState":
-        player = self.players_by_id[player_id]
-        new_player = player.replace(player_state = new_player_state)
-        return self._update_player(player)
+        edit = self.edit()
+        edit.update_player(player_id, player_state = new_player_state)
+        return edit.commit()
 
     def _update_player(self, new_player: Player) -> "GameState":
-        other_players = Set(x for x in self.players if x.player_id != player.player_id)
-        players = frozenset(other_playsers.add(player))
-        return self.replace(players = players)
+        edit = self.edit()
+        edit.update_player(new_player.player_id,
+                faction = new_player.faction,
+                player_state = new_player.player_state)
+        return edit.commit()
 
     def __post_init__(self):
-        self.players_by_id = frozendict({x.player_id: x for x in self.players})
-        self.players_by_turn = frozendict({x.initial_turn_position: x for x in self.players})
+        if self.turn_order is None:
+            self.turn_order = tuple(range(self.num_players))
+        if self.players_by_id is None:
+            self.players_by_id = frozendict({x.player_id: x for x in self.players})
+        if self.players_by_turn is None:
+            self.players_by_turn = frozendict({x.initial_turn_position: x for x in self.players})
         self.active_player = self.players_by_turn[self.active_player_position]
         self.active_player_id = self.active_player.player_id
 
@@ -208,3 +705,85 @@ class GameState:
 #        return active_player + 1 if active_player < self.num_players else 1
 
 
+
+def get_initial_dwelling_order(factions: Tuple[Faction, ...]) -> Tuple[int, ...]:
+    """Turn positions in the order initial dwellings are placed: forwards then backwards through
+    the turn order, except that factions which place last (Chaos Magicians) place their single
+    dwelling after everyone else.
+    """
+    positions = tuple(i for i, x in enumerate(factions) if not x.place_last)
+    return positions + positions[::-1] \
+            + tuple(i for i, x in enumerate(factions) if x.place_last)
+
+
+class GameStateEdit:
+    """A batch of changes to a GameState which is committed as a single new GameState.
+
+    Player changes are staged per player and only the players that were touched are rebuilt on
+    commit. Everything else (the map, the setup, the tile pool if unchanged, and the untouched
+    players) is shared with the original GameState by reference, and the players_by_id and
+    players_by_turn indexes are patched rather than rebuilt.
+    """
+
+    def __init__(self, game_state: GameState):
+        self.game_state = game_state
+        self._player_changes: Dict[str, Dict[str, Any]] = {}
+        self._player_states: Dict[str, PlayerState] = {}
+        self._changes: Dict[str, Any] = {}
+
+    def get(self, name: str) -> Any:
+        """Return a GameState field, reflecting any change staged on this edit."""
+        if name in self._changes:
+            return self._changes[name]
+        return getattr(self.game_state, name)
+
+    def set(self, **changes):
+        self._changes.update(changes)
+
+    def get_player(self, player_id: str) -> Player:
+        player = self.game_state.players_by_id[player_id]
+        if player_id in self._player_changes:
+            return replace(player, **self._player_changes[player_id])
+        return player
+
+    def get_player_state(self, player_id: str) -> PlayerState:
+        if player_id in self._player_states:
+            return self._player_states[player_id]
+        return self.game_state.players_by_id[player_id].player_state
+
+    def update_player_state(self, player_id: str, **changes):
+        """Stage a dataclasses.replace() of the player's PlayerState."""
+        player_state = replace(self.get_player_state(player_id), **changes)
+        self.update_player(player_id, player_state = player_state)
+
+    def update_resources(self, player_id: str, new_resources: PlayerResourceState):
+        self.update_player_state(player_id, resources = new_resources)
+
+    def update_player(self, player_id: str, **changes):
+        """Stage a dataclasses.replace() of the Player itself, e.g. to set its faction."""
+        self._player_changes.setdefault(player_id, {}).update(changes)
+        if "player_state" in changes:
+            self._player_states[player_id] = changes["player_state"]
+
+    def commit(self) -> GameState:
+        game_state = self.game_state
+        players = game_state.players
+        players_by_id = game_state.players_by_id
+        players_by_turn = game_state.players_by_turn
+
+        for player_id, player_changes in self._player_changes.items():
+            player = replace(players_by_id[player_id], **player_changes)
+            players = tuple_replace(players, player.initial_turn_position, player)
+            players_by_id = frozendict_with_item(players_by_id, player_id, player)
+            players_by_turn = frozendict_with_item(
+                    players_by_turn, player.initial_turn_position, player)
+
+        new_state = replace(game_state,
+                players = players,
+                players_by_id = players_by_id,
+                players_by_turn = players_by_turn,
+                **self._changes)
+        if game_state.zobrist_key is not None:
+            new_state.zobrist_key = game_state.zobrist_key ^ get_zobrist_key_delta(
+                    game_state, new_state, tuple(self._player_changes))
+        return new_state
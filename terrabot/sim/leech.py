@@ -0,0 +1,98 @@
+"""Leech: the power offered to players whose structures neighbour a new or upgraded structure.
+
+Offers for every neighbouring player are computed together from the board's neighbourhood masks,
+and a player's decisions on all of their pending offers are resolved with a single update of
+their resources.
+"""
+from dataclasses import dataclass
+from typing import Callable, Mapping, Optional, Sequence, Tuple
+
+from frozendict import frozendict
+
+from terrabot.sim.bitboard import HEX_STRUCTURE_TYPES, Bitboard
+from terrabot.sim.resource import LeechOpportunity, PlayerResourceState, ResourceDelta
+from terrabot.sim.structure import STRUCTURE_POWER_VALUES
+from terrabot.util import count_bits
+
+_HEX_STRUCTURE_POWER_VALUES = tuple(STRUCTURE_POWER_VALUES[x] for x in HEX_STRUCTURE_TYPES)
+
+
+def get_leech_amounts(board: Bitboard, player_id: str, hex_id: int) -> Tuple[int, ...]:
+    """The power offered to each player, in board.player_ids order, by a structure of player_id
+    on the hex: the total power value of their own neighbouring structures. The builder is offered
+    nothing.
+    """
+    neighbourhood = board.get_neighbourhood_mask(hex_id)
+    if not neighbourhood & board.occupied:
+        return (0,) * len(board.players)
+    return tuple(
+            sum(value * count_bits(mask & neighbourhood)
+                    for value, mask in zip(_HEX_STRUCTURE_POWER_VALUES, other.structures))
+            if other_player_id != player_id and other.occupied & neighbourhood else 0
+            for other_player_id, other in zip(board.player_ids, board.players))
+
+
+def get_leech_opportunities(board: Bitboard, player_id: str, hex_id: int) -> frozendict:
+    """The LeechOpportunity of each other player with structures next to the hex, by player_id."""
+    return frozendict({other_player_id: LeechOpportunity(amount, player_id)
+            for other_player_id, amount in zip(board.player_ids,
+                    get_leech_amounts(board, player_id, hex_id))
+            if amount})
+
+
+def resolve_leech(
+        resources: PlayerResourceState,
+        opportunities: Sequence[LeechOpportunity],
+        decisions: Sequence[bool]) -> PlayerResourceState:
+    """A player's resources after accepting or declining each of their opportunities, taken in
+    order. Each accepted offer is clamped to the capacity the previous ones left, and all of them
+    are applied as one ResourceDelta.
+    """
+    capacity = resources.power.get_available_capacity()
+    power = 0
+    victory_points = 0
+    for opportunity, taken in zip(opportunities, decisions):
+        if taken and capacity:
+            amount = min(opportunity.amount, capacity)
+            capacity -= amount
+            power += amount
+            victory_points += amount - 1
+    if not power:
+        return resources
+    if resources.victory_points < victory_points:
+        raise ValueError("Not enough victory points to leech")
+    return resources.add(ResourceDelta(power=power, victory_points=-victory_points))
+
+
+@dataclass(frozen=True)
+class LeechPolicy:
+    """How offers are decided for players when leech is resolved as soon as it's offered, rather
+    than by the player on their next turn (see RuleSet.require_immediate_leech).
+    """
+    # The most points a player will pay for one offer, or None to accept whatever they can afford
+    max_victory_points: Optional[int] = None
+
+    def decide(self, opportunity: LeechOpportunity, resources: PlayerResourceState) -> bool:
+        power = min(opportunity.amount, resources.power.get_available_capacity())
+        cost = max(power - 1, 0)
+        return power > 0 and cost <= resources.victory_points \
+                and (self.max_victory_points is None or cost <= self.max_victory_points)
+
+
+ACCEPT_LEECH = LeechPolicy()
+DECLINE_LEECH = LeechPolicy(max_victory_points=-1)
+
+
+def resolve_offers(
+        opportunities: Mapping[str, LeechOpportunity],
+        get_resources: Callable[[str], PlayerResourceState],
+        policy: LeechPolicy) -> frozendict:
+    """Decide every player's new offer at once with the policy, returning the resources of each
+    player who accepted, by player_id.
+    """
+    resolved = {}
+    for player_id, opportunity in opportunities.items():
+        resources = get_resources(player_id)
+        if policy.decide(opportunity, resources):
+            resolved[player_id] = resolve_leech(resources, (opportunity,), (True,))
+    return frozendict(resolved)
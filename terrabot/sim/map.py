@@ -1,11 +1,13 @@
-from dataclasses import dataclass
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Tuple
+from typing import Dict, Iterator, List, Tuple
 from weakref import proxy, ProxyType
 
 from frozendict import frozendict
 
-from terrabot.sim.structure import StructureType
+from terrabot.util import iterate_bits
 
 class Terrain(Enum):
     MOUNTAIN = auto()
@@ -15,30 +17,37 @@ class Terrain(Enum):
     LAKE = auto()
     FOREST = auto()
     WASTELAND = auto()
+    RIVER = auto()
 
 
-@dataclass
+@dataclass(eq=False)
 class Location:
+    """A place on the board. Map classes are shared by every GameState using the board, so what
+    has been built on a Location (and a Hex's current terrain) is tracked per GameState by its
+    Bitboard rather than here.
+    """
     location_id: str
 
-    # Unclear if map.py classes should be aware of whether a player has built on a given location.
-    # Right now this information is duplicated in the Location and PlayerStructureState classes.
-    built_by_player: str # player_id
-    structure_type: StructureType # don't necessarily need both this and built_by_player
 
-
-@dataclass
+@dataclass(eq=False)
 class Hex(Location):
     adjacent_hexes: Tuple["Hex", ...] # Actually Tuple[ProxyType[Hex], ...]
     bridge_slots: Tuple["BridgeSlot", ...] # Actually Tuple[ProxyType[BridgeSlot], ...]
     terrain: Terrain
 
+    # Set by the Map containing this Hex
+    hex_id: int = field(default=None, repr=False) # dense index into the Map's hexes
+    map: "Map" = field(default=None, repr=False) # Actually ProxyType[Map]
+
     def get_hexes_within_shipping(self, shipping_level: int) -> Tuple["Hex", ...]:
-        pass
+        """Land hexes directly adjacent, or reachable across at most shipping_level river hexes."""
+        index = self.map.index
+        return self.map.get_hexes(index.get_shipping_mask(self.hex_id, shipping_level))
 
     def get_hexes_of_distance(self, distance, exclude_river: bool = True) -> Tuple["Hex", ...]:
         """Distance defined as-the-crow-flies. Useful for e.g. the Dwarves or Fakirs."""
-        pass
+        index = self.map.index
+        return self.map.get_hexes(index.get_distance_mask(self.hex_id, distance, exclude_river))
 
     def get_hexes_distance_two(self, exclude_river: bool = True) -> Tuple["Hex", ...]:
         return self.get_hexes_of_distance(2, exclude_river)
@@ -47,12 +56,141 @@ class Hex(Location):
         return self.get_hexes_of_distance(3, exclude_river)
 
 
-@dataclass
+@dataclass(eq=False)
 class BridgeSlot(Location):
     connected_hexes: Tuple[Hex, Hex]
 
 
-@dataclass
+MAX_SHIPPING = 5
+
+# Stored in the river distance matrix for pairs of hexes not connected by river
+UNREACHABLE = 255
+
+
+class MapIndex:
+    """Precomputed adjacency, distance and shipping tables for a Map.
+
+    Hexes are identified by dense integer ids (their position in Map.hexes). Sets of hexes are
+    Python ints used as bitsets, with bit i set for hex id i, so that e.g. "land hexes reachable
+    by shipping from any of my structures" is an OR of precomputed masks.
+
+    Attributes:
+        adjacency_offsets, adjacency - CSR adjacency: the neighbours of hex i are
+            adjacency[adjacency_offsets[i]:adjacency_offsets[i + 1]].
+        adjacency_masks - Bitset of the neighbours of each hex.
+        distance - Flattened (n x n) matrix of as-the-crow-flies distance, counting river hexes.
+        river_distance - Flattened (n x n) matrix of the fewest river hexes which must be crossed
+            to travel between two land hexes, or UNREACHABLE. Zero for adjacent land hexes.
+        shipping_masks - shipping_masks[s][i] is the bitset of land hexes other than i reachable
+            from land hex i with shipping value s, for s in 0 to MAX_SHIPPING.
+        bridge_endpoints - The pair of hex ids connected by each bridge slot, by bridge id (its
+            position in Map.bridge_slots).
+    """
+
+    def __init__(self, hexes: Tuple[Hex, ...], bridge_slots: Tuple[BridgeSlot, ...] = ()):
+        n = len(hexes)
+        self.num_hexes = n
+        self.location_ids: Tuple[str, ...] = tuple(x.location_id for x in hexes)
+        self.ids_by_location = frozendict({x: i for i, x in enumerate(self.location_ids)})
+        self.terrains: Tuple[Terrain, ...] = tuple(x.terrain for x in hexes)
+        self.river_mask = sum(1 << i for i, x in enumerate(self.terrains) if x == Terrain.RIVER)
+        self.land_mask = ((1 << n) - 1) & ~self.river_mask
+
+        neighbours = tuple(
+                tuple(self.ids_by_location[y.location_id] for y in x.adjacent_hexes)
+                for x in hexes)
+        self.adjacency_offsets = array("H", [0])
+        self.adjacency = array("H")
+        for x in neighbours:
+            self.adjacency.extend(x)
+            self.adjacency_offsets.append(len(self.adjacency))
+        self.adjacency_masks: Tuple[int, ...] = tuple(sum(1 << y for y in x) for x in neighbours)
+
+        self.distance = array("B", bytes(n * n))
+        self.max_distance = 0
+        for i in range(n):
+            for j, d in self._breadth_first_distances(i, neighbours, lambda x: True):
+                self.distance[i * n + j] = d
+                self.max_distance = max(self.max_distance, d)
+        self._distance_masks: Tuple[Tuple[int, ...], ...] = tuple(
+                tuple(self._mask_of_distance(i, d) for d in range(self.max_distance + 1))
+                for i in range(n))
+
+        self.river_distance = array("B", [UNREACHABLE]) * (n * n)
+        is_river = tuple(x == Terrain.RIVER for x in self.terrains)
+        for i in range(n):
+            if is_river[i]:
+                continue
+            for j in neighbours[i]:
+                if not is_river[j]:
+                    self.river_distance[i * n + j] = 0
+            for j, d in self._breadth_first_distances(i, neighbours, lambda x: is_river[x]):
+                # d counts the river hexes crossed, plus one for the land hex j itself
+                if not is_river[j] and d > 1:
+                    self.river_distance[i * n + j] = min(self.river_distance[i * n + j], d - 1)
+
+        self.shipping_masks: Tuple[Tuple[int, ...], ...] = tuple(
+                tuple(
+                        sum(1 << j for j in range(n)
+                                if j != i and self.river_distance[i * n + j] <= shipping)
+                        for i in range(n))
+                for shipping in range(MAX_SHIPPING + 1))
+
+        self.bridge_location_ids: Tuple[str, ...] = tuple(x.location_id for x in bridge_slots)
+        self.bridge_ids_by_location = frozendict(
+                {x: i for i, x in enumerate(self.bridge_location_ids)})
+        self.bridge_endpoints: Tuple[Tuple[int, int], ...] = tuple(
+                tuple(self.ids_by_location[y.location_id] for y in x.connected_hexes)
+                for x in bridge_slots)
+
+    @staticmethod
+    def _breadth_first_distances(origin: int, neighbours: Tuple[Tuple[int, ...], ...],
+            may_pass_through) -> Iterator[Tuple[int, int]]:
+        """Yield (hex id, distance) for hexes reachable from the origin, only passing through
+        hexes (other than the origin) for which may_pass_through is true.
+        """
+        seen = {origin}
+        queue = deque(((origin, 0),))
+        while queue:
+            current, d = queue.popleft()
+            if current != origin:
+                yield current, d
+                if not may_pass_through(current):
+                    continue
+            for x in neighbours[current]:
+                if x not in seen:
+                    seen.add(x)
+                    queue.append((x, d + 1))
+
+    def _mask_of_distance(self, hex_id: int, distance: int) -> int:
+        n = self.num_hexes
+        row = self.distance[hex_id * n:(hex_id + 1) * n]
+        return sum(1 << j for j, d in enumerate(row) if d == distance and j != hex_id) \
+                if distance else 1 << hex_id
+
+    def get_adjacent(self, hex_id: int) -> array:
+        return self.adjacency[self.adjacency_offsets[hex_id]:self.adjacency_offsets[hex_id + 1]]
+
+    def get_distance(self, from_hex_id: int, to_hex_id: int) -> int:
+        return self.distance[from_hex_id * self.num_hexes + to_hex_id]
+
+    def get_river_distance(self, from_hex_id: int, to_hex_id: int) -> int:
+        return self.river_distance[from_hex_id * self.num_hexes + to_hex_id]
+
+    def get_distance_mask(self, hex_id: int, distance: int, exclude_river: bool = True) -> int:
+        if distance > self.max_distance:
+            return 0
+        mask = self._distance_masks[hex_id][distance]
+        return mask & self.land_mask if exclude_river else mask
+
+    def get_shipping_mask(self, hex_id: int, shipping: int) -> int:
+        return self.shipping_masks[min(shipping, MAX_SHIPPING)][hex_id]
+
+    def get_hex_ids(self, mask: int) -> Iterator[int]:
+        return iterate_bits(mask)
+
+
+@dataclass(eq=False)
 class Map:
     locations: frozendict = frozendict()
     hexes: Tuple[Hex, ...] = ()
@@ -61,15 +199,102 @@ class Map:
     def __init__(self, hexes: Tuple[Hex, ...], bridge_slots: Tuple[BridgeSlot, ...]):
         self.hexes = hexes
         self.bridge_slots = bridge_slots
-        self.locations = {x.location_id: x for x in hexes + bridge_slots}
+        self.locations = frozendict({x.location_id: x for x in hexes + bridge_slots})
+        self._index = None
+
+        for hex_id, hex_ in enumerate(hexes):
+            hex_.hex_id = hex_id
+            hex_.map = proxy(self)
+
+    @property
+    def index(self) -> MapIndex:
+        """Built on first use and then kept for the life of the Map, so a module-level Map such
+        as DEFAULT_MAP pays for it once per process.
+        """
+        if self._index is None:
+            self._index = MapIndex(self.hexes, self.bridge_slots)
+        return self._index
+
+    def get_hexes(self, mask: int) -> Tuple[Hex, ...]:
+        return tuple(self.hexes[x] for x in self.index.get_hex_ids(mask))
 
+    @staticmethod
+    def create(rows: Tuple[Tuple[Terrain, ...], ...]) -> "Map":
+        """Create a Map from rows of terrain, in the layout of the Terra Mystica board: rows
+        alternate between long and short, with the short rows shifted right by half a hex.
+
+        Land hexes are named by row letter and their position among the row's land hexes (A1, A2,
+        ..., B1, ...) and river hexes are numbered in reading order (r0, r1, ...). Bridge slots are
+        created between land hexes which are two apart and share exactly two neighbours, both of
+        them river.
+        """
+        hexes_by_position: Dict[Tuple[int, int], Hex] = {}
+        num_river_hexes = 0
+        for row_index, row in enumerate(rows):
+            num_land_hexes = 0
+            for column_index, terrain in enumerate(row):
+                if terrain == Terrain.RIVER:
+                    location_id = f"r{num_river_hexes}"
+                    num_river_hexes += 1
+                else:
+                    num_land_hexes += 1
+                    location_id = f"{chr(ord('A') + row_index)}{num_land_hexes}"
+                hexes_by_position[(row_index, column_index)] = Hex(
+                        location_id, (), (), terrain)
+
+        adjacent_positions: Dict[Hex, List[Tuple[int, int]]] = {}
+        for (row_index, column_index), hex_ in hexes_by_position.items():
+            shift = row_index % 2
+            candidates = (
+                    (row_index, column_index - 1),
+                    (row_index, column_index + 1),
+                    (row_index - 1, column_index - 1 + shift),
+                    (row_index - 1, column_index + shift),
+                    (row_index + 1, column_index - 1 + shift),
+                    (row_index + 1, column_index + shift))
+            adjacent = tuple(hexes_by_position[x] for x in candidates if x in hexes_by_position)
+            hex_.adjacent_hexes = tuple(proxy(x) for x in adjacent)
+            adjacent_positions[hex_] = adjacent
+
+        hexes = tuple(hexes_by_position.values())
+        bridge_slots = []
+        for i, first in enumerate(hexes):
+            if first.terrain == Terrain.RIVER:
+                continue
+            first_adjacent = adjacent_positions[first]
+            for second in hexes[i + 1:]:
+                if second.terrain == Terrain.RIVER or second in first_adjacent:
+                    continue
+                shared = [x for x in adjacent_positions[second] if x in first_adjacent]
+                if len(shared) == 2 and all(x.terrain == Terrain.RIVER for x in shared):
+                    bridge_slots.append(BridgeSlot(
+                            f"{first.location_id}-{second.location_id}",
+                            (proxy(first), proxy(second))))
+
+        for hex_ in hexes:
+            hex_.bridge_slots = tuple(
+                    proxy(x) for x in bridge_slots
+                    if any(y.location_id == hex_.location_id for y in x.connected_hexes))
+
+        return Map(hexes, tuple(bridge_slots))
+
+
+# The transformation cycle. Each terrain is one spade away from its neighbours.
+TERRAIN_WHEEL = (
+        Terrain.FIELD,
+        Terrain.SWAMP,
+        Terrain.LAKE,
+        Terrain.FOREST,
+        Terrain.MOUNTAIN,
+        Terrain.WASTELAND,
+        Terrain.DESERT)
 
 _adjacent_terrains = frozendict({
-    Terrain.MOUNTAIN: (Terrain.WASTELAND, Terrain.DESERT),
-    Terrain.DESERT: (Terrain.MOUNTAIN, Terrain.FIELD),
-    Terrain.FIELD: (Terrain.DESERT, Terrain.SWAMP),
-    Terrain.SWAMP: (Terrain.FIELD, Terrain.LAKE),
-    Terrain.LAKE: (Terrain.SWAMP, Terrain.FOREST),
-    Terrain.FOREST: (Terrain.LAKE, Terrain.WASTELAND),
-    Terrain.WASTELAND: (Terrain.FOREST, Terrain.MOUNTAIN)})
+    x: (TERRAIN_WHEEL[i - 1], TERRAIN_WHEEL[(i + 1) % len(TERRAIN_WHEEL)])
+    for i, x in enumerate(TERRAIN_WHEEL)})
+
+def get_terrain_distance(from_: Terrain, to: Terrain) -> int:
+    """Number of spades needed to transform one terrain into another."""
+    difference = abs(TERRAIN_WHEEL.index(from_) - TERRAIN_WHEEL.index(to))
+    return min(difference, len(TERRAIN_WHEEL) - difference)
 
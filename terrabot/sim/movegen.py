@@ -0,0 +1,75 @@
+"""Legal move generation.
+
+Every ActionExecution available to the active player is generated lazily, action by action, in an
+order which suits a bot: the actions which usually gain the most (upgrades, then building) come
+before the minor ones, and passing comes last. A search which cuts off early only pays for the
+executions it looks at.
+
+GameState is immutable, so once a complete enumeration has been done for a state the result is
+memoized on GameState.available_executions and later enumerations simply iterate it. A count-only
+path is also provided for branching factor statistics, which lets each Action count its executions
+without constructing them (e.g. by counting the bits of a hex mask).
+"""
+from typing import Iterator, Tuple
+
+from terrabot.sim.action import Action, ActionExecution, AdvanceDigAction, AdvanceShipAction, \
+        BridgePowerAction, FactionSpecialAction, PassAction, ResourcePowerAction, \
+        SendPriestAction, SpadePowerAction, TileSlotAction, TransformAndBuildAction, \
+        UpgradeStructureAction
+
+# Lower is generated first. Off-turn actions are never mixed with other actions.
+_ACTION_PRIORITY = {
+    UpgradeStructureAction: 0,
+    TransformAndBuildAction: 1,
+    SpadePowerAction: 2,
+    TileSlotAction: 2,
+    FactionSpecialAction: 3,
+    BridgePowerAction: 3,
+    ResourcePowerAction: 3,
+    AdvanceShipAction: 4,
+    AdvanceDigAction: 4,
+    SendPriestAction: 5,
+    PassAction: 9,
+}
+
+_DEFAULT_PRIORITY = 6
+
+
+def get_ordered_actions(game_state: 'GameState') -> Tuple[Action, ...]:
+    """The available Actions, in the order their executions are generated."""
+    return tuple(sorted(game_state.get_available_actions(),
+            key = lambda x: _ACTION_PRIORITY.get(type(x), _DEFAULT_PRIORITY)))
+
+
+def iterate_available_executions(game_state: 'GameState') -> Iterator[ActionExecution]:
+    """Lazily yield every available ActionExecution. If the iteration runs to completion, the
+    result is memoized on the GameState.
+    """
+    cached = game_state.available_executions
+    if cached is not None:
+        yield from cached
+        return
+
+    executions = []
+    for action in get_ordered_actions(game_state):
+        for execution in action.get_available_executions(game_state):
+            executions.append(execution)
+            yield execution
+    game_state.available_executions = tuple(executions)
+
+
+def get_available_executions(game_state: 'GameState') -> Tuple[ActionExecution, ...]:
+    cached = game_state.available_executions
+    if cached is not None:
+        return cached
+    executions = tuple(iterate_available_executions(game_state))
+    game_state.available_executions = executions
+    return executions
+
+
+def count_available_executions(game_state: 'GameState') -> int:
+    """The number of available ActionExecutions, i.e. the branching factor at this state."""
+    cached = game_state.available_executions
+    if cached is not None:
+        return len(cached)
+    return sum(x.count_available_executions(game_state) for x in game_state.get_available_actions())
@@ -0,0 +1,272 @@
+"""Textual game logs: writing them, and parsing and replaying them move by move.
+
+The notation follows the one used by online Terra Mystica logs, which is also what Step
+descriptions (and so LogEntry lines) are written in. A log starts with a header giving the players
+in turn order and the setup, followed by one line per move:
+
+    players: alice, bob
+    round tiles: SCORE3, SCORE1, SCORE6, SCORE2, SCORE8, SCORE5
+    bonus tiles: BON1, BON3, BON4, BON6, BON9
+    player0: select witches
+    ...
+    witches: leech 1 from engineers. convert 1W to 1C. transform F3 to black. build F3
+    witches: +FAV11
+
+Each move line names the player acting (by faction once one is chosen, or else by player id) and
+lists its commands separated by ". ". Tiles and actions are written by their short codes, e.g.
+BON3 or ACT1. Leech decisions ("leech"/"decline N from <player>") and conversions ("convert 3PW
+to 1W") may surround the action, and several plies of the same player (e.g. an upgrade and the
+favor tile it earns) may share a line. Leech decisions may also be given on a line of their own,
+in which case they apply to the player's next move. "burn" commands are accepted and ignored,
+since spending power burns as needed. Blank lines and lines starting with "#" are ignored.
+
+Actions are resolved by matching their commands against the descriptions of the executions
+available at the current position, so a move the simulator doesn't consider legal is reported
+rather than applied.
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from frozendict import frozendict
+
+from terrabot.sim.action import ActionExecution, Phase
+from terrabot.sim.data.tiles import BONUS_TILES, ROUND_TILES
+from terrabot.sim.game import GameState, Move, Setup
+from terrabot.sim.player import PlayerMetadata
+from terrabot.sim.resource import Conversion, ResourceType
+
+_RESOURCE_ABBREVIATIONS = frozendict({
+    ResourceType.COINS: "C",
+    ResourceType.WORKERS: "W",
+    ResourceType.PRIESTS: "P",
+    ResourceType.POWER: "PW",
+    ResourceType.POINTS: "VP"})
+
+_RESOURCE_TYPES_BY_ABBREVIATION = frozendict(
+        {v.lower(): k for k, v in _RESOURCE_ABBREVIATIONS.items()})
+
+# e.g. "BonusTile-6Coin-(BON3)" or "Action-PWR-Bridge-(ACT1)"
+_SHORT_CODE_PATTERN = re.compile(r"[\w/-]*\((\w+)\)")
+_CONVERT_PATTERN = re.compile(r"convert (\d+)([a-z]+) to (\d+)([a-z]+)$")
+_LEECH_PATTERN = re.compile(r"(leech|decline) (\d+) from .+$")
+_BURN_PATTERN = re.compile(r"burn \d+$")
+
+
+class NotationError(ValueError):
+    def __init__(self, line_number: int, message: str):
+        super().__init__(f"Line {line_number}: {message}")
+        self.line_number = line_number
+
+
+def get_short_code(name: str) -> str:
+    """The code at the end of a tile name or action id, e.g. BON3 for "BonusTile-6Coin-(BON3)"."""
+    match = _SHORT_CODE_PATTERN.fullmatch(name)
+    return match.group(1) if match else name
+
+
+def shorten(text: str) -> str:
+    """Replace tile names and action ids with their short codes."""
+    return _SHORT_CODE_PATTERN.sub(r"\1", text)
+
+
+def normalize(text: str) -> str:
+    """The form commands are compared in: shortened, lower case, and single spaced."""
+    return " ".join(shorten(text).lower().split())
+
+
+def split_commands(text: str) -> Tuple[str, ...]:
+    return tuple(x for x in (normalize(y) for y in text.split(". ")) if x)
+
+
+_TILES_BY_CODE = frozendict({get_short_code(x.name).lower(): x for x in ROUND_TILES + BONUS_TILES})
+
+
+def get_player_name(game_state: GameState, player_id: str) -> str:
+    player = game_state.players_by_id[player_id]
+    return player.faction.name.lower() if player.faction is not None else player_id
+
+
+def _get_player_ids_by_name(game_state: GameState) -> Dict[str, str]:
+    """Players may be named by their name in the header, their player_id or their faction."""
+    names = {x.player_metadata.name.lower(): x.player_id for x in game_state.players}
+    names.update({x.player_id: x.player_id for x in game_state.players})
+    names.update(
+            {get_player_name(game_state, x.player_id): x.player_id for x in game_state.players})
+    return names
+
+
+#------------------------------------
+# Writing
+def format_header(game_state: GameState) -> Tuple[str, ...]:
+    setup = game_state.setup
+    return (
+            "players: " + ", ".join(x.player_metadata.name for x in game_state.players),
+            "round tiles: " + ", ".join(get_short_code(x.name) for x in setup.round_tiles),
+            "bonus tiles: " + ", ".join(get_short_code(x.name) for x in setup.bonus_tiles))
+
+
+def _format_conversion(conversion: Conversion, faction: "Faction") -> str:
+    spent = conversion.quantity_produced * Conversion.get_rate(
+            conversion.from_, conversion.to, faction)
+    return f"convert {spent}{_RESOURCE_ABBREVIATIONS[conversion.from_]} " \
+            + f"to {conversion.quantity_produced}{_RESOURCE_ABBREVIATIONS[conversion.to]}"
+
+
+def format_move(game_state: GameState, move: Move) -> str:
+    """One log line for a move played from the given state."""
+    player = game_state.active_player
+    commands = []
+    for opportunity, taken in zip(player.player_state.leech_opportunities
+            if player.player_state is not None else (), move.leech_decisions):
+        commands.append(f"{'leech' if taken else 'decline'} {opportunity.amount} "
+                + f"from {get_player_name(game_state, opportunity.from_player_id)}")
+    commands.extend(_format_conversion(x, player.faction) for x in move.conversions_before_action)
+    commands.append(shorten(move.execution.compute(game_state).description))
+    commands.extend(_format_conversion(x, player.faction) for x in move.conversions_after_action)
+    return f"{get_player_name(game_state, player.player_id)}: " + ". ".join(commands)
+
+
+def format_game(initial_state: GameState, moves: Iterable[Move]) -> Iterator[str]:
+    yield from format_header(initial_state)
+    game_state = initial_state
+    for move in moves:
+        yield format_move(game_state, move)
+        game_state = move.apply(game_state)
+
+
+#------------------------------------
+# Parsing
+def _iterate_lines(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line_number, line
+
+
+def _parse_tiles(line_number: int, text: str) -> tuple:
+    try:
+        return tuple(_TILES_BY_CODE[x.strip().lower()] for x in text.split(","))
+    except KeyError as e:
+        raise NotationError(line_number, f"Unknown tile {e.args[0]}")
+
+
+def _parse_header(lines: Iterator[Tuple[int, str]]) -> GameState:
+    header = {}
+    for line_number, line in lines:
+        key, _, value = line.partition(":")
+        header[key.strip().lower()] = (line_number, value.strip())
+        if len(header) == 3:
+            break
+    missing = {"players", "round tiles", "bonus tiles"} - set(header)
+    if missing:
+        raise NotationError(0, "Missing header " + ", ".join(sorted(missing)))
+
+    player_metadata = tuple(PlayerMetadata(x.strip()) for x in header["players"][1].split(","))
+    setup = Setup(_parse_tiles(*header["round tiles"]), _parse_tiles(*header["bonus tiles"]))
+    return GameState.create(player_metadata, randomize_turn_order=False, setup=setup)
+
+
+def _parse_conversion(command: str) -> Optional[Conversion]:
+    match = _CONVERT_PATTERN.match(command)
+    if match is None:
+        return None
+    _, from_, quantity, to = match.groups()
+    if from_ not in _RESOURCE_TYPES_BY_ABBREVIATION or to not in _RESOURCE_TYPES_BY_ABBREVIATION:
+        return None
+    return Conversion(_RESOURCE_TYPES_BY_ABBREVIATION[from_], _RESOURCE_TYPES_BY_ABBREVIATION[to],
+            int(quantity))
+
+
+def _match_action(game_state: GameState, commands: Tuple[str, ...]) \
+        -> Tuple[Optional[ActionExecution], int]:
+    """The available execution whose description matches the most leading commands, and the
+    number of commands it matched.
+    """
+    best, best_length = None, 0
+    for execution in game_state.iterate_available_executions():
+        description = split_commands(execution.compute(game_state).description)
+        if len(description) > best_length and commands[:len(description)] == description:
+            best, best_length = execution, len(description)
+    return best, best_length
+
+
+def iterate_moves(lines: Iterable[str], game_state: GameState) -> Iterator[Tuple[Move, GameState]]:
+    """Parse move lines and play them from the given state, yielding each Move with the state it
+    results in. Raises NotationError at the first line which can't be parsed or played.
+    """
+    yield from _iterate_moves(_iterate_lines(lines), game_state)
+
+
+def _iterate_moves(lines: Iterator[Tuple[int, str]], game_state: GameState) \
+        -> Iterator[Tuple[Move, GameState]]:
+    # Leech decisions given ahead of the player's move, by player_id
+    pending_leech: Dict[str, List[bool]] = {}
+    round_ = game_state.round
+    for line_number, line in lines:
+        name, separator, text = line.partition(":")
+        player_id = _get_player_ids_by_name(game_state).get(name.strip().lower())
+        if not separator or player_id is None:
+            raise NotationError(line_number, f"Unknown player in {line!r}")
+        commands = split_commands(text)
+
+        i = 0
+        while i < len(commands):
+            if game_state.round != round_:
+                # Leech not taken by the end of a round lapses
+                pending_leech.clear()
+                round_ = game_state.round
+
+            leech_decisions = pending_leech.pop(player_id, [])
+            conversions = []
+            while i < len(commands):
+                match = _LEECH_PATTERN.match(commands[i])
+                conversion = _parse_conversion(commands[i])
+                if match is not None:
+                    leech_decisions.append(match.group(1) == "leech")
+                elif conversion is not None:
+                    conversions.append(conversion)
+                elif _BURN_PATTERN.match(commands[i]) is None:
+                    break
+                i += 1
+            if i == len(commands) and not conversions:
+                pending_leech[player_id] = leech_decisions
+                break
+
+            if game_state.phase == Phase.OVER:
+                raise NotationError(line_number, "The game is over")
+            if player_id != game_state.active_player_id:
+                active_name = get_player_name(game_state, game_state.active_player_id)
+                raise NotationError(line_number,
+                        f"It is {active_name}'s turn, not {name.strip()}'s")
+            try:
+                prepared_state = game_state.apply_pre_action_changes(leech_decisions, conversions) \
+                        if leech_decisions or conversions else game_state
+            except ValueError as e:
+                raise NotationError(line_number, str(e))
+            execution, length = _match_action(prepared_state, commands[i:])
+            if execution is None:
+                raise NotationError(line_number,
+                        f"No available action matches {'. '.join(commands[i:])!r}")
+            i += length
+
+            conversions_after = []
+            while i < len(commands) and _parse_conversion(commands[i]) is not None:
+                conversions_after.append(_parse_conversion(commands[i]))
+                i += 1
+
+            move = Move(execution, tuple(leech_decisions), tuple(conversions),
+                    tuple(conversions_after))
+            try:
+                game_state = move.apply(game_state)
+            except ValueError as e:
+                raise NotationError(line_number, str(e))
+            yield move, game_state
+
+
+def read_game(lines: Iterable[str]) -> Tuple[GameState, Iterator[Tuple[Move, GameState]]]:
+    """Parse a whole log: the initial state from its header, and an iterator which parses and
+    plays its moves one line at a time.
+    """
+    numbered_lines = _iterate_lines(lines)
+    initial_state = _parse_header(numbered_lines)
+    return initial_state, _iterate_moves(numbered_lines, initial_state)
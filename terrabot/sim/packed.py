@@ -0,0 +1,139 @@
+"""Packed, fixed-layout encoding of a player's numeric state.
+
+A player's numbers are spread across PlayerResourceState, PowerBowlState, PlayerCultState and
+PlayerState. Packing them into one array('h') row with a stable field order makes copying,
+hashing, equality and serialization a single buffer operation, and lets many rows share one
+contiguous PlayerStateBlock for batch evaluation.
+
+The field order is part of the on-disk format of anything built on these rows. Only append new
+fields to PlayerField, and bump PACKED_SCHEMA_VERSION when doing so.
+"""
+from array import array
+from dataclasses import replace
+from enum import IntEnum
+from typing import Iterable, Iterator
+
+from terrabot.sim.cult import PlayerCultState
+from terrabot.sim.player import PlayerState
+from terrabot.sim.resource import PlayerResourceState, PowerBowlState
+
+PACKED_SCHEMA_VERSION = 1
+
+# Signed 16 bit integers. Victory points are the largest quantity and comfortably fit.
+PACKED_TYPECODE = "h"
+
+class PlayerField(IntEnum):
+    COINS = 0
+    WORKERS = 1
+    PRIESTS = 2
+    PRIEST_POOL_SIZE = 3
+    POWER_BOWL_ONE = 4
+    POWER_BOWL_TWO = 5
+    POWER_BOWL_THREE = 6
+    VICTORY_POINTS = 7
+    FIRE = 8
+    WATER = 9
+    EARTH = 10
+    AIR = 11
+    DIG_LEVEL = 12
+    SHIP_LEVEL = 13
+    CULTIST_STEPS = 14
+
+
+NUM_PLAYER_FIELDS = len(PlayerField)
+
+
+def pack_player_state(player_state: PlayerState) -> array:
+    resources = player_state.resources
+    power = resources.power
+    cult_state = player_state.cult_state
+    return array(PACKED_TYPECODE, (
+            resources.coins,
+            resources.workers,
+            resources.priests,
+            resources.priest_pool_size,
+            power.bowl_one,
+            power.bowl_two,
+            power.bowl_three,
+            resources.victory_points,
+            cult_state.fire,
+            cult_state.water,
+            cult_state.earth,
+            cult_state.air,
+            player_state.dig_level,
+            player_state.ship_level,
+            player_state.cultist_steps))
+
+
+def unpack_player_state(packed: Iterable[int], template: PlayerState = None) -> PlayerState:
+    """Rebuild a PlayerState from a packed row. Fields which aren't numeric (structures, tiles,
+    leech opportunities, etc) are taken from the template, if provided.
+    """
+    (coins, workers, priests, priest_pool_size, bowl_one, bowl_two, bowl_three, victory_points,
+            fire, water, earth, air, dig_level, ship_level, cultist_steps) = packed
+    template = template if template is not None else PlayerState()
+    return replace(template,
+            dig_level = dig_level,
+            ship_level = ship_level,
+            resources = PlayerResourceState(
+                    coins = coins,
+                    workers = workers,
+                    priests = priests,
+                    priest_pool_size = priest_pool_size,
+                    power = PowerBowlState.create(bowl_one, bowl_two, bowl_three),
+                    victory_points = victory_points),
+            cult_state = PlayerCultState(fire, water, earth, air),
+            cultist_steps = cultist_steps)
+
+
+def packed_key(player_state: PlayerState) -> bytes:
+    """Hashable key identifying a player's numeric state."""
+    return pack_player_state(player_state).tobytes()
+
+
+class PlayerStateBlock:
+    """Many packed player states stored row-major in one contiguous array."""
+
+    def __init__(self, data: array = None):
+        self.data = data if data is not None else array(PACKED_TYPECODE)
+        if self.data.typecode != PACKED_TYPECODE or len(self.data) % NUM_PLAYER_FIELDS:
+            raise ValueError("Data is not a whole number of packed player states")
+
+    @staticmethod
+    def from_player_states(player_states: Iterable[PlayerState]) -> "PlayerStateBlock":
+        block = PlayerStateBlock()
+        for player_state in player_states:
+            block.append(player_state)
+        return block
+
+    @staticmethod
+    def frombytes(buffer: bytes) -> "PlayerStateBlock":
+        data = array(PACKED_TYPECODE)
+        data.frombytes(buffer)
+        return PlayerStateBlock(data)
+
+    def tobytes(self) -> bytes:
+        return self.data.tobytes()
+
+    def append(self, player_state: PlayerState):
+        self.data.extend(pack_player_state(player_state))
+
+    def row(self, index: int) -> memoryview:
+        """Zero-copy view of one packed player state."""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = index * NUM_PLAYER_FIELDS
+        return memoryview(self.data)[start:start + NUM_PLAYER_FIELDS]
+
+    def column(self, field: PlayerField) -> array:
+        """One field across every row, e.g. everyone's victory points."""
+        return self.data[field::NUM_PLAYER_FIELDS]
+
+    def unpack(self, index: int, template: PlayerState = None) -> PlayerState:
+        return unpack_player_state(self.row(index), template)
+
+    def __len__(self) -> int:
+        return len(self.data) // NUM_PLAYER_FIELDS
+
+    def __iter__(self) -> Iterator[memoryview]:
+        return (self.row(i) for i in range(len(self)))
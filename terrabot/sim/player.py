@@ -1,22 +1,29 @@
-from dataclasses import dataclass
-from typing import Tuple
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, Optional, Tuple
 
-from terrabot.sim.cult import CultDelta, PlayerCultState
-from terrabot.sim.event import EventTrigger
+from frozendict import frozendict
+
+from terrabot.sim.cult import NO_CULT_STEPS, Cult, CultDelta, PlayerCultState
+from terrabot.sim.event import EventTrigger, PassTrigger, compile_pass_triggers, \
+        sum_event_triggers
 from terrabot.sim.map import Terrain
-from terrabot.sim.resource import ResourceDelta, PlayerResourceState, _DEFAULT_CONVERSION_RATES,
-        LeechOpportunity
-from terrabot.sim.structure import PlayerStructureState
+from terrabot.sim.resource import NO_RESOURCES, ResourceDelta, PlayerResourceState, \
+        _DEFAULT_CONVERSION_RATES, LeechOpportunity
+from terrabot.sim.structure import STRUCTURE_LIMITS, PlayerStructureState, Structure, \
+        StructureType
 from terrabot.sim.tile import Tile, TileSet
+from terrabot.sim.town import TownTracker
+from terrabot.util import count_bits, intern
 
 @dataclass
 class PlayerState:
     dig_level: int = 0
     ship_level: int = 0
     tiles: TileSet = TileSet()
-    structures: PlayerStructureState = PlayerStructureState()
-    resources: PlayerResourceState = PlayerResourceState()
-    cult_state: PlayerCultState = PlayerCultState()
+    structures: PlayerStructureState = field(default_factory=PlayerStructureState)
+    resources: PlayerResourceState = field(default_factory=PlayerResourceState)
+    cult_state: PlayerCultState = field(default_factory=PlayerCultState)
+    towns: TownTracker = field(default_factory=TownTracker)
     has_passed: bool = False
 
     leech_opportunities: Tuple[LeechOpportunity, ...] = ()
@@ -24,20 +31,132 @@ class PlayerState:
     # Cultists. Number of free cult steps the player has to spend.
     cultist_steps: int = 0
 
+    # Tiles earned by the player's last step which they have not yet chosen.
+    town_tile_decisions: int = 0
+    favor_tile_decisions: int = 0
+
+    # Keys the player must still choose tracks for, out of the contested tracks. See CultAdvance.
+    cult_key_decisions: int = 0
+    contested_cults: Tuple[Cult, ...] = ()
+
+    # Spades from the last round tile's cult bonus which the player has yet to use
+    bonus_spade_decisions: int = 0
+
+    # Equal to Faction.get_income(), kept up to date as structures are built and tiles change hands
+    income: ResourceDelta = NO_RESOURCES
+    # Equal to Faction.get_event_resources(), rebuilt when the player's tiles or the round change
+    event_resources: frozendict = frozendict()
+
+    @staticmethod
+    def create(faction: "Faction") -> "PlayerState":
+        return PlayerState(
+                income = faction.rules.base_income,
+                ship_level = faction.starting_ship_level,
+                resources = PlayerResourceState().add(faction.starting_resources),
+                cult_state = PlayerCultState().add(faction.starting_cult_steps))
+
+
+# Spades cost this many workers each at dig level 0, and one fewer per level
+_BASE_DIG_COST_WORKERS = 3
+
+
+@dataclass(frozen=True)
+class FactionRules:
+    """A Faction's costs and incomes as flat tables, compiled once when the Faction is created so
+    that move generation and the income phase index them rather than summing tuples of deltas.
+    """
+    # by StructureType: (cost without neighbours, cost with neighbours). Only trading posts differ.
+    building_costs: frozendict
+    # by StructureType: income from that many structures of the type, indexed by count
+    structure_income: frozendict
+    # by StructureType: income added by one more structure of the type, indexed by count before
+    marginal_income: frozendict
+    base_income: ResourceDelta # whatever the player has built
+    dig_costs: Tuple[ResourceDelta, ...] # cost of one spade, indexed by dig level
+    conversion_rates: frozendict # by (from, to) ResourceType
+
+    @staticmethod
+    def compile(faction: "Faction") -> "FactionRules":
+        trading_post_costs = (faction.trading_post_cost_without_neighbors,
+                faction.trading_post_cost_with_neighbors)
+        building_costs = frozendict({
+            StructureType.DWELLING: (faction.dwelling_cost,) * 2,
+            StructureType.TRADING_POST: trading_post_costs,
+            StructureType.TEMPLE: (faction.temple_cost,) * 2,
+            StructureType.SANCTUARY: (faction.sanctuary_cost,) * 2,
+            StructureType.STRONGHOLD: (faction.stronghold_cost,) * 2})
+        structure_income = frozendict({
+            StructureType.DWELLING: faction.dwelling_income,
+            StructureType.TRADING_POST: faction.trading_post_income,
+            StructureType.TEMPLE: faction.temple_income,
+            StructureType.SANCTUARY: (faction.sanctuary_income,),
+            StructureType.STRONGHOLD: (faction.stronghold_income,),
+            StructureType.BRIDGE: ()})
+        structure_income = frozendict({k: _get_cumulative_income(v, STRUCTURE_LIMITS[k])
+                for k, v in structure_income.items()})
+        marginal_income = frozendict({k: tuple(intern(v[i + 1] - v[i]) for i in range(len(v) - 1))
+                for k, v in structure_income.items()})
+        dig_costs = tuple(intern(ResourceDelta(workers=_BASE_DIG_COST_WORKERS - x))
+                for x in range(faction.max_dig_level + 1))
+        return FactionRules(building_costs, structure_income, marginal_income,
+                faction.zero_dwelling_income, dig_costs, faction.resource_conversion_rates)
+
+    def get_structure_income(self, counts: Dict[StructureType, int]) -> ResourceDelta:
+        """Income from the given number of each type of structure."""
+        income = self.base_income
+        for structure_type, count in counts.items():
+            income = income + self.structure_income[structure_type][count]
+        return income
+
+    def get_income_change(
+            self,
+            board: "Bitboard",
+            player_id: str,
+            new_structures: Tuple[Structure, ...]) -> ResourceDelta:
+        """The change in a player's income from building structures on the board as it was before
+        they were built, each replacing whatever the player had at its location.
+        """
+        player_board = board.for_player(player_id)
+        counts = {}
+        income = NO_RESOURCES
+        for structure in new_structures:
+            structure_type = structure.structure_type
+            if structure_type == StructureType.BRIDGE:
+                continue
+            replaced_type = board.get_structure_type(board.get_hex_id(structure.location))
+            for x in (structure_type, replaced_type):
+                if x is not None and x not in counts:
+                    counts[x] = count_bits(player_board.get_structure_mask(x))
+            income = income + self.marginal_income[structure_type][counts[structure_type]]
+            counts[structure_type] += 1
+            if replaced_type is not None:
+                counts[replaced_type] -= 1
+                income = income - self.marginal_income[replaced_type][counts[replaced_type]]
+        return income
+
+
+def _get_cumulative_income(income: Tuple[ResourceDelta, ...], limit: int) \
+        -> Tuple[ResourceDelta, ...]:
+    """Sums of the first 0 to limit entries of an income track."""
+    cumulative = [NO_RESOURCES]
+    for i in range(limit):
+        cumulative.append(intern(cumulative[-1] + income[i]) if i < len(income) else cumulative[-1])
+    return tuple(cumulative)
+
 
 @dataclass
 class Faction:
     name: str
     home_terrain: Terrain
 
-    starting_ship_level = 0
+    starting_ship_level: int = 0
 
     max_ship_level: int = 3
     max_dig_level: int = 3
 
     dwelling_cost: ResourceDelta = ResourceDelta(coins=2, workers=1)
     trading_post_cost_with_neighbors: ResourceDelta = ResourceDelta(coins=3, workers=2)
-    trading_post_cost_without_neighbors: ResourceDelta = ResourceDelta(coins=3, workers=2)
+    trading_post_cost_without_neighbors: ResourceDelta = ResourceDelta(coins=6, workers=2)
     temple_cost: ResourceDelta = ResourceDelta(coins=5, workers=2)
     stronghold_cost: ResourceDelta = ResourceDelta(coins=6, workers=4)
     sanctuary_cost: ResourceDelta = ResourceDelta(coins=6, workers=4)
@@ -46,7 +165,7 @@ class Faction:
     dig_advance_cost: ResourceDelta = ResourceDelta(coins=5, workers=2, priests=1)
 
     starting_resources: ResourceDelta = ResourceDelta(coins=15, workers=3, power=7)
-    starting_cult_steps: CultDelta = CultDelta()
+    starting_cult_steps: CultDelta = NO_CULT_STEPS
 
     zero_dwelling_income: ResourceDelta = ResourceDelta(workers=1)
     dwelling_income: Tuple[ResourceDelta, ...] = tuple([ResourceDelta(workers=1)]) * 8
@@ -65,12 +184,45 @@ class Faction:
     # Chaos Magicians
     place_last: bool = False
 
+    # Engineers: points when passing, once the stronghold is built
+    stronghold_pass_trigger: PassTrigger = None
+
+    rules: FactionRules = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Factions differ from the defaults in only a few costs and incomes, so intern the rest to
+        # share them
+        for x in fields(self):
+            if not x.init:
+                continue
+            value = getattr(self, x.name)
+            if isinstance(value, (ResourceDelta, CultDelta)):
+                setattr(self, x.name, intern(value))
+            elif isinstance(value, tuple) and all(isinstance(y, ResourceDelta) for y in value):
+                setattr(self, x.name, intern(tuple(intern(y) for y in value)))
+        self.rules = FactionRules.compile(self)
+
     def get_shipping(self, player_state: PlayerState) -> int:
-        return ship_level + 1
+        return player_state.ship_level \
+                + sum(x.shipping_modifier for x in player_state.tiles.get_all())
+
+    def get_income(self, player_state: PlayerState) -> ResourceDelta:
+        """Income from the player's structures and tiles at the start of a round."""
+        income = self.rules.get_structure_income(player_state.structures.type_counts)
+        return sum((x.income for x in player_state.tiles.get_all()), income)
+
+    def get_pass_points(self, player_state: PlayerState) -> int:
+        """Points for passing with the player's current tiles and structures, before the bonus tile
+        they hold is returned.
+        """
+        counts = player_state.structures.type_counts
+        triggers = tuple(x.pass_trigger for x in player_state.tiles.get_all())
+        if counts[StructureType.STRONGHOLD]:
+            triggers += (self.stronghold_pass_trigger,)
+        return compile_pass_triggers(triggers)(counts, player_state.ship_level)
 
     def get_dig_cost(self, player_state: PlayerState) -> ResourceDelta:
-        default_cost_workers = 3 - player_state.dig_level
-        return ResourceDelta(workers=default_cost_workers)
+        return self.rules.dig_costs[player_state.dig_level]
 
     def get_special_actions(self, player_state: PlayerState) -> Tuple[str, ...]:
         """Returns special actions available to the player even if they have been used this round,
@@ -79,8 +231,22 @@ class Faction:
         return ()
 
     def get_event_triggers(self, player_state: PlayerState) -> Tuple[EventTrigger, ...]:
+        """Triggers from the faction itself. These are cached in PlayerState.event_resources, which
+        is only rebuilt when the player's tiles or the round change.
+        """
         return ()
 
+    def get_event_resources(self, player_state: PlayerState, round_tile: Optional[Tile]) \
+            -> frozendict:
+        """Resources the player receives each time an event happens, by EventType, from their own
+        tiles and faction and from the round tile.
+        """
+        triggers = [x.event_trigger for x in player_state.tiles.get_all()]
+        triggers.extend(self.get_event_triggers(player_state))
+        if round_tile is not None:
+            triggers.append(round_tile.event_trigger)
+        return sum_event_triggers(tuple(triggers))
+
 
 @dataclass
 class PlayerMetadata:
@@ -108,11 +274,11 @@ class Player:
         return f"player{initial_turn_position}"
 
     def update_structures(self, new_structures: PlayerStructureState) -> "Player":
-        return self.replace(player_state = self.player_state.replace(structures = new_structures)
+        return replace(self, player_state = replace(self.player_state, structures = new_structures))
 
     def update_resources(self, new_resources: PlayerResourceState) -> "Player":
-        return self.replace(player_state = self.player_state.replace(resources = new_resources)
+        return replace(self, player_state = replace(self.player_state, resources = new_resources))
 
     def update_cult(self, new_cult: PlayerCultState) -> "Player":
-        return self.replace(player_state = self.player_state.replace(cult_state = new_cult)
+        return replace(self, player_state = replace(self.player_state, cult_state = new_cult))
 
@@ -1,6 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from enum import Enum, auto
-from typing import Tuple
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from frozendict import frozendict
+
+from terrabot.util import intern, slotted
 
 class ResourceType(Enum):
     COINS = auto()
@@ -10,7 +15,8 @@ class ResourceType(Enum):
     POINTS = auto()
 
 
-@dataclass
+@slotted
+@dataclass(frozen=True)
 class ResourceDelta:
     coins: int = 0
     workers: int = 0
@@ -20,15 +26,15 @@ class ResourceDelta:
 
     def add_by_type(self, amount: int, resource_type: ResourceType):
         if resource_type == ResourceType.COINS:
-            return ResourceDelta(coins = self.coins + amount)
+            return replace(self, coins = self.coins + amount)
         elif resource_type == ResourceType.WORKERS:
-            return ResourceDelta(workers = self.workers + amount)
+            return replace(self, workers = self.workers + amount)
         elif resource_type == ResourceType.PRIESTS:
-            return ResourceDelta(priests = self.priests + amount)
+            return replace(self, priests = self.priests + amount)
         elif resource_type == ResourceType.POWER:
-            return ResourceDelta(power = self.power + amount)
+            return replace(self, power = self.power + amount)
         elif resource_type == ResourceType.POINTS:
-            return ResourceDelta(victory_points = self.victory_points + amount)
+            return replace(self, victory_points = self.victory_points + amount)
         else:
             raise AssertionError(f"Unrecognized ResourceType {resource_type}.")
 
@@ -44,9 +50,25 @@ class ResourceDelta:
             changes.append(f"{self.power}PW")
         if self.victory_points:
             changes.append(f"{self.victory_points}VP")
-        return return f"({changes.join(", ")})"
+        return "({})".format(", ".join(changes))
+
+    def __eq__(self, other: object) -> bool:
+        # Interned deltas are compared by identity
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.coins == other.coins \
+                and self.workers == other.workers \
+                and self.priests == other.priests \
+                and self.power == other.power \
+                and self.victory_points == other.victory_points
 
     def __add__(self, other: "ResourceDelta") -> "ResourceDelta":
+        if other is NO_RESOURCES:
+            return self
+        if self is NO_RESOURCES:
+            return other
         coins = self.coins + other.coins
         workers = self.workers + other.workers
         priests = self.priests + other.priests
@@ -55,6 +77,8 @@ class ResourceDelta:
         return ResourceDelta(coins, workers, priests, power, victory_points)
 
     def __sub__(self, other: "ResourceDelta") -> "ResourceDelta":
+        if other is NO_RESOURCES:
+            return self
         coins = self.coins - other.coins
         workers = self.workers - other.workers
         priests = self.priests - other.priests
@@ -62,6 +86,14 @@ class ResourceDelta:
         victory_points = self.victory_points - other.victory_points
         return ResourceDelta(coins, workers, priests, power, victory_points)
 
+    def __mul__(self, factor: int) -> "ResourceDelta":
+        coins = self.coins * factor
+        workers = self.workers * factor
+        priests = self.priests * factor
+        power = self.power * factor
+        victory_points = self.victory_points * factor
+        return ResourceDelta(coins, workers, priests, power, victory_points)
+
     def __neg__(self) -> "ResourceDelta":
         coins = -self.coins
         workers = -self.workers
@@ -71,16 +103,19 @@ class ResourceDelta:
         return ResourceDelta(coins, workers, priests, power, victory_points)
 
 
+NO_RESOURCES = intern(ResourceDelta())
+
+
 _DEFAULT_CONVERSION_RATES = frozendict({
     (ResourceType.POWER, ResourceType.PRIESTS): 5,
     (ResourceType.POWER, ResourceType.WORKERS): 3,
     (ResourceType.POWER, ResourceType.COINS): 1,
     (ResourceType.PRIESTS, ResourceType.WORKERS): 1,
     (ResourceType.PRIESTS, ResourceType.COINS): 1,
-    (ResourceType.WORKERS, ResourceType.COINS): 1,
+    (ResourceType.WORKERS, ResourceType.COINS): 1})
 
 
-@dataclass
+@dataclass(frozen=True)
 class Conversion:
     #   PW ->
     #       P
@@ -98,17 +133,17 @@ class Conversion:
     to: ResourceType
     quantity_produced: int
 
-    def get_resource_delta(self, faction: "Faction"):
+    def get_resource_delta(self, faction: "Faction" = None) -> ResourceDelta:
         rate = Conversion.get_rate(self.from_, self.to, faction)
-        quantity_spent = quantity_produced * rate
-        return ResourceDelta() \
-                .add_by_type(-from_ * quantity_spent) \
-                .add_by_type(to * quantity_produced)
+        quantity_spent = self.quantity_produced * rate
+        return NO_RESOURCES \
+                .add_by_type(-quantity_spent, self.from_) \
+                .add_by_type(self.quantity_produced, self.to)
 
     @staticmethod
     def get_rate(from_: ResourceType, to: ResourceType, faction: "Faction" = None) -> int:
         if faction:
-            rate_map = faction.resource_conversion_rates
+            rate_map = faction.rules.conversion_rates
         else:
             rate_map = _DEFAULT_CONVERSION_RATES
 
@@ -118,14 +153,82 @@ class Conversion:
             raise ValueError(f"No available conversion from {from_} to {to}")
 
 
-@dataclass
+# Players never have more power tokens than they start with, so every reachable PowerBowlState is
+# in the transition tables below
+MAX_POWER_TOKENS = 12
+
+_TABLE_SIZE = (MAX_POWER_TOKENS + 1) ** 3
+
+
+def _get_table_index(bowl_one: int, bowl_two: int, bowl_three: int) -> int:
+    """The position of a bowl configuration in the transition tables, or -1 if it isn't there."""
+    if bowl_one < 0 or bowl_two < 0 or bowl_three < 0 \
+            or bowl_one + bowl_two + bowl_three > MAX_POWER_TOKENS:
+        return -1
+    return (bowl_one * (MAX_POWER_TOKENS + 1) + bowl_two) * (MAX_POWER_TOKENS + 1) + bowl_three
+
+
+@slotted
+@dataclass(frozen=True)
 class PowerBowlState:
+    """Power tokens in each of the three bowls. Gaining, spending and burning power look the result
+    up in tables of every reachable configuration, built once at import, and return the shared
+    instance found there rather than allocating one.
+    """
     bowl_one: int = 12
     bowl_two: int = 0
     bowl_three: int = 0
+    index: int = field(default=-1, init=False, repr=False, compare=False) # in the tables
+
+    def __post_init__(self):
+        object.__setattr__(self, "index",
+                _get_table_index(self.bowl_one, self.bowl_two, self.bowl_three))
+
+    @staticmethod
+    def create(bowl_one: int = 12, bowl_two: int = 0, bowl_three: int = 0) -> "PowerBowlState":
+        """The shared instance of a configuration, if it is in the tables."""
+        index = _get_table_index(bowl_one, bowl_two, bowl_three)
+        if index < 0:
+            return PowerBowlState(bowl_one, bowl_two, bowl_three)
+        return _POWER_BOWL_STATES[index]
+
+    def __eq__(self, other: object) -> bool:
+        # Shared instances are compared by identity
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.bowl_one == other.bowl_one \
+                and self.bowl_two == other.bowl_two \
+                and self.bowl_three == other.bowl_three
 
     def gain(self, power: int) -> "PowerBowlState":
-        if power <= self.available_capacity():
+        if self.index < 0 or power < 0:
+            return self._compute_gain(power)
+        gains = _GAINS[self.index]
+        return gains[power] if power < len(gains) else gains[-1]
+
+    def spend(self, power: int) -> "PowerBowlState":
+        """Spend power, burning as much as is needed to."""
+        if self.index < 0 or power < 0:
+            return self._compute_spend(power)
+        spends = _SPENDS[self.index]
+        if power >= len(spends):
+            raise ValueError(
+                    f"Tried to spend {power} power, only {self.get_available_power()} available.")
+        return spends[power]
+
+    def burn(self, power: int) -> "PowerBowlState":
+        """Move power from bowl two to bowl three, removing as many tokens from the game."""
+        if self.index < 0 or power < 0:
+            return self._compute_burn(power)
+        burns = _BURNS[self.index]
+        if power >= len(burns):
+            raise ValueError(f"Tried to burn {power} power, only {len(burns) - 1} available.")
+        return burns[power]
+
+    def _compute_gain(self, power: int) -> "PowerBowlState":
+        if power >= self.get_available_capacity():
             bowl_one = 0
             bowl_two = 0
             bowl_three = self.bowl_one + self.bowl_two + self.bowl_three
@@ -139,29 +242,22 @@ class PowerBowlState:
             bowl_two = self.bowl_one + self.bowl_two - excess
             bowl_three = self.bowl_three + excess
 
-        return replace(self,
-                bowl_one = bowl_one,
-                bowl_two = bowl_two,
-                bowl_three = bowl_three)
+        return PowerBowlState.create(bowl_one, bowl_two, bowl_three)
 
-    def spend(self, power: int) -> "PowerBowlState":
-        if power < self.available_power():
+    def _compute_spend(self, power: int) -> "PowerBowlState":
+        if power > self.get_available_power():
             raise ValueError(
-                    f"Tried to spend {power} power, only {self.available_power()} available.")
-        elif power < self.bowl_three:
-            bowl_one = self.bowl_one + power
-            bowl_two = self.bowl_two
-            bowl_three = self.bowl_three - power
-        else:
-            burn = power - self.bowl_three
-            bowl_one = self.bowl_one + power
-            bowl_two = self.bowl_two - (2 * burn)
-            bowl_three = 0
-
-        return replace(self,
-                bowl_one = bowl_one,
-                bowl_two = bowl_two,
-                bowl_three = bowl_three)
+                    f"Tried to spend {power} power, only {self.get_available_power()} available.")
+        burned = max(power - self.bowl_three, 0)
+        burnt = self._compute_burn(burned)
+        return PowerBowlState.create(
+                burnt.bowl_one + power, burnt.bowl_two, burnt.bowl_three - power)
+
+    def _compute_burn(self, power: int) -> "PowerBowlState":
+        if 2 * power > self.bowl_two:
+            raise ValueError(f"Tried to burn {power} power, only {self.bowl_two // 2} available.")
+        return PowerBowlState.create(
+                self.bowl_one, self.bowl_two - 2 * power, self.bowl_three + power)
 
     def get_num_tokens(self):
         return self.bowl_one + self.bowl_two + self.bowl_three
@@ -172,8 +268,38 @@ class PowerBowlState:
 
     def get_available_capacity(self):
         """how much more power could be gained"""
-        num_tokesn = self.get_num_tokens()
-        return 2 * (num_tokens - self.bowl_one) + (num_tokens - self.bowl_two)
+        return 2 * self.bowl_one + self.bowl_two
+
+
+def _build_power_bowl_states() -> Tuple[Optional[PowerBowlState], ...]:
+    """The shared instance of every configuration of at most MAX_POWER_TOKENS tokens, by table
+    index, with None at the indexes no configuration maps to.
+    """
+    states = [None] * _TABLE_SIZE
+    for bowl_one in range(MAX_POWER_TOKENS + 1):
+        for bowl_two in range(MAX_POWER_TOKENS + 1 - bowl_one):
+            for bowl_three in range(MAX_POWER_TOKENS + 1 - bowl_one - bowl_two):
+                state = PowerBowlState(bowl_one, bowl_two, bowl_three)
+                states[state.index] = state
+    return tuple(states)
+
+
+_POWER_BOWL_STATES = _build_power_bowl_states()
+
+# The outcome of gaining, spending or burning each amount of power from each configuration. Gains
+# are listed up to the capacity, beyond which nothing more changes.
+_GAINS = tuple(
+        tuple(x._compute_gain(i) for i in range(x.get_available_capacity() + 1))
+        if x is not None else None
+        for x in _POWER_BOWL_STATES)
+_SPENDS = tuple(
+        tuple(x._compute_spend(i) for i in range(x.get_available_power() + 1))
+        if x is not None else None
+        for x in _POWER_BOWL_STATES)
+_BURNS = tuple(
+        tuple(x._compute_burn(i) for i in range(x.bowl_two // 2 + 1))
+        if x is not None else None
+        for x in _POWER_BOWL_STATES)
 
 
 @dataclass
@@ -182,48 +308,194 @@ class PlayerResourceState:
     workers: int = 0
     priests: int = 0
     priest_pool_size: int = 7
-    power: PowerBowlState = PowerBowlState()
+    power: PowerBowlState = PowerBowlState.create()
+    victory_points: int = 20
 
     def add(self, resources: ResourceDelta) -> "PlayerResourceState":
+        """Apply a net change. Negative power is spent (burning if necessary) rather than gained."""
         coins = self.coins + resources.coins
         workers = self.workers + resources.workers
         priests = self.priests + resources.priests
-        power = self.power.gain(resources.power)
+        if resources.power >= 0:
+            power = self.power.gain(resources.power)
+        else:
+            power = self.power.spend(-resources.power)
+        victory_points = self.victory_points + resources.victory_points
         return replace(self,
                 coins = coins,
                 workers = workers,
                 priests = priests,
-                power = power)
+                power = power,
+                victory_points = victory_points)
 
     def subtract(self, resources: ResourceDelta) -> "PlayerResourceState":
         coins = self.coins - resources.coins
         workers = self.workers - resources.workers
         priests = self.priests - resources.priests
         power = self.power.spend(resources.power)
+        victory_points = self.victory_points - resources.victory_points
         return replace(self,
                 coins = coins,
                 workers = workers,
                 priests = priests,
-                power = power)
+                power = power,
+                victory_points = victory_points)
 
     def are_quantities_nonnegative(self) -> bool:
-        # TODO
-        pass
-
-    def could_afford(self, cost: ResourceDelta) -> Tuple[bool, Tuple[Conversion, ...]]:
-        # TODO
-        # Actually this method might be a bad idea, since often there are many possible
-        # ways one could convert resources to meet a cost (i.e., PW->C, P->C, W->C, VP->C)
-        return (True, None)
-
-
-@dataclass
+        power = self.power
+        return min(
+                self.coins,
+                self.workers,
+                self.priests,
+                self.victory_points,
+                power.bowl_one,
+                power.bowl_two,
+                power.bowl_three) >= 0
+
+    def could_afford(self, cost: ResourceDelta, faction: "Faction" = None) \
+            -> Tuple[bool, Tuple[Conversion, ...]]:
+        """Whether the cost can be paid, possibly after conversions, and the cheapest conversions
+        which would allow it. See plan_conversions().
+        """
+        rates = faction.rules.conversion_rates if faction else _DEFAULT_CONVERSION_RATES
+        plan = plan_conversions(self, cost, rates)
+        if plan is None:
+            return (False, None)
+        return (True, plan.conversions)
+
+
+# Used to judge how much a conversion loses. Power is the unit, since the default rates trade
+# power for each other resource. Burning a token costs the player that token for good.
+_RESOURCE_VALUES = frozendict({
+    ResourceType.COINS: 1,
+    ResourceType.WORKERS: 3,
+    ResourceType.PRIESTS: 5,
+    ResourceType.POWER: 1,
+    ResourceType.POINTS: 3})
+_BURN_VALUE = 1
+
+
+@dataclass(frozen=True)
+class ConversionPlan:
+    conversions: Tuple[Conversion, ...]
+    loss: int # value of the resources spent on conversions, including burned power tokens
+    burn: int # power which must be burned to pay for the conversions and the cost
+
+
+def plan_conversions(
+        resources: PlayerResourceState,
+        cost: ResourceDelta,
+        rates: frozendict = _DEFAULT_CONVERSION_RATES) -> Optional[ConversionPlan]:
+    """Find the conversions with the least loss which allow the cost to be paid, or None if it
+    can't be paid at all.
+
+    Results are memoized on (resources, cost, rate table), since bots make the same queries many
+    times during a search. Bowl one is left out of the key, since its tokens can't be spent.
+    """
+    power = resources.power
+    resource_key = (resources.coins, resources.workers, resources.priests,
+            power.bowl_two, power.bowl_three, resources.victory_points)
+    cost_key = (cost.coins, cost.workers, cost.priests, cost.power, cost.victory_points)
+    return _plan_conversions(resource_key, cost_key, rates)
+
+
+@lru_cache(maxsize=1 << 16)
+def _plan_conversions(
+        resource_key: Tuple[int, ...],
+        cost_key: Tuple[int, ...],
+        rates: frozendict) -> Optional[ConversionPlan]:
+    coins, workers, priests, bowl_two, bowl_three, victory_points = resource_key
+    cost_coins, cost_workers, cost_priests, cost_power, cost_victory_points = cost_key
+
+    available_power = bowl_three + (bowl_two // 2)
+    spare_victory_points = victory_points - cost_victory_points
+    if spare_victory_points < 0 or cost_power > available_power:
+        return None
+
+    need_priests = max(0, cost_priests - priests)
+    need_workers = max(0, cost_workers - workers)
+    need_coins = max(0, cost_coins - coins)
+    spare_priests = max(0, priests - cost_priests)
+    spare_workers = max(0, workers - cost_workers)
+
+    power_to_priests = rates.get((ResourceType.POWER, ResourceType.PRIESTS))
+    power_to_workers = rates.get((ResourceType.POWER, ResourceType.WORKERS))
+    power_to_coins = rates.get((ResourceType.POWER, ResourceType.COINS))
+    priests_to_workers = rates.get((ResourceType.PRIESTS, ResourceType.WORKERS))
+    priests_to_coins = rates.get((ResourceType.PRIESTS, ResourceType.COINS))
+    workers_to_coins = rates.get((ResourceType.WORKERS, ResourceType.COINS))
+    points_to_coins = rates.get((ResourceType.POINTS, ResourceType.COINS))
+
+    if need_priests and power_to_priests is None:
+        return None
+    power_for_priests = need_priests * power_to_priests if need_priests else 0
+
+    power_value = _RESOURCE_VALUES[ResourceType.POWER]
+    priest_value = _RESOURCE_VALUES[ResourceType.PRIESTS]
+    worker_value = _RESOURCE_VALUES[ResourceType.WORKERS]
+    point_value = _RESOURCE_VALUES[ResourceType.POINTS]
+
+    def _limit(available: int, rate: Optional[int], needed: int) -> int:
+        return 0 if rate is None else min(needed, available // rate)
+
+    best = None
+    best_key = None
+    for workers_from_priests in range(_limit(spare_priests, priests_to_workers, need_workers) + 1):
+        workers_from_power = need_workers - workers_from_priests
+        if workers_from_power and power_to_workers is None:
+            continue
+        remaining_priests = spare_priests - workers_from_priests * (priests_to_workers or 0)
+
+        for coins_from_priests in range(_limit(remaining_priests, priests_to_coins, need_coins) + 1):
+            coins_left = need_coins - coins_from_priests
+            for coins_from_workers in range(_limit(spare_workers, workers_to_coins, coins_left) + 1):
+                coins_left_2 = coins_left - coins_from_workers
+                max_from_points = _limit(spare_victory_points, points_to_coins, coins_left_2)
+                for coins_from_points in range(max_from_points + 1):
+                    coins_from_power = coins_left_2 - coins_from_points
+                    if coins_from_power and power_to_coins is None:
+                        continue
+
+                    power_spent = cost_power + power_for_priests \
+                            + workers_from_power * (power_to_workers or 0) \
+                            + coins_from_power * (power_to_coins or 0)
+                    if power_spent > available_power:
+                        continue
+                    burn = max(0, power_spent - bowl_three)
+
+                    loss = (power_spent - cost_power) * power_value \
+                            + (workers_from_priests * (priests_to_workers or 0)
+                                    + coins_from_priests * (priests_to_coins or 0)) * priest_value \
+                            + coins_from_workers * (workers_to_coins or 0) * worker_value \
+                            + coins_from_points * (points_to_coins or 0) * point_value \
+                            + burn * _BURN_VALUE
+                    quantities = (
+                            (ResourceType.POWER, ResourceType.PRIESTS, need_priests),
+                            (ResourceType.PRIESTS, ResourceType.WORKERS, workers_from_priests),
+                            (ResourceType.POWER, ResourceType.WORKERS, workers_from_power),
+                            (ResourceType.PRIESTS, ResourceType.COINS, coins_from_priests),
+                            (ResourceType.WORKERS, ResourceType.COINS, coins_from_workers),
+                            (ResourceType.POINTS, ResourceType.COINS, coins_from_points),
+                            (ResourceType.POWER, ResourceType.COINS, coins_from_power))
+                    conversions = tuple(
+                            Conversion(from_, to, quantity)
+                            for from_, to, quantity in quantities if quantity)
+
+                    key = (loss, burn, len(conversions))
+                    if best_key is None or key < best_key:
+                        best_key = key
+                        best = ConversionPlan(conversions, loss, burn)
+
+    return best
+
+
+@slotted
+@dataclass(frozen=True)
 class LeechOpportunity:
     amount: int
     from_player_id: str
 
-    def get_resource_delta(self, available_capacity: int):
-
-
-
-
+    def get_resource_delta(self, available_capacity: int) -> ResourceDelta:
+        """The power gained and points paid if the opportunity is accepted in full."""
+        power = min(self.amount, available_capacity)
+        return ResourceDelta(power=power, victory_points=-max(power - 1, 0))
@@ -0,0 +1,406 @@
+"""Mutable mirror of GameState for tree search.
+
+GameState is immutable, which is convenient for replaying games but allocates several objects per
+action. A SearchState is built once from the GameState at the root of a search and then has Steps
+applied in place with make(). Every field write is recorded on a trail, so unmake() restores the
+state exactly by popping writes back off the trail, in the style of make/unmake move generators.
+"""
+from typing import Any, List, Optional, Tuple
+
+from frozendict import frozendict
+
+from terrabot.sim.action import Phase, Step
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.cult import Cult, CultTrackState, PlayerCultState
+from terrabot.sim.game import GameState, History
+from terrabot.sim.leech import resolve_offers
+from terrabot.sim.player import PlayerState
+from terrabot.sim.resource import LeechOpportunity, PlayerResourceState, PowerBowlState, \
+        ResourceDelta
+from terrabot.sim.structure import PlayerStructureState, Structure
+from terrabot.sim.tile import Tile, TileSet
+from terrabot.sim.town import TownTracker, apply_structures, get_town_power_requirement
+from terrabot.sim.zobrist import KEYED_PLAYER_ATTRIBUTES, KEYED_STATE_ATTRIBUTES, \
+        get_player_attribute_key, get_state_attribute_key_delta
+
+class SearchPlayerState:
+    """Mutable, flattened equivalent of PlayerState."""
+
+    __slots__ = (
+            "dig_level",
+            "ship_level",
+            "tiles",
+            "structures",
+            "coins",
+            "workers",
+            "priests",
+            "priest_pool_size",
+            "power",
+            "victory_points",
+            "fire",
+            "water",
+            "earth",
+            "air",
+            "towns",
+            "has_passed",
+            "leech_opportunities",
+            "cultist_steps",
+            "town_tile_decisions",
+            "favor_tile_decisions",
+            "cult_key_decisions",
+            "contested_cults",
+            "bonus_spade_decisions",
+            "income",
+            "event_resources")
+
+    def __init__(self, player_state: PlayerState):
+        resources = player_state.resources
+        cult_state = player_state.cult_state
+        self.dig_level: int = player_state.dig_level
+        self.ship_level: int = player_state.ship_level
+        self.tiles: TileSet = player_state.tiles
+        self.structures: List[Structure] = list(player_state.structures.structures)
+        self.coins: int = resources.coins
+        self.workers: int = resources.workers
+        self.priests: int = resources.priests
+        self.priest_pool_size: int = resources.priest_pool_size
+        self.power: PowerBowlState = resources.power
+        self.victory_points: int = resources.victory_points
+        self.fire: int = cult_state.fire
+        self.water: int = cult_state.water
+        self.earth: int = cult_state.earth
+        self.air: int = cult_state.air
+        self.towns: TownTracker = player_state.towns
+        self.has_passed: bool = player_state.has_passed
+        self.leech_opportunities: Tuple[LeechOpportunity, ...] = player_state.leech_opportunities
+        self.cultist_steps: int = player_state.cultist_steps
+        self.town_tile_decisions: int = player_state.town_tile_decisions
+        self.favor_tile_decisions: int = player_state.favor_tile_decisions
+        self.cult_key_decisions: int = player_state.cult_key_decisions
+        self.contested_cults: Tuple[Cult, ...] = player_state.contested_cults
+        self.bonus_spade_decisions: int = player_state.bonus_spade_decisions
+        self.income: ResourceDelta = player_state.income
+        self.event_resources: frozendict = player_state.event_resources
+
+    def to_player_state(self) -> PlayerState:
+        return PlayerState(
+                dig_level = self.dig_level,
+                ship_level = self.ship_level,
+                tiles = self.tiles,
+                structures = PlayerStructureState(tuple(self.structures)),
+                resources = PlayerResourceState(
+                        coins = self.coins,
+                        workers = self.workers,
+                        priests = self.priests,
+                        priest_pool_size = self.priest_pool_size,
+                        power = self.power,
+                        victory_points = self.victory_points),
+                cult_state = PlayerCultState(
+                        fire = self.fire,
+                        water = self.water,
+                        earth = self.earth,
+                        air = self.air),
+                towns = self.towns,
+                has_passed = self.has_passed,
+                leech_opportunities = self.leech_opportunities,
+                cultist_steps = self.cultist_steps,
+                town_tile_decisions = self.town_tile_decisions,
+                favor_tile_decisions = self.favor_tile_decisions,
+                cult_key_decisions = self.cult_key_decisions,
+                contested_cults = self.contested_cults,
+                bonus_spade_decisions = self.bonus_spade_decisions,
+                income = self.income,
+                event_resources = self.event_resources)
+
+
+# Setup phases aren't supported, since they create players' states from scratch
+_SEARCH_PHASES = (Phase.TURN, Phase.SELECT_FAVOR_TILE, Phase.SELECT_TOWN_TILE,
+        Phase.CULT_TRACK_DECISION)
+
+# GameState fields mirrored on SearchState
+_STATE_ATTRIBUTES = ("pool", "active_player_position", "round", "phase", "expended_action_slots",
+        "bonus_tile_coins", "priest_spaces", "turn_order", "pass_order", "board")
+
+# Sentinel attribute name on the trail marking an append to a player's structures list
+_STRUCTURE_APPEND = object()
+
+
+class SearchState:
+    """A mutable GameState supporting make/unmake of Steps.
+
+    Only the fields which a Step can change are mirrored. Everything else (player metadata and
+    factions, the setup, the map) is read from the root GameState the search started from. Players
+    must have selected their factions before a SearchState can be created.
+    """
+
+    def __init__(self, root: GameState):
+        self.root = root
+        self.player_ids: Tuple[str, ...] = tuple(x.player_id for x in root.players)
+        self.player_states: Tuple[SearchPlayerState, ...] = tuple(
+                SearchPlayerState(x.player_state) for x in root.players)
+        self.player_states_by_id = frozendict(zip(self.player_ids, self.player_states))
+        self.pool: TileSet = root.pool
+        self.active_player_position: int = root.active_player_position
+        self.round: int = root.round
+        self.phase: Phase = root.phase
+        self.expended_action_slots: Tuple[str, ...] = root.expended_action_slots
+        self.bonus_tile_coins: frozendict = root.bonus_tile_coins
+        self.priest_spaces: Tuple[Tuple[int, ...], ...] = root.priest_spaces
+        self.turn_order: Tuple[int, ...] = root.turn_order
+        self.pass_order: Tuple[int, ...] = root.pass_order
+        self.board: Bitboard = root.board
+        self.zobrist_key: int = root.get_zobrist_key()
+
+        # Each entry is (object, attribute, previous value)
+        self._trail: List[Tuple[Any, Any, Any]] = []
+
+    @staticmethod
+    def from_game_state(game_state: GameState) -> "SearchState":
+        return SearchState(game_state)
+
+    def to_game_state(self) -> GameState:
+        """Build the equivalent immutable GameState. Players whose state is unchanged since the
+        root are shared with the root. History is not tracked in search mode, so the result's
+        previous_state is the root itself.
+        """
+        if not self._trail:
+            return self.root
+
+        edit = self.root.edit()
+        changed_player_ids = {obj for obj, _, _ in self._trail if isinstance(obj, str)}
+        for player_id in changed_player_ids:
+            player_state = self.player_states_by_id[player_id].to_player_state()
+            edit.update_player(player_id, player_state = player_state)
+        edit.set(
+                history = History(previous_state = self.root),
+                most_recent_log_entry = None,
+                **{x: getattr(self, x) for x in _STATE_ATTRIBUTES})
+        return edit.commit()
+
+    @property
+    def active_player_id(self) -> str:
+        return self.player_ids[self.active_player_position]
+
+    @property
+    def active_player_state(self) -> SearchPlayerState:
+        return self.player_states[self.active_player_position]
+
+    def make(self, step: Step) -> int:
+        """Apply a Step for the active player, followed by the phase transition, in place. Returns
+        an undo mark to pass to unmake(). A Step which ends the round is followed by the round end.
+        Search can carry on into the next round's turns, but players spending cult bonus spades
+        and the end of the game are left to the GameState from to_game_state().
+        """
+        mark = len(self._trail)
+        player_id = self.active_player_id
+        player_state = self.active_player_state
+
+        if self.phase not in _SEARCH_PHASES:
+            raise ValueError(f"The {self.phase.name} phase is not supported in search mode")
+
+        if step.passed:
+            self._set_player(player_id, "has_passed", True)
+            self._set(self, "pass_order", self.pass_order + (self.active_player_position,))
+        delta = step.resource_delta
+        if delta.coins:
+            self._set_player(player_id, "coins", player_state.coins + delta.coins)
+        if delta.workers:
+            self._set_player(player_id, "workers", player_state.workers + delta.workers)
+        if delta.priests:
+            self._set_player(player_id, "priests", player_state.priests + delta.priests)
+        if delta.power > 0:
+            self._set_player(player_id, "power", player_state.power.gain(delta.power))
+        elif delta.power < 0:
+            self._set_player(player_id, "power", player_state.power.spend(-delta.power))
+        if delta.victory_points:
+            self._set_player(player_id, "victory_points",
+                    player_state.victory_points + delta.victory_points)
+        for structure in step.new_structures:
+            player_state.structures.append(structure)
+            self._trail.append((player_id, _STRUCTURE_APPEND, None))
+        if step.terrain_changes or step.new_structures:
+            board = self.board
+            for location_id, terrain in step.terrain_changes.items():
+                board = board.with_terrain(board.get_hex_id(location_id), terrain)
+            if step.new_structures:
+                faction = self.root.players_by_id[player_id].faction
+                self._set_player(player_id, "income", player_state.income
+                        + faction.rules.get_income_change(board, player_id, step.new_structures))
+            towns, board, new_towns = apply_structures(player_state.towns, board, player_id,
+                    step.new_structures, get_town_power_requirement(player_state.tiles))
+            self._set_player(player_id, "towns", towns)
+            self._set(self, "board", board)
+            if new_towns:
+                self._set_player(player_id, "town_tile_decisions",
+                        player_state.town_tile_decisions + new_towns)
+        if step.cult_delta.steps:
+            tracks = CultTrackState.create(tuple(PlayerCultState(x.fire, x.water, x.earth, x.air)
+                    for x in self.player_states), self.priest_spaces)
+            advance = tracks.advance(self.active_player_position, step.cult_delta,
+                    player_state.towns.num_towns)
+            cult_state = advance.cult_state
+            self._set_player(player_id, "fire", cult_state.fire)
+            self._set_player(player_id, "water", cult_state.water)
+            self._set_player(player_id, "earth", cult_state.earth)
+            self._set_player(player_id, "air", cult_state.air)
+            if advance.power:
+                self._set_player(player_id, "power", player_state.power.gain(advance.power))
+            if advance.num_key_decisions:
+                self._set_player(player_id, "cult_key_decisions", advance.num_key_decisions)
+                self._set_player(player_id, "contested_cults", advance.contested_cults)
+            elif step.new_cult_key_decisions:
+                remaining = player_state.cult_key_decisions + step.new_cult_key_decisions
+                self._set_player(player_id, "cult_key_decisions", remaining)
+                self._set_player(player_id, "contested_cults",
+                        tuple(x for x in player_state.contested_cults
+                                if x not in step.cult_delta.steps) if remaining else ())
+            if step.priest_space:
+                self._set(self, "priest_spaces", tracks.place_priest(
+                        step.cult_delta.steps[0], step.priest_space).priest_spaces)
+                self._set_player(player_id, "priest_pool_size", player_state.priest_pool_size - 1)
+        if step.dig_level_delta:
+            self._set_player(player_id, "dig_level", player_state.dig_level + step.dig_level_delta)
+        if step.ship_level_delta:
+            self._set_player(player_id, "ship_level",
+                    player_state.ship_level + step.ship_level_delta)
+        if step.new_tiles or step.returned_tile is not None:
+            tiles = player_state.tiles
+            pool = self.pool
+            for tile in step.new_tiles:
+                pool = pool.remove(tile)
+                tiles = tiles.add(tile)
+                if tile.name in self.bonus_tile_coins:
+                    self._set(self, "bonus_tile_coins", frozendict(
+                            {k: v for k, v in self.bonus_tile_coins.items() if k != tile.name}))
+            if step.returned_tile is not None:
+                tiles = tiles.remove(step.returned_tile)
+                pool = pool.add(step.returned_tile)
+            income = sum((x.income for x in step.new_tiles), player_state.income)
+            if step.returned_tile is not None:
+                income = income - step.returned_tile.income
+            self._set_player(player_id, "tiles", tiles)
+            self._set_player(player_id, "income", income)
+            faction = self.root.players_by_id[player_id].faction
+            self._set_player(player_id, "event_resources",
+                    faction.get_event_resources(player_state, self._get_round_tile()))
+            self._set(self, "pool", pool)
+        if step.new_town_tile_decisions:
+            self._set_player(player_id, "town_tile_decisions",
+                    player_state.town_tile_decisions + step.new_town_tile_decisions)
+        if step.new_favor_tile_decisions:
+            self._set_player(player_id, "favor_tile_decisions",
+                    player_state.favor_tile_decisions + step.new_favor_tile_decisions)
+
+        # Mirrors GameState._reflect_leech_opportunities
+        rule_set = self.root.rule_set
+        immediate = step.new_leech_opportunities
+        if immediate and not rule_set.require_immediate_leech:
+            immediate = {}
+            for other_player_id, opportunity in step.new_leech_opportunities.items():
+                other_state = self.player_states_by_id[other_player_id]
+                if other_state.has_passed:
+                    immediate[other_player_id] = opportunity
+                else:
+                    self._set_player(other_player_id, "leech_opportunities",
+                            other_state.leech_opportunities + (opportunity,))
+        if immediate:
+            # Leech only touches power and points, so the rest of the resources are left out
+            resolved = resolve_offers(immediate,
+                    lambda x: PlayerResourceState(power = self.player_states_by_id[x].power,
+                            victory_points = self.player_states_by_id[x].victory_points),
+                    rule_set.leech_policy)
+            for other_player_id, resources in resolved.items():
+                self._set_player(other_player_id, "power", resources.power)
+                self._set_player(other_player_id, "victory_points", resources.victory_points)
+
+        for other_player_id, steps in step.new_cultist_steps.items():
+            other_state = self.player_states_by_id[other_player_id]
+            self._set_player(other_player_id, "cultist_steps", other_state.cultist_steps + steps)
+
+        if step.action_slot_expended is not None:
+            self._set(self, "expended_action_slots",
+                    self.expended_action_slots + (step.action_slot_expended,))
+
+        self._make_phase_transition()
+        return mark
+
+    def unmake(self, mark: int):
+        """Undo every change made since make() returned the given mark."""
+        trail = self._trail
+        while len(trail) > mark:
+            obj, attribute, value = trail.pop()
+            if attribute is _STRUCTURE_APPEND:
+                self.player_states_by_id[obj].structures.pop()
+            elif isinstance(obj, str):
+                setattr(self.player_states_by_id[obj], attribute, value)
+            else:
+                setattr(obj, attribute, value)
+
+    def _make_phase_transition(self):
+        # Mirrors GameState._reflect_phase_transition
+        player_state = self.active_player_state
+        if player_state.cult_key_decisions:
+            self._set(self, "phase", Phase.CULT_TRACK_DECISION)
+            return
+        if player_state.favor_tile_decisions:
+            self._set(self, "phase", Phase.SELECT_FAVOR_TILE)
+            return
+        if player_state.town_tile_decisions:
+            self._set(self, "phase", Phase.SELECT_TOWN_TILE)
+            return
+        if self.phase != Phase.TURN:
+            self._set(self, "phase", Phase.TURN)
+
+        turn_order = self.turn_order
+        num_players = len(turn_order)
+        index = turn_order.index(self.active_player_position)
+        for offset in range(1, num_players + 1):
+            position = turn_order[(index + offset) % num_players]
+            if not self.player_states[position].has_passed:
+                self._set(self, "active_player_position", position)
+                return
+        self._make_round_end()
+
+    def _make_round_end(self):
+        # Round ends are rare in a search tree, so rather than mirroring
+        # GameState._reflect_round_end, it is run on the equivalent GameState and every field it
+        # changed is copied back through the trail
+        game_state = self.to_game_state()
+        edit = game_state.edit()
+        game_state._reflect_round_end(edit)
+        result = edit.commit()
+        for attribute in _STATE_ATTRIBUTES:
+            value = getattr(result, attribute)
+            if value != getattr(self, attribute):
+                self._set(self, attribute, value)
+        # Nothing is built at the end of a round, so structures are left alone
+        for player_id, player in zip(self.player_ids, result.players):
+            player_state = self.player_states_by_id[player_id]
+            new_player_state = SearchPlayerState(player.player_state)
+            for attribute in SearchPlayerState.__slots__:
+                value = getattr(new_player_state, attribute)
+                if attribute != "structures" and value != getattr(player_state, attribute):
+                    self._set_player(player_id, attribute, value)
+
+    def _get_round_tile(self) -> Optional[Tile]:
+        round_tiles = self.root.setup.round_tiles
+        return round_tiles[self.round - 1] if 1 <= self.round <= len(round_tiles) else None
+
+    def _set(self, obj: Any, attribute: str, value: Any):
+        old_value = getattr(obj, attribute)
+        self._trail.append((obj, attribute, old_value))
+        setattr(obj, attribute, value)
+        if obj is self and attribute in KEYED_STATE_ATTRIBUTES:
+            self._set(self, "zobrist_key", self.zobrist_key
+                    ^ get_state_attribute_key_delta(attribute, old_value, value))
+
+    def _set_player(self, player_id: str, attribute: str, value: Any):
+        player_state = self.player_states_by_id[player_id]
+        old_value = getattr(player_state, attribute)
+        self._trail.append((player_id, attribute, old_value))
+        setattr(player_state, attribute, value)
+        if attribute in KEYED_PLAYER_ATTRIBUTES:
+            position = self.player_ids.index(player_id)
+            self._set(self, "zobrist_key", self.zobrist_key
+                    ^ get_player_attribute_key(position, attribute, old_value)
+                    ^ get_player_attribute_key(position, attribute, value))
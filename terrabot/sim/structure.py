@@ -1,9 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum, auto
 from typing import Tuple
 
 from frozendict import frozendict
 
+from terrabot.util import slotted
+
 class StructureType(Enum):
     DWELLING = auto()
     TRADING_POST = auto()
@@ -13,23 +15,83 @@ class StructureType(Enum):
     BRIDGE = auto()
 
 
-@dataclass
+# Used for towns and for the end of game network scoring
+STRUCTURE_POWER_VALUES = frozendict({
+    StructureType.DWELLING: 1,
+    StructureType.TRADING_POST: 2,
+    StructureType.TEMPLE: 2,
+    StructureType.SANCTUARY: 3,
+    StructureType.STRONGHOLD: 3,
+    StructureType.BRIDGE: 0})
+
+
+# How many of each structure a player may have on the board at once
+STRUCTURE_LIMITS = frozendict({
+    StructureType.DWELLING: 8,
+    StructureType.TRADING_POST: 4,
+    StructureType.TEMPLE: 3,
+    StructureType.SANCTUARY: 1,
+    StructureType.STRONGHOLD: 1,
+    StructureType.BRIDGE: 3})
+
+
+@slotted
+@dataclass(frozen=True)
 class Structure:
     structure_type: StructureType
     location: str # by location_id
 
 
-@dataclass
-class PlayerStructureState:
-    structures: Tuple[Structure, ...] = ()
-    location_mapping: frozendict = frozendict()
-    type_mapping: frozendict = frozendict()
+_NO_STRUCTURE_COUNTS = frozendict({x: 0 for x in StructureType})
+_NO_STRUCTURE_LOCATIONS = frozendict({x: frozenset() for x in StructureType})
+
+
+def _extend_index(
+        location_mapping: frozendict,
+        type_counts: frozendict,
+        type_locations: frozendict,
+        new_structures: Tuple[Structure, ...]) -> Tuple[frozendict, frozendict, frozendict]:
+    """The index with new structures added, each replacing whatever was at its location."""
+    location_mapping = dict(location_mapping)
+    type_counts = dict(type_counts)
+    type_locations = dict(type_locations)
+    for structure in new_structures:
+        location = structure.location
+        replaced = location_mapping.get(location)
+        if replaced is not None:
+            type_counts[replaced.structure_type] -= 1
+            type_locations[replaced.structure_type] -= {location}
+        location_mapping[location] = structure
+        type_counts[structure.structure_type] += 1
+        type_locations[structure.structure_type] |= {location}
+    return frozendict(location_mapping), frozendict(type_counts), frozendict(type_locations)
 
-    def __init__(self, structures: Tuple[Structure, ...] = ()):
-        self.structures = structures
-        self.location_mapping = frozendict({s.location: s for s in structures})
-        self.type_mapping = frozendict(
-                {st: (s for s in structures if s.structure_type == st) for st in StructureType})
 
+@slotted
+@dataclass(frozen=True)
+class PlayerStructureState:
+    """Every structure a player has built, in the order they were built, indexed by what stands
+    where now. An upgrade is a new structure at the location of the one it replaces. add() extends
+    the index of the previous state instead of rebuilding it from every structure, but it still
+    copies the index and the structures tuple, so it is linear in the number of structures built.
+    The structure limits keep that to a few dozen.
+    """
+    structures: Tuple[Structure, ...] = ()
+    # The current Structure at each location_id
+    location_mapping: frozendict = field(default=None, repr=False, compare=False)
+    # How many of each StructureType the player has standing, and at which location_ids
+    type_counts: frozendict = field(default=None, repr=False, compare=False)
+    type_locations: frozendict = field(default=None, repr=False, compare=False)
 
+    def __post_init__(self):
+        if self.location_mapping is None:
+            index = _extend_index(
+                    frozendict(), _NO_STRUCTURE_COUNTS, _NO_STRUCTURE_LOCATIONS, self.structures)
+            for name, value in zip(("location_mapping", "type_counts", "type_locations"), index):
+                object.__setattr__(self, name, value)
 
+    def add(self, new_structures: Tuple[Structure, ...]) -> "PlayerStructureState":
+        if not new_structures:
+            return self
+        return PlayerStructureState(self.structures + new_structures, *_extend_index(
+                self.location_mapping, self.type_counts, self.type_locations, new_structures))
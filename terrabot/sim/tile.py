@@ -1,10 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum, auto
 from typing import Tuple
 
+from frozendict import frozendict
+
 from terrabot.sim.event import EventTrigger, PassTrigger
-from terrabot.sim.cult import Cult, CultDelta
-from terrabot.sim.resource import ResourceDelta
+from terrabot.sim.cult import NO_CULT_STEPS, Cult, CultDelta
+from terrabot.sim.resource import NO_RESOURCES, ResourceDelta
+from terrabot.util import intern, slotted
 
 class TileType(Enum):
     ROUND = auto()
@@ -13,30 +16,59 @@ class TileType(Enum):
     TOWN = auto()
 
 
-@dataclass
+@dataclass(frozen=True)
 class CultBonus:
     cult: Cult
     steps: int
-    bonus_resources: ResourceDelta = ResourceDelta()
+    bonus_resources: ResourceDelta = NO_RESOURCES
     bonus_spades: int = 0
 
+    def __post_init__(self):
+        object.__setattr__(self, "bonus_resources", intern(self.bonus_resources))
+
 
-@dataclass
+@slotted
+@dataclass(frozen=True)
 class Tile:
     name: str
     tile_type: TileType
     action_slot: str = None # by action_id
     event_trigger: EventTrigger = None
     pass_trigger: PassTrigger = None
-    immediate_resources = ResourceDelta()
-    immediate_cult = CultDelta()
-    income: ResourceDelta = ResourceDelta()
+    immediate_resources: ResourceDelta = NO_RESOURCES
+    immediate_cult: CultDelta = NO_CULT_STEPS
+    income: ResourceDelta = NO_RESOURCES
     shipping_modifier: int = 0
     town_size_modifier: int = 0
     cult_bonus: CultBonus = None
 
+    def __post_init__(self):
+        # Tiles are held by every player state, so share their deltas with equal ones elsewhere
+        object.__setattr__(self, "immediate_resources", intern(self.immediate_resources))
+        object.__setattr__(self, "immediate_cult", intern(self.immediate_cult))
+        object.__setattr__(self, "income", intern(self.income))
+
+    def __eq__(self, other: object) -> bool:
+        # Tiles are only created in terrabot.sim.data.tiles, so equal tiles are nearly always
+        # identical
+        if self is other:
+            return True
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.name == other.name \
+                and self.tile_type == other.tile_type \
+                and self.action_slot == other.action_slot \
+                and self.event_trigger == other.event_trigger \
+                and self.pass_trigger == other.pass_trigger \
+                and self.immediate_resources == other.immediate_resources \
+                and self.immediate_cult == other.immediate_cult \
+                and self.income == other.income \
+                and self.shipping_modifier == other.shipping_modifier \
+                and self.town_size_modifier == other.town_size_modifier \
+                and self.cult_bonus == other.cult_bonus
+
 
-@dataclass
+@dataclass(frozen=True)
 class TileSet:
     bonus_tiles: Tuple[Tile, ...] = ()
     favor_tiles: Tuple[Tile, ...] = ()
@@ -45,3 +77,21 @@ class TileSet:
     def get_all(self) -> Tuple[Tile, ...]:
         return self.bonus_tiles + self.favor_tiles + self.town_tiles
 
+    def add(self, tile: Tile) -> "TileSet":
+        attribute = _TILE_SET_ATTRIBUTE_BY_TYPE[tile.tile_type]
+        return replace(self, **{attribute: getattr(self, attribute) + (tile,)})
+
+    def remove(self, tile: Tile) -> "TileSet":
+        attribute = _TILE_SET_ATTRIBUTE_BY_TYPE[tile.tile_type]
+        tiles = getattr(self, attribute)
+        if tile not in tiles:
+            raise ValueError(f"Tile {tile.name} is not in this TileSet")
+        index = tiles.index(tile)
+        return replace(self, **{attribute: tiles[:index] + tiles[index + 1:]})
+
+
+_TILE_SET_ATTRIBUTE_BY_TYPE = frozendict({
+    TileType.BONUS: "bonus_tiles",
+    TileType.FAVOR: "favor_tiles",
+    TileType.TOWN: "town_tiles"})
+
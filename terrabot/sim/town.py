@@ -0,0 +1,224 @@
+"""Incremental town detection.
+
+A town is a cluster of a player's directly connected structures (adjacent hexes, or hexes joined by
+a bridge) with a total power value of at least TOWN_POWER_REQUIREMENT and at least
+TOWN_SIZE_REQUIREMENT structures, where a Sanctuary counts as two. A FAV5-style tile lowers the
+power requirement through Tile.town_size_modifier.
+
+Each player's clusters are kept in a TownTracker, a union-find keyed on hex id, so adding or
+upgrading one structure is a few near-constant time find/union operations rather than a walk
+over the whole board.
+
+Networks, which are scored once at the end of the game, also join structures which are only
+indirectly adjacent by shipping, and are found from the board by get_network_size() instead.
+"""
+from typing import Dict, Iterable, Set, Tuple
+
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.structure import STRUCTURE_POWER_VALUES, Structure, StructureType
+from terrabot.sim.tile import TileSet
+from terrabot.util import count_bits, iterate_bits
+
+TOWN_POWER_REQUIREMENT = 7
+TOWN_SIZE_REQUIREMENT = 4
+
+# Points for the largest, second and third largest networks at the end of the game
+NETWORK_POINTS = (18, 12, 6)
+
+def _get_town_size(structure_type: StructureType) -> int:
+    return 2 if structure_type == StructureType.SANCTUARY else 1
+
+
+def get_town_power_requirement(tiles: TileSet) -> int:
+    return TOWN_POWER_REQUIREMENT + sum(x.town_size_modifier for x in tiles.get_all())
+
+
+class TownTracker:
+    """Union-find over one player's structures, tracking each cluster's power value and size and
+    whether it has already formed a town.
+
+    Trackers are used like the other immutable state classes: add_structure(), upgrade_structure()
+    and connect() return a new tracker (a shallow copy of a few small dicts) and leave this one
+    unchanged. Path compression during find() does mutate the shared dicts, but never changes
+    which cluster a structure belongs to.
+    """
+
+    __slots__ = ("_parent", "_power", "_size", "_towns", "num_towns")
+
+    def __init__(self):
+        self._parent: Dict[int, int] = {}
+        self._power: Dict[int, int] = {} # by root
+        self._size: Dict[int, int] = {} # by root
+        self._towns: Set[int] = set() # roots of clusters which are towns
+        self.num_towns: int = 0
+
+    def _copy(self) -> "TownTracker":
+        copy = TownTracker()
+        copy._parent = dict(self._parent)
+        copy._power = dict(self._power)
+        copy._size = dict(self._size)
+        copy._towns = set(self._towns)
+        copy.num_towns = self.num_towns
+        return copy
+
+    def _find(self, hex_id: int) -> int:
+        parent = self._parent
+        while parent[hex_id] != hex_id:
+            parent[hex_id] = parent[parent[hex_id]]
+            hex_id = parent[hex_id]
+        return hex_id
+
+    def _union(self, first: int, second: int) -> int:
+        """Merge two clusters, returning the new root. A cluster containing a town is a town."""
+        first_root = self._find(first)
+        second_root = self._find(second)
+        if first_root == second_root:
+            return first_root
+        if self._size[first_root] < self._size[second_root]:
+            first_root, second_root = second_root, first_root
+        self._parent[second_root] = first_root
+        self._power[first_root] += self._power.pop(second_root)
+        self._size[first_root] += self._size.pop(second_root)
+        if second_root in self._towns:
+            self._towns.discard(second_root)
+            self._towns.add(first_root)
+        return first_root
+
+    def _check_town(self, root: int, power_requirement: int) -> int:
+        if root in self._towns:
+            return 0
+        if self._power[root] >= power_requirement and self._size[root] >= TOWN_SIZE_REQUIREMENT:
+            self._towns.add(root)
+            self.num_towns += 1
+            return 1
+        return 0
+
+    def contains(self, hex_id: int) -> bool:
+        return hex_id in self._parent
+
+    def is_in_town(self, hex_id: int) -> bool:
+        return hex_id in self._parent and self._find(hex_id) in self._towns
+
+    def get_cluster_power(self, hex_id: int) -> int:
+        return self._power[self._find(hex_id)]
+
+    def add_structure(self, hex_id: int, structure_type: StructureType,
+            connected_hex_ids: Iterable[int], power_requirement: int = TOWN_POWER_REQUIREMENT) \
+            -> Tuple["TownTracker", int]:
+        """Add a structure on a new hex, joining it to the player's structures on the connected
+        hexes. Returns the new tracker and the number of towns formed.
+        """
+        if hex_id in self._parent:
+            raise ValueError(f"Hex {hex_id} already has a structure; upgrade it instead")
+
+        tracker = self._copy()
+        tracker._parent[hex_id] = hex_id
+        tracker._power[hex_id] = STRUCTURE_POWER_VALUES[structure_type]
+        tracker._size[hex_id] = _get_town_size(structure_type)
+        root = hex_id
+        for x in connected_hex_ids:
+            if x in tracker._parent:
+                root = tracker._union(root, x)
+        return tracker, tracker._check_town(root, power_requirement)
+
+    def upgrade_structure(self, hex_id: int, old_type: StructureType, new_type: StructureType,
+            power_requirement: int = TOWN_POWER_REQUIREMENT) -> Tuple["TownTracker", int]:
+        tracker = self._copy()
+        root = tracker._find(hex_id)
+        tracker._power[root] += STRUCTURE_POWER_VALUES[new_type] - STRUCTURE_POWER_VALUES[old_type]
+        tracker._size[root] += _get_town_size(new_type) - _get_town_size(old_type)
+        return tracker, tracker._check_town(root, power_requirement)
+
+    def connect(self, first: int, second: int, power_requirement: int = TOWN_POWER_REQUIREMENT) \
+            -> Tuple["TownTracker", int]:
+        """Join the clusters of two of the player's structures, e.g. when a bridge is built."""
+        if first not in self._parent or second not in self._parent:
+            return self, 0
+        tracker = self._copy()
+        root = tracker._union(first, second)
+        return tracker, tracker._check_town(root, power_requirement)
+
+    def with_towns(self, hex_ids: Iterable[int], num_towns: int) -> "TownTracker":
+        """Mark the clusters containing the given hexes as towns, e.g. when restoring a tracker
+        whose structures were added without forming towns.
+        """
+        tracker = self._copy()
+        tracker._towns.update(tracker._find(x) for x in hex_ids)
+        tracker.num_towns = num_towns
+        return tracker
+
+    def get_town_hex_ids(self) -> Tuple[int, ...]:
+        """One hex of each cluster which is a town."""
+        return tuple(sorted(self._towns))
+
+    def get_clusters(self) -> Tuple[Tuple[int, ...], ...]:
+        clusters: Dict[int, list] = {}
+        for x in self._parent:
+            clusters.setdefault(self._find(x), []).append(x)
+        return tuple(tuple(sorted(x)) for x in sorted(clusters.values()))
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TownTracker):
+            return NotImplemented
+        return self.get_clusters() == other.get_clusters() \
+                and self.num_towns == other.num_towns \
+                and {x for x in self._parent if self.is_in_town(x)} \
+                        == {x for x in other._parent if other.is_in_town(x)}
+
+    def __repr__(self) -> str:
+        return f"TownTracker(clusters={self.get_clusters()}, num_towns={self.num_towns})"
+
+
+def apply_structures(
+        towns: TownTracker,
+        board: Bitboard,
+        player_id: str,
+        structures: Iterable[Structure],
+        power_requirement: int = TOWN_POWER_REQUIREMENT) -> Tuple[TownTracker, Bitboard, int]:
+    """Add new or upgraded structures (including bridges) for a player to both the board and the
+    player's TownTracker. Returns the new tracker, the new board, and the number of towns formed,
+    suitable for Step.new_town_tile_decisions.
+    """
+    new_towns = 0
+    for structure in structures:
+        if structure.structure_type == StructureType.BRIDGE:
+            bridge_id = board.map_index.bridge_ids_by_location[structure.location]
+            board = board.with_bridge(player_id, bridge_id)
+            first, second = board.map_index.bridge_endpoints[bridge_id]
+            towns, formed = towns.connect(first, second, power_requirement)
+        else:
+            hex_id = board.get_hex_id(structure.location)
+            old_type = board.get_structure_type(hex_id)
+            if old_type is None:
+                occupied = board.for_player(player_id).occupied
+                connected = iterate_bits(board.get_neighbourhood_mask(hex_id) & occupied)
+                towns, formed = towns.add_structure(
+                        hex_id, structure.structure_type, connected, power_requirement)
+            else:
+                towns, formed = towns.upgrade_structure(
+                        hex_id, old_type, structure.structure_type, power_requirement)
+            board = board.with_structure(player_id, structure.structure_type, hex_id)
+        new_towns += formed
+    return towns, board, new_towns
+
+
+def get_network_size(board: Bitboard, player_id: str, shipping: int) -> int:
+    """The number of structures in the player's largest network, i.e. structures connected
+    directly, across bridges, or across at most the given number of river hexes.
+    """
+    map_index = board.map_index
+    remaining = board.for_player(player_id).occupied
+    largest = 0
+    while remaining:
+        network = 0
+        frontier = remaining & -remaining
+        while frontier:
+            network |= frontier
+            reach = 0
+            for hex_id in iterate_bits(frontier):
+                reach |= board.get_neighbourhood_mask(hex_id) \
+                        | map_index.get_shipping_mask(hex_id, shipping)
+            frontier = reach & remaining & ~network
+        remaining &= ~network
+        largest = max(largest, count_bits(network))
+    return largest
@@ -0,0 +1,314 @@
+"""Zobrist hashing of game positions, and a bounded transposition table.
+
+A position's key is the XOR of one 64 bit key per feature of the position: each structure, bridge
+and terrain on the board, each player's resource quantities, cult positions and tiles, each tile in
+the pool and the coins left on its bonus tiles, the priests beside the cult tracks, each expended
+action slot, and the phase, round and active player. Since XOR is its own inverse, a change to one
+feature updates the key by XORing out the feature's old key and XORing in its new one.
+GameStateEdit.commit() and SearchState.make() do exactly that for the features a Step touched, so
+keys are maintained in time proportional to the size of the change.
+
+Each feature's key is derived from a hash of the feature itself rather than drawn from a random
+number generator, so keys are the same in every process regardless of which features were seen
+first.
+
+History (previous_state, the log) and derived data (TownTracker, players_by_id) aren't part of a
+position and aren't hashed.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Any, Iterator, List, Optional, Tuple
+
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.tile import TileSet
+from terrabot.util import iterate_bits
+
+ZOBRIST_BITS = 64
+
+# Owner of the tiles in the pool, in place of a player's turn position
+_POOL = "pool"
+
+# Attributes shared by PlayerState (once flattened) and SearchPlayerState which are hashed. The
+# structures are hashed through the board, and towns are derived from the structures.
+KEYED_PLAYER_ATTRIBUTES = (
+        "dig_level",
+        "ship_level",
+        "tiles",
+        "coins",
+        "workers",
+        "priests",
+        "priest_pool_size",
+        "power",
+        "victory_points",
+        "fire",
+        "water",
+        "earth",
+        "air",
+        "has_passed",
+        "leech_opportunities",
+        "cultist_steps",
+        "town_tile_decisions",
+        "favor_tile_decisions",
+        "cult_key_decisions",
+        "contested_cults",
+        "bonus_spade_decisions")
+
+# GameState and SearchState attributes which are hashed, other than the players
+KEYED_STATE_ATTRIBUTES = (
+        "pool",
+        "active_player_position",
+        "round",
+        "phase",
+        "expended_action_slots",
+        "turn_order",
+        "pass_order",
+        "board",
+        "bonus_tile_coins",
+        "priest_spaces")
+
+
+@lru_cache(maxsize=1 << 16)
+def get_feature_key(*feature: Any) -> int:
+    """The 64 bit key of one feature, e.g. ("structure", 0, 1, 57). Every item of the feature must
+    have a repr() which is stable between processes.
+    """
+    digest = blake2b(repr(feature).encode(), digest_size=ZOBRIST_BITS // 8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _get_tiles_key(owner: Any, tiles: TileSet) -> int:
+    key = 0
+    counts = {}
+    for tile in tiles.get_all():
+        copy = counts.get(tile.name, 0)
+        counts[tile.name] = copy + 1
+        key ^= get_feature_key("tile", owner, tile.name, copy)
+    return key
+
+
+def get_player_attribute_key(position: int, attribute: str, value: Any) -> int:
+    if attribute == "tiles":
+        return _get_tiles_key(position, value)
+    elif attribute == "power":
+        return get_feature_key(position, attribute, value.bowl_one, value.bowl_two, value.bowl_three)
+    elif attribute == "leech_opportunities":
+        return get_feature_key(position, attribute,
+                tuple((x.amount, x.from_player_id) for x in value))
+    else:
+        return get_feature_key(position, attribute, value)
+
+
+def iterate_player_attributes(player_state: "PlayerState") -> Iterator[Tuple[str, Any]]:
+    """Each of KEYED_PLAYER_ATTRIBUTES of a PlayerState, with its value."""
+    resources = player_state.resources
+    cult_state = player_state.cult_state
+    yield "dig_level", player_state.dig_level
+    yield "ship_level", player_state.ship_level
+    yield "tiles", player_state.tiles
+    yield "coins", resources.coins
+    yield "workers", resources.workers
+    yield "priests", resources.priests
+    yield "priest_pool_size", resources.priest_pool_size
+    yield "power", resources.power
+    yield "victory_points", resources.victory_points
+    yield "fire", cult_state.fire
+    yield "water", cult_state.water
+    yield "earth", cult_state.earth
+    yield "air", cult_state.air
+    yield "has_passed", player_state.has_passed
+    yield "leech_opportunities", player_state.leech_opportunities
+    yield "cultist_steps", player_state.cultist_steps
+    yield "town_tile_decisions", player_state.town_tile_decisions
+    yield "favor_tile_decisions", player_state.favor_tile_decisions
+    yield "cult_key_decisions", player_state.cult_key_decisions
+    yield "contested_cults", player_state.contested_cults
+    yield "bonus_spade_decisions", player_state.bonus_spade_decisions
+
+
+def get_player_key(position: int, player: "Player") -> int:
+    key = 0
+    if player.faction is not None:
+        key ^= get_feature_key(position, "faction", player.faction.name)
+    if player.player_state is not None:
+        for attribute, value in iterate_player_attributes(player.player_state):
+            key ^= get_player_attribute_key(position, attribute, value)
+    return key
+
+
+def get_player_key_delta(position: int, old: "Player", new: "Player") -> int:
+    """The key change between two versions of a player, only looking at attributes which changed."""
+    if old is new:
+        return 0
+    if old.player_state is None or new.player_state is None or old.faction is not new.faction:
+        return get_player_key(position, old) ^ get_player_key(position, new)
+
+    key = 0
+    for (attribute, old_value), (_, new_value) in zip(
+            iterate_player_attributes(old.player_state),
+            iterate_player_attributes(new.player_state)):
+        if old_value is not new_value and old_value != new_value:
+            key ^= get_player_attribute_key(position, attribute, old_value) \
+                    ^ get_player_attribute_key(position, attribute, new_value)
+    return key
+
+
+def get_board_key(board: Bitboard) -> int:
+    key = 0
+    for terrain_index, mask in enumerate(board.terrains):
+        for hex_id in iterate_bits(mask):
+            key ^= get_feature_key("terrain", terrain_index, hex_id)
+    for position, player in enumerate(board.players):
+        for type_index, mask in enumerate(player.structures):
+            for hex_id in iterate_bits(mask):
+                key ^= get_feature_key("structure", position, type_index, hex_id)
+        for bridge_id in iterate_bits(player.bridges):
+            key ^= get_feature_key("bridge", position, bridge_id)
+    return key
+
+
+def get_board_key_delta(old: Bitboard, new: Bitboard) -> int:
+    """The key change between two boards, proportional to the number of hexes which changed."""
+    if old is new:
+        return 0
+    key = 0
+    for terrain_index, (old_mask, new_mask) in enumerate(zip(old.terrains, new.terrains)):
+        for hex_id in iterate_bits(old_mask ^ new_mask):
+            key ^= get_feature_key("terrain", terrain_index, hex_id)
+    for position, (old_player, new_player) in enumerate(zip(old.players, new.players)):
+        if old_player is new_player:
+            continue
+        for type_index, (old_mask, new_mask) in enumerate(
+                zip(old_player.structures, new_player.structures)):
+            for hex_id in iterate_bits(old_mask ^ new_mask):
+                key ^= get_feature_key("structure", position, type_index, hex_id)
+        for bridge_id in iterate_bits(old_player.bridges ^ new_player.bridges):
+            key ^= get_feature_key("bridge", position, bridge_id)
+    return key
+
+
+def get_state_attribute_key(attribute: str, value: Any) -> int:
+    """The key of one of KEYED_STATE_ATTRIBUTES."""
+    if attribute == "board":
+        return get_board_key(value)
+    elif attribute == "pool":
+        return _get_tiles_key(_POOL, value)
+    elif attribute == "expended_action_slots":
+        key = 0
+        for action_slot in value:
+            key ^= get_feature_key(attribute, action_slot)
+        return key
+    elif attribute == "bonus_tile_coins":
+        key = 0
+        for name, coins in value.items():
+            key ^= get_feature_key(attribute, name, coins)
+        return key
+    else:
+        return get_feature_key(attribute, value)
+
+
+def get_state_attribute_key_delta(attribute: str, old: Any, new: Any) -> int:
+    if old is new:
+        return 0
+    if attribute == "board":
+        return get_board_key_delta(old, new)
+    if old == new:
+        return 0
+    return get_state_attribute_key(attribute, old) ^ get_state_attribute_key(attribute, new)
+
+
+def compute_zobrist_key(game_state: "GameState") -> int:
+    """The key of a GameState, from scratch."""
+    key = 0
+    for attribute in KEYED_STATE_ATTRIBUTES:
+        key ^= get_state_attribute_key(attribute, getattr(game_state, attribute))
+    for position, player in enumerate(game_state.players):
+        key ^= get_player_key(position, player)
+    return key
+
+
+def get_zobrist_key_delta(old: "GameState", new: "GameState", player_ids: Tuple[str, ...]) -> int:
+    """The key change from one GameState to the next, given the players which may have changed."""
+    key = 0
+    for attribute in KEYED_STATE_ATTRIBUTES:
+        key ^= get_state_attribute_key_delta(
+                attribute, getattr(old, attribute), getattr(new, attribute))
+    for player_id in player_ids:
+        old_player = old.players_by_id[player_id]
+        new_player = new.players_by_id[player_id]
+        key ^= get_player_key_delta(old_player.initial_turn_position, old_player, new_player)
+    return key
+
+
+@dataclass(frozen=True)
+class TranspositionEntry:
+    key: int
+    depth: int
+    value: Any
+    generation: int
+
+
+class TranspositionTable:
+    """A fixed size cache of search results by Zobrist key.
+
+    The table has num_slots slots, indexed by the low bits of the key, each holding two entries.
+    The first is depth-preferred: it is only replaced by a result searched at least as deeply, or
+    one from a newer search (see new_search()). The second always holds the most recent result
+    which didn't displace the first. Full keys are stored, so a lookup never returns the entry of
+    a different position which happens to share a slot.
+    """
+
+    def __init__(self, num_slots: int = 1 << 16):
+        if num_slots < 1 or num_slots & (num_slots - 1):
+            raise ValueError("The number of slots must be a power of two")
+        self.num_slots = num_slots
+        self._mask = num_slots - 1
+        self._deep: List[Optional[TranspositionEntry]] = [None] * num_slots
+        self._recent: List[Optional[TranspositionEntry]] = [None] * num_slots
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def new_search(self):
+        """Age every stored entry, so that the next search may replace them freely."""
+        self.generation += 1
+
+    def store(self, key: int, value: Any, depth: int = 0):
+        index = key & self._mask
+        entry = TranspositionEntry(key, depth, value, self.generation)
+        deep = self._deep[index]
+        if deep is None or deep.key == key or depth >= deep.depth \
+                or deep.generation != self.generation:
+            if deep is not None and deep.key != key:
+                self._recent[index] = deep
+            self._deep[index] = entry
+        else:
+            self._recent[index] = entry
+
+    def lookup(self, key: int, min_depth: int = 0) -> Optional[TranspositionEntry]:
+        """The entry for the key searched to at least min_depth, if there is one."""
+        index = key & self._mask
+        for entry in (self._deep[index], self._recent[index]):
+            if entry is not None and entry.key == key and entry.depth >= min_depth:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def get(self, key: int, default: Any = None) -> Any:
+        entry = self.lookup(key)
+        return entry.value if entry is not None else default
+
+    def clear(self):
+        self._deep = [None] * self.num_slots
+        self._recent = [None] * self.num_slots
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: int) -> bool:
+        index = key & self._mask
+        return any(x is not None and x.key == key
+                for x in (self._deep[index], self._recent[index]))
+
+    def __len__(self) -> int:
+        return sum(x is not None for x in self._deep) + sum(x is not None for x in self._recent)
@@ -1,15 +1,93 @@
+import random
+from dataclasses import fields
 from types import MappingProxyType
+from hashlib import blake2b
 from itertools import chain
-from random import sample
+from random import Random
+from typing import Any, Dict, Iterator, Sequence, Tuple
 
-def shuffled(seq):
-    return sample(seq, k=len(seq))
+from frozendict import frozendict
+
+def shuffled(seq, rng: Random = None):
+    """A shuffled copy of a sequence, using the given RNG or else the module-level one."""
+    rng = rng if rng is not None else random
+    return rng.sample(seq, k=len(seq))
+
+def derive_seed(seed: int, *path: Any) -> int:
+    """A 64 bit seed for the child stream identified by path, e.g. derive_seed(batch_seed, 12) for
+    game 12 of a batch, or derive_seed(game_seed, "setup"). Any seed can be derived directly from
+    its parent without generating its siblings, and derived seeds may be split again in turn. The
+    items of the path must have a repr() which is stable between processes.
+    """
+    digest = blake2b(repr((seed,) + path).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def create_rng(seed: int, *path: Any) -> Random:
+    return Random(derive_seed(seed, *path))
 
 def frozendict_with_item(mapping: MappingProxyType, key: Any, value: Any):
-    return frozendict({k: v for k, v in mapping.items + (key, value)})
+    return frozendict(chain(mapping.items(), ((key, value),)))
 
 def tuple_replace(tuple_: Tuple, index: int, value: Any) -> Tuple:
-    return tuple_[:index] + (value,) + tuple_[index + 1]
+    return tuple_[:index] + (value,) + tuple_[index + 1:]
+
+def iterate_bits(mask: int) -> Iterator[int]:
+    """Yield the index of each set bit of a non-negative int, lowest first."""
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+def count_bits(mask: int) -> int:
+    return bin(mask).count("1")
+
+def get_placing_points(scores: Sequence[int], points: Sequence[int]) -> Tuple[int, ...]:
+    """The points each score earns for its place, highest first, e.g. on a cult track. Tied scores
+    share the points of the places they span, rounded down, and a score of 0 earns nothing.
+    """
+    totals = [0] * len(scores)
+    place = 0
+    for score in sorted(set(scores), reverse=True):
+        if not score or place >= len(points):
+            break
+        tied = [i for i, x in enumerate(scores) if x == score]
+        share = sum(points[place:place + len(tied)]) // len(tied)
+        for i in tied:
+            totals[i] = share
+        place += len(tied)
+    return tuple(totals)
+
+def slotted(cls: type) -> type:
+    """Rebuild a dataclass with __slots__ for its fields, as dataclass(slots=True) does from Python
+    3.10. Apply it above @dataclass. Instances have no __dict__, so they are several times smaller.
+    """
+    names = tuple(x.name for x in fields(cls))
+    namespace = {k: v for k, v in cls.__dict__.items()
+            if k not in names and k not in ("__dict__", "__weakref__")}
+    namespace["__slots__"] = names
+
+    # Frozen instances can't be restored by setattr() when unpickled or copied
+    def __getstate__(self):
+        return tuple(getattr(self, x) for x in names)
+
+    def __setstate__(self, state):
+        for name, value in zip(names, state):
+            object.__setattr__(self, name, value)
+
+    namespace["__getstate__"] = __getstate__
+    namespace["__setstate__"] = __setstate__
+    new_cls = type(cls)(cls.__name__, cls.__bases__, namespace)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
+
+_INTERNED: Dict[Any, Any] = {}
+
+def intern(value: Any) -> Any:
+    """The canonical instance equal to a hashable value, so that equal values which are interned
+    are identical and stored once. Interned values are never freed, so this is only for static
+    data built at module load, such as tiles and faction rules, and never for values made in play.
+    """
+    return _INTERNED.setdefault(value, value)
 
 
 #def flatten(nested_iterable: Iterable[Iterable[Any]]):
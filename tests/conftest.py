@@ -0,0 +1,82 @@
+from dataclasses import dataclass, replace
+from typing import List, Tuple
+
+import pytest
+
+from terrabot.sim.action import ActionExecution, Phase, Step, get_required_conversions
+from terrabot.sim.game import GameState, Move, Setup
+from terrabot.sim.map import Terrain
+from terrabot.sim.player import Faction, PlayerMetadata, PlayerState
+from terrabot.sim.resource import NO_RESOURCES, PowerBowlState
+from terrabot.util import create_rng
+
+@dataclass
+class FixedStepExecution(ActionExecution):
+    step: Step = None
+
+    def compute(self, game_state: GameState) -> Step:
+        return self.step
+
+
+def _create_game_state(num_players: int = 3, power: PowerBowlState = None) -> GameState:
+    """A game in its first turn, skipping setup, where each player has a plain Lake faction and
+    its starting resources, or else the given power bowls.
+    """
+    player_metadata = tuple(PlayerMetadata(f"name{i}") for i in range(num_players))
+    game_state = GameState.create(player_metadata, randomize_turn_order=False, setup=Setup((), ()))
+    edit = game_state.edit()
+    for player in game_state.players:
+        faction = Faction(name=f"faction{player.initial_turn_position}", home_terrain=Terrain.LAKE)
+        player_state = PlayerState.create(faction)
+        if power is not None:
+            player_state = replace(player_state,
+                    resources=replace(player_state.resources, power=power))
+        edit.update_player(player.player_id, faction=faction, player_state=player_state)
+    edit.set(phase=Phase.TURN)
+    return edit.commit()
+
+
+def _play_random_game(seed: int, num_players: int = 3) \
+        -> Tuple[GameState, List[Move], GameState]:
+    """A game from a random setup to the end, with random moves and leech decisions, making the
+    cheapest conversions each move needs. Returns the initial state, the moves and the final state.
+    """
+    rng = create_rng(seed)
+    game_state = GameState.create(
+            tuple(PlayerMetadata(f"player{i}") for i in range(num_players)),
+            setup = Setup.create_random_setup(num_players, rng),
+            rng = rng)
+    initial_state = game_state
+    moves = []
+    while game_state.phase != Phase.OVER:
+        execution = rng.choice(game_state.get_available_executions())
+        move = Move(execution)
+        if game_state.phase == Phase.TURN:
+            num_leech = len(game_state.active_player.player_state.leech_opportunities)
+            leech_decisions = tuple(rng.random() < 0.5 for _ in range(num_leech))
+            prepared_state = game_state.apply_pre_action_changes(leech_decisions) \
+                    if leech_decisions else game_state
+            conversions = get_required_conversions(prepared_state, execution)
+            if conversions is None:
+                leech_decisions = (False,) * num_leech
+                conversions = get_required_conversions(game_state, execution)
+            move = Move(execution, leech_decisions, conversions)
+        moves.append(move)
+        game_state = move.apply(game_state)
+    return initial_state, moves, game_state
+
+
+@pytest.fixture
+def create_game_state():
+    return _create_game_state
+
+
+@pytest.fixture
+def fixed_step():
+    """Wraps a Step in a free ActionExecution which computes it, to submit arbitrary changes."""
+    return lambda step: FixedStepExecution(NO_RESOURCES, step)
+
+
+@pytest.fixture
+def play_random_game():
+    return _play_random_game
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import pytest
+
+from terrabot.sim.archive import IndexedArchive, IndexedArchiveWriter
+from terrabot.sim.codec import GameRecord, encode_game_state
+
+def _create_records(play_random_game, *seeds) -> list:
+    """A random two player game, played to the end, for each seed."""
+    records = []
+    for seed in seeds:
+        initial_state, moves, _ = play_random_game(seed, num_players=2)
+        records.append(GameRecord(initial_state, tuple(moves)))
+    return records
+
+def test_IndexedArchive_get_game_state_MatchesReplay(play_random_game, tmp_path):
+    path = str(tmp_path / "games.tbx")
+    records = _create_records(play_random_game, 1, 2)
+    with IndexedArchiveWriter(path, keyframe_interval=8) as writer:
+        for record in records:
+            writer.write(record)
+
+    with IndexedArchive(path) as archive:
+        assert len(archive) == 2
+        assert archive.get_num_plies(1) == len(records[1].moves)
+        assert archive.get_moves(1) == records[1].moves
+        for ply, game_state in enumerate(records[1].iterate_states()):
+            assert encode_game_state(archive.get_game_state(1, ply)) \
+                    == encode_game_state(game_state)
+        with pytest.raises(IndexError):
+            archive.get_game_state(2, 0)
+        with pytest.raises(IndexError):
+            archive.get_game_state(0, len(records[0].moves) + 1)
+
+def test_IndexedArchiveWriter_AppendsToClosedArchive(play_random_game, tmp_path):
+    path = str(tmp_path / "games.tbx")
+    records = _create_records(play_random_game, 3, 4, 5)
+    with IndexedArchiveWriter(path, keyframe_interval=16) as writer:
+        writer.write(records[0])
+    with IndexedArchiveWriter(path) as writer:
+        assert writer.keyframe_interval == 16
+        writer.write(records[1])
+        writer.write(records[2])
+
+    with IndexedArchive(path) as archive:
+        assert len(archive) == 3
+        assert [archive.get_moves(i) for i in range(3)] == [x.moves for x in records]
+        final_state = archive.get_game_state(2, archive.get_num_plies(2))
+        assert encode_game_state(final_state) \
+                == encode_game_state(records[2].get_final_state())
+
+def test_IndexedArchive_RejectsUnclosedArchive(play_random_game, tmp_path):
+    path = tmp_path / "games.tbx"
+    with IndexedArchiveWriter(str(path)) as writer:
+        writer.write(_create_records(play_random_game, 6)[0])
+    path.write_bytes(path.read_bytes()[:-4])
+
+    with pytest.raises(ValueError):
+        IndexedArchive(str(path))
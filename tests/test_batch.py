@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+from terrabot.sim.batch import ResourceDeltaBatch, apply_resource_delta_batch, \
+        get_affordable_costs
+from terrabot.sim.resource import PlayerResourceState, PowerBowlState, ResourceDelta
+
+_RESOURCES = PlayerResourceState(
+        coins = 5,
+        workers = 2,
+        priests = 1,
+        power = PowerBowlState(3, 5, 4),
+        victory_points = 20)
+
+_DELTAS = (
+        ResourceDelta(coins=-2, workers=-1),
+        ResourceDelta(coins=-6),
+        ResourceDelta(power=-3),
+        ResourceDelta(power=-6),
+        ResourceDelta(power=-7),
+        ResourceDelta(power=7, victory_points=-6),
+        ResourceDelta(power=50))
+
+def test_apply_resource_delta_batch_MatchesAdd():
+    result = apply_resource_delta_batch(_RESOURCES, ResourceDeltaBatch.from_deltas(_DELTAS))
+
+    assert list(result.feasible) == [1, 0, 1, 1, 0, 1, 1]
+    assert list(result.burn) == [0, 0, 0, 2, 0, 0, 0]
+    for i in result.get_feasible_indices():
+        assert result.get_resource_state(i) == _RESOURCES.add(_DELTAS[i])
+
+def test_apply_resource_delta_batch_Empty():
+    result = apply_resource_delta_batch(_RESOURCES, ResourceDeltaBatch.from_rows(()))
+
+    assert len(result) == 0
+
+def test_get_affordable_costs():
+    costs = (ResourceDelta(coins=5), ResourceDelta(coins=5, workers=3), ResourceDelta(priests=1))
+
+    assert get_affordable_costs(_RESOURCES, costs) == [True, False, True]
+
+def test_PlayerResourceState_are_quantities_nonnegative():
+    assert _RESOURCES.are_quantities_nonnegative()
+    assert not _RESOURCES.add(ResourceDelta(coins=-6)).are_quantities_nonnegative()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+import pytest
+
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.data.maps import DEFAULT_MAP
+from terrabot.sim.map import Terrain
+from terrabot.sim.structure import StructureType
+
+def _hex_id(location_id: str) -> int:
+    return DEFAULT_MAP.locations[location_id].hex_id
+
+def _location_ids(mask: int):
+    return {DEFAULT_MAP.hexes[x].location_id for x in DEFAULT_MAP.index.get_hex_ids(mask)}
+
+def test_Bitboard_create_TerrainMasks():
+    board = Bitboard.create(DEFAULT_MAP, ("player0", "player1"))
+
+    assert bin(board.get_terrain_mask(Terrain.RIVER)).count("1") == 36
+    assert board.get_terrain(_hex_id("A1")) == Terrain.FIELD
+    assert board.get_owner(_hex_id("A1")) is None
+
+def test_Bitboard_with_structure_Adjacency():
+    board = Bitboard.create(DEFAULT_MAP, ("player0", "player1")) \
+            .with_structure("player0", StructureType.DWELLING, _hex_id("A1"))
+
+    player = board.for_player("player0")
+    assert _location_ids(player.adjacent) == {"A2", "B1"}
+    assert board.get_owner(_hex_id("A1")) == "player0"
+    assert board.get_structure_type(_hex_id("A1")) == StructureType.DWELLING
+    assert board.get_neighbouring_player_ids(_hex_id("A2")) == ("player0",)
+    assert board.get_neighbouring_player_ids(_hex_id("A2"), "player0") == ()
+
+def test_Bitboard_with_structure_Upgrade():
+    board = Bitboard.create(DEFAULT_MAP, ("player0", "player1")) \
+            .with_structure("player0", StructureType.DWELLING, _hex_id("A1")) \
+            .with_structure("player0", StructureType.TRADING_POST, _hex_id("A1"))
+
+    player = board.for_player("player0")
+    assert player.get_structure_mask(StructureType.DWELLING) == 0
+    assert _location_ids(player.get_structure_mask(StructureType.TRADING_POST)) == {"A1"}
+    with pytest.raises(ValueError):
+        board.with_structure("player1", StructureType.DWELLING, _hex_id("A1"))
+
+def test_Bitboard_get_reachable_terrain_mask():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",)) \
+            .with_structure("player0", StructureType.DWELLING, _hex_id("C1"))
+
+    direct = board.get_reachable_mask("player0", 0)
+    shipped = board.get_reachable_mask("player0", 1)
+    assert direct & ~shipped == 0
+    assert "D1" in _location_ids(shipped) and "D1" not in _location_ids(direct)
+    forest = board.get_reachable_terrain_mask("player0", Terrain.FOREST, 1)
+    assert all(DEFAULT_MAP.locations[x].terrain == Terrain.FOREST for x in _location_ids(forest))
+
+def test_Bitboard_with_bridge():
+    bridge_slot = DEFAULT_MAP.bridge_slots[0]
+    first, second = (x.hex_id for x in bridge_slot.connected_hexes)
+    board = Bitboard.create(DEFAULT_MAP, ("player0", "player1")) \
+            .with_structure("player0", StructureType.DWELLING, first) \
+            .with_location_structure("player0", StructureType.BRIDGE, bridge_slot.location_id)
+
+    assert board.for_player("player0").adjacent >> second & 1
+    assert board.get_neighbouring_player_ids(second) == ("player0",)
+    assert board.for_player("player0").bridges == 1
+
+def test_Bitboard_with_terrain():
+    board = Bitboard.create(DEFAULT_MAP, ()).with_terrain(_hex_id("A1"), Terrain.LAKE)
+
+    assert board.get_terrain(_hex_id("A1")) == Terrain.LAKE
+    assert not board.get_terrain_mask(Terrain.FIELD) >> _hex_id("A1") & 1
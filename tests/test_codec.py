@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import pytest
+
+from terrabot.sim.action import Phase
+from terrabot.sim.codec import ArchiveWriter, GameRecord, Move, decode_game_state, \
+        decode_moves, encode_game_state, encode_moves, iterate_archive
+from terrabot.sim.resource import Conversion, ResourceType
+
+def test_encode_game_state_RoundTripsEveryPosition(play_random_game):
+    initial_state, moves, _ = play_random_game(3)
+    record = GameRecord(initial_state, tuple(moves))
+
+    for game_state in record.iterate_states():
+        data = encode_game_state(game_state)
+        decoded = decode_game_state(data)
+        assert decoded.players == game_state.players
+        assert decoded.board == game_state.board
+        assert decoded.pool == game_state.pool
+        assert decoded.get_zobrist_key() == game_state.get_zobrist_key()
+        assert encode_game_state(decoded) == data
+
+def test_decode_game_state_ContinuesTheGame(play_random_game):
+    initial_state, moves, _ = play_random_game(4, num_players=2)
+    game_state = initial_state
+    for move in moves[:len(moves) // 2]:
+        game_state = move.apply(game_state)
+
+    decoded = decode_game_state(encode_game_state(game_state))
+
+    assert decoded.get_available_executions() == game_state.get_available_executions()
+    for move in moves[len(moves) // 2:]:
+        game_state = move.apply(game_state)
+        decoded = move.apply(decoded)
+    assert decoded.phase == Phase.OVER
+    assert decoded.players == game_state.players
+
+def test_encode_moves_RoundTrip(play_random_game):
+    _, moves, _ = play_random_game(5)
+    moves[-1] = Move(moves[-1].execution, (True, False, True),
+            (Conversion(ResourceType.POWER, ResourceType.COINS, 2),),
+            (Conversion(ResourceType.WORKERS, ResourceType.COINS, 1),))
+
+    data = encode_moves(tuple(moves))
+
+    assert decode_moves(data) == tuple(moves)
+    assert len(data) < 16 * len(moves)
+
+def test_decode_game_state_RejectsOtherVersions(play_random_game):
+    initial_state, _, _ = play_random_game(6, num_players=2)
+    data = encode_game_state(initial_state)
+
+    with pytest.raises(ValueError):
+        decode_game_state(b"\x7f" + data[1:])
+
+def test_ArchiveWriter_AppendsAcrossSessions(play_random_game, tmp_path):
+    path = str(tmp_path / "games.tba")
+    records = []
+    for seed in range(3):
+        initial_state, moves, _ = play_random_game(seed, num_players=2)
+        records.append(GameRecord(initial_state, tuple(moves)))
+
+    with ArchiveWriter(path) as writer:
+        writer.write(records[0])
+    with ArchiveWriter(path) as writer:
+        writer.write(records[1])
+        writer.write(records[2])
+
+    read = list(iterate_archive(path))
+    assert [x.moves for x in read] == [x.moves for x in records]
+    assert read[2].get_final_state().players == records[2].get_final_state().players
+
+def test_iterate_archive_RejectsTruncatedRecord(play_random_game, tmp_path):
+    path = tmp_path / "games.tba"
+    initial_state, moves, _ = play_random_game(7, num_players=2)
+    with ArchiveWriter(str(path)) as writer:
+        writer.write(GameRecord(initial_state, tuple(moves)))
+    path.write_bytes(path.read_bytes()[:-1])
+
+    with pytest.raises(ValueError):
+        list(iterate_archive(str(path)))
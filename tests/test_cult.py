@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import pytest
+
+from terrabot.sim.cult import CULT_POWER_GAINS, Cult, CultDelta, CultTrackState, PlayerCultState
+
+def test_CultDelta_by_cult():
+    delta = CultDelta((Cult.FIRE, Cult.AIR, Cult.FIRE))
+
+    assert delta.by_cult(Cult.FIRE) == 2
+    assert delta.by_cult(Cult.WATER) == 0
+    assert delta.counts == (2, 0, 0, 1)
+
+def test_CULT_POWER_GAINS_Thresholds():
+    assert CULT_POWER_GAINS[0][2] == 0
+    assert CULT_POWER_GAINS[2][3] == 1
+    assert CULT_POWER_GAINS[4][7] == 4
+    assert CULT_POWER_GAINS[0][10] == 8
+    assert CULT_POWER_GAINS[9][10] == 3
+
+def test_CultTrackState_create_Layout():
+    tracks = CultTrackState.create((PlayerCultState(1, 2, 3, 4), None, PlayerCultState(5, 6, 7, 8)))
+
+    assert tracks.positions == (1, 0, 5, 2, 0, 6, 3, 0, 7, 4, 0, 8)
+    assert tracks.get_player_positions(2) == (5, 6, 7, 8)
+
+def test_CultTrackState_advance_AllTracksAtOnce():
+    tracks = CultTrackState.create((PlayerCultState(2, 4, 0, 6), PlayerCultState()))
+
+    advance = tracks.advance(0, CultDelta((Cult.FIRE, Cult.WATER, Cult.AIR, Cult.AIR)), 0)
+
+    assert advance.cult_state == PlayerCultState(3, 5, 0, 8)
+    assert advance.power == 1 + 2 + 2
+    assert advance.num_key_decisions == 0
+
+def test_CultTrackState_advance_TopNeedsKey():
+    tracks = CultTrackState.create((PlayerCultState(8, 0, 0, 0), PlayerCultState()))
+    delta = CultDelta((Cult.FIRE, Cult.FIRE, Cult.FIRE))
+
+    assert tracks.advance(0, delta, 0).cult_state.fire == 9
+    assert tracks.advance(0, delta, 1).cult_state.fire == 10
+    assert tracks.advance(0, delta, 1).power == 3
+
+def test_CultTrackState_advance_TopTakenByOtherPlayer():
+    tracks = CultTrackState.create((PlayerCultState(9, 0, 0, 0), PlayerCultState(10, 0, 0, 0)))
+
+    advance = tracks.advance(0, CultDelta((Cult.FIRE,)), 1)
+
+    assert advance.cult_state.fire == 9
+    assert advance.power == 0
+    assert tracks.get_advanceable_cults(0, 1) == (Cult.WATER, Cult.EARTH, Cult.AIR)
+
+def test_CultTrackState_advance_ContestedKey():
+    tracks = CultTrackState.create((PlayerCultState(9, 9, 9, 0), PlayerCultState(0, 0, 10, 0)))
+
+    advance = tracks.advance(0, CultDelta((Cult.FIRE, Cult.WATER, Cult.EARTH, Cult.AIR)), 1)
+
+    assert advance.cult_state == PlayerCultState(9, 9, 9, 1)
+    assert advance.contested_cults == (Cult.FIRE, Cult.WATER)
+    assert advance.num_key_decisions == 1
+
+def test_CultTrackState_get_majority_points_SplitsTies():
+    tracks = CultTrackState.create((
+            PlayerCultState(5, 3, 0, 1),
+            PlayerCultState(5, 2, 0, 1),
+            PlayerCultState(1, 1, 0, 1)))
+
+    # fire: 6 + 6 + 2, water: 8 + 4 + 2, earth: nothing, air: 4 + 4 + 4
+    assert tracks.get_majority_points() == (6 + 8 + 4, 6 + 4 + 4, 2 + 2 + 4)
+
+def test_CultTrackState_place_priest_FillsSpaces():
+    tracks = CultTrackState.create((PlayerCultState(), PlayerCultState()))
+    assert tracks.get_open_priest_spaces(Cult.FIRE) == (3, 2)
+
+    tracks = tracks.place_priest(Cult.FIRE, 2).place_priest(Cult.FIRE, 3)
+    assert tracks.priest_spaces[0] == (3, 2)
+    assert tracks.get_open_priest_spaces(Cult.FIRE) == (2,)
+    assert tracks.get_open_priest_spaces(Cult.WATER) == (3, 2)
+
+    tracks = tracks.place_priest(Cult.FIRE, 2).place_priest(Cult.FIRE, 2)
+    assert tracks.get_open_priest_spaces(Cult.FIRE) == ()
+    with pytest.raises(ValueError):
+        tracks.place_priest(Cult.FIRE, 2)
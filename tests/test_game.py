@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+
+from random import Random
+
+import pytest
+from frozendict import frozendict
+
+from terrabot.sim.action import BonusSpadeActionExecution, DeclineBonusSpadesActionExecution, \
+        PassActionExecution, Phase, Step
+from terrabot.sim.cult import Cult, CultDelta, PlayerCultState
+from terrabot.sim.data.tiles import BONUS_TILES, ROUND_TILES
+from terrabot.sim.game import KEEP_NO_HISTORY, GameState, HistoryPolicy, RuleSet, Setup
+from terrabot.sim.map import get_terrain_distance
+from terrabot.sim.player import PlayerMetadata
+from terrabot.sim.resource import NO_RESOURCES, LeechOpportunity, ResourceDelta
+from terrabot.sim.structure import PlayerStructureState, Structure, StructureType
+from terrabot.sim.tile import TileSet
+
+def test_GameStateEdit_commit_SharesUntouchedState(create_game_state):
+    initial_state = create_game_state()
+    edit = initial_state.edit()
+    edit.update_player_state("player1", cultist_steps=2)
+    resulting_state = edit.commit()
+
+    assert resulting_state.players_by_id["player1"].player_state.cultist_steps == 2
+    assert resulting_state.players_by_turn[1] is resulting_state.players_by_id["player1"]
+    assert resulting_state.players[1] is resulting_state.players_by_id["player1"]
+    assert resulting_state.players[0] is initial_state.players[0]
+    assert resulting_state.players[2] is initial_state.players[2]
+    assert resulting_state.map is initial_state.map
+    assert resulting_state.setup is initial_state.setup
+    assert resulting_state.pool is initial_state.pool
+    assert initial_state.players_by_id["player1"].player_state.cultist_steps == 0
+
+def test_GameStateEdit_get_player_state_ReflectsStagedChanges(create_game_state):
+    initial_state = create_game_state()
+    edit = initial_state.edit()
+    edit.update_player_state("player0", has_passed=True)
+    edit.update_player_state("player0", cultist_steps=1)
+
+    player_state = edit.get_player_state("player0")
+    assert player_state.has_passed
+    assert player_state.cultist_steps == 1
+
+def test_GameState_submit_AppliesStepAndAdvancesTurn(create_game_state, fixed_step):
+    initial_state = create_game_state()
+    step = Step(description="test", resource_delta=ResourceDelta(coins=-2, victory_points=3))
+
+    resulting_state = initial_state.submit(fixed_step(step))
+
+    resources = resulting_state.players_by_id["player0"].player_state.resources
+    assert resources.coins == 13
+    assert resources.victory_points == 23
+    assert resulting_state.active_player_id == "player1"
+    assert resulting_state.previous_state is initial_state
+    assert resulting_state.players[2] is initial_state.players[2]
+
+def test_GameState_submit_SkipsPassedPlayers(create_game_state, fixed_step):
+    initial_state = create_game_state()
+    pass_step = Step(description="pass", passed=True)
+
+    state = initial_state.submit(fixed_step(pass_step))
+    state = state.submit(fixed_step(Step(description="x")))
+    state = state.submit(fixed_step(Step(description="x")))
+
+    assert state.active_player_id == "player1"
+
+def test_GameState_submit_RejectsWrongNumberOfLeechDecisions(create_game_state, fixed_step):
+    initial_state = create_game_state()
+
+    with pytest.raises(ValueError):
+        initial_state.submit(
+                fixed_step(Step(description="x")),
+                leech_decisions=(True,))
+
+def test_GameState_submit_StartsNextRoundInPassOrder(create_game_state, fixed_step):
+    initial_state = create_game_state()
+    pass_step = Step(description="pass", passed=True)
+
+    state = initial_state.submit(fixed_step(Step("x")))
+    state = state.submit(fixed_step(pass_step))
+    state = state.submit(fixed_step(pass_step))
+    assert state.pass_order == (1, 2)
+    state = state.submit(fixed_step(pass_step))
+
+    assert state.round == initial_state.round + 1
+    assert state.turn_order == (1, 2, 0)
+    assert state.pass_order == ()
+    assert state.active_player_id == "player1"
+    assert not any(x.player_state.has_passed for x in state.players)
+    assert state.players_by_id["player0"].player_state.resources.workers == 4
+
+def test_GameState_submit_EndsGameAfterFinalRound(create_game_state, fixed_step):
+    edit = create_game_state(num_players=2).edit()
+    edit.set(round=6)
+    state = edit.commit()
+    pass_step = Step(description="pass", passed=True)
+
+    state = state.submit(fixed_step(pass_step))
+    state = state.submit(fixed_step(pass_step))
+
+    assert state.phase == Phase.OVER
+    assert state.get_available_actions() == ()
+
+def test_GameState_submit_ScoresNetworksAtGameEnd(create_game_state, fixed_step):
+    edit = create_game_state(num_players=2).edit()
+    board = edit.get("board")
+    for player_id, location in (("player0", "A1"), ("player0", "A2"), ("player1", "A6")):
+        board = board.with_location_structure(player_id, StructureType.DWELLING, location)
+    edit.set(round=6, board=board)
+    state = edit.commit()
+    pass_step = Step(description="pass", passed=True)
+
+    state = state.submit(fixed_step(pass_step))
+    state = state.submit(fixed_step(pass_step))
+
+    assert state.phase == Phase.OVER
+    assert [x.player_state.resources.victory_points for x in state.players] == [20 + 18, 20 + 12]
+
+def test_GameState_submit_DecidesContestedCultKey(create_game_state, fixed_step):
+    edit = create_game_state().edit()
+    edit.update_player_state("player0",
+            cult_state = PlayerCultState(fire=9, water=9),
+            towns = edit.get_player_state("player0").towns.with_towns((), 1))
+    state = edit.commit()
+    power = state.players_by_id["player0"].player_state.resources.power
+
+    state = state.submit(fixed_step(Step("x", cult_delta=CultDelta((Cult.FIRE, Cult.WATER)))))
+    assert state.phase == Phase.CULT_TRACK_DECISION
+    assert state.active_player_id == "player0"
+    executions = state.get_available_executions()
+    assert [x.cult for x in executions] == [Cult.FIRE, Cult.WATER]
+
+    state = state.submit(executions[1])
+    player_state = state.players_by_id["player0"].player_state
+    assert state.phase == Phase.TURN
+    assert state.active_player_id == "player1"
+    assert player_state.cult_state == PlayerCultState(fire=9, water=10)
+    assert player_state.resources.power == power.gain(3)
+    assert player_state.contested_cults == ()
+
+def test_GameState_submit_ResolvesImmediateLeech(create_game_state, fixed_step):
+    edit = create_game_state().edit()
+    edit.set(rule_set=RuleSet(require_immediate_leech=True))
+    initial_state = edit.commit()
+    step = Step(description="build", new_leech_opportunities=frozendict({
+            "player1": LeechOpportunity(2, "player0"),
+            "player2": LeechOpportunity(1, "player0")}))
+
+    state = initial_state.submit(fixed_step(step))
+
+    for player_id, power, victory_points in (("player1", 2, 19), ("player2", 1, 20)):
+        player_state = state.players_by_id[player_id].player_state
+        initial_resources = initial_state.players_by_id[player_id].player_state.resources
+        assert player_state.resources.power == initial_resources.power.gain(power)
+        assert player_state.resources.victory_points == victory_points
+        assert player_state.leech_opportunities == ()
+
+def test_GameState_submit_ResolvesLeechOfferedToPassedPlayer(create_game_state, fixed_step):
+    edit = create_game_state().edit()
+    edit.update_player_state("player1", has_passed=True)
+    initial_state = edit.commit()
+    step = Step(description="build", new_leech_opportunities=frozendict({
+            "player1": LeechOpportunity(2, "player0"),
+            "player2": LeechOpportunity(1, "player0")}))
+
+    state = initial_state.submit(fixed_step(step))
+
+    passed_state = state.players_by_id["player1"].player_state
+    initial_resources = initial_state.players_by_id["player1"].player_state.resources
+    assert passed_state.resources.power == initial_resources.power.gain(2)
+    assert passed_state.resources.victory_points == 19
+    assert passed_state.leech_opportunities == ()
+    assert state.players_by_id["player2"].player_state.leech_opportunities \
+            == (LeechOpportunity(1, "player0"),)
+
+def test_GameState_submit_ScoresPass(create_game_state):
+    edit = create_game_state().edit()
+    bonus_tile = next(x for x in BONUS_TILES if x.name.endswith("(BON9)"))
+    edit.update_player_state("player0",
+            tiles = TileSet(bonus_tiles = (bonus_tile,)),
+            structures = PlayerStructureState((
+                    Structure(StructureType.DWELLING, "A1"),
+                    Structure(StructureType.DWELLING, "A2"))))
+    initial_state = edit.commit()
+    assert initial_state.get_pass_points() == (2, 0, 0)
+
+    state = initial_state.submit(PassActionExecution(NO_RESOURCES))
+
+    player_state = state.players_by_id["player0"].player_state
+    assert player_state.resources.victory_points == 22
+    assert player_state.tiles.bonus_tiles == ()
+
+def test_GameState_submit_UsesCultBonusSpadesBeforeNextRound(create_game_state, fixed_step):
+    edit = create_game_state(num_players=2).edit()
+    round_tile = next(x for x in ROUND_TILES if x.name.endswith("(SCORE2)")) # 4 earth: 1 spade
+    board = edit.get("board").with_location_structure("player1", StructureType.DWELLING, "E9")
+    edit.set(setup=Setup((round_tile,) * 6, ()), round=1, board=board)
+    edit.update_player_state("player1", cult_state=PlayerCultState(earth=8))
+    initial_state = edit.commit()
+    pass_step = Step(description="pass", passed=True)
+
+    state = initial_state.submit(fixed_step(pass_step))
+    state = state.submit(fixed_step(pass_step))
+    assert state.phase == Phase.BONUS_SPADE_DECISION
+    assert state.round == 1
+    assert state.active_player_id == "player1"
+    assert state.players_by_id["player1"].player_state.bonus_spade_decisions == 2
+    executions = state.get_available_executions()
+    assert isinstance(executions[-1], DeclineBonusSpadesActionExecution)
+    board = state.board
+    assert {get_terrain_distance(board.get_terrain(board.get_hex_id(x.location)), x.new_terrain)
+            for x in executions[:-1]} == {1, 2}
+
+    execution = next(x for x in executions if isinstance(x, BonusSpadeActionExecution)
+            and get_terrain_distance(board.get_terrain(board.get_hex_id(x.location)),
+                    x.new_terrain) == 1)
+    state = state.submit(execution)
+    assert state.phase == Phase.BONUS_SPADE_DECISION
+    assert state.board.get_terrain(board.get_hex_id(execution.location)) == execution.new_terrain
+    assert state.players_by_id["player1"].player_state.bonus_spade_decisions == 1
+
+    state = state.submit(state.get_available_executions()[-1])
+    assert state.phase == Phase.TURN
+    assert state.round == 2
+    assert state.active_player_id == "player0"
+    assert state.players_by_id["player1"].player_state.bonus_spade_decisions == 0
+    assert state.players_by_id["player1"].player_state.resources.workers == 4
+
+def test_GameState_submit_LeavesCoinsOnUnusedBonusTiles(create_game_state, fixed_step):
+    edit = create_game_state(num_players=2).edit()
+    bonus_tiles = BONUS_TILES[:2]
+    edit.set(pool=TileSet(bonus_tiles=bonus_tiles))
+    initial_state = edit.commit()
+    pass_step = Step(description="pass", passed=True)
+
+    state = initial_state.submit(fixed_step(pass_step))
+    state = state.submit(fixed_step(pass_step))
+    assert state.bonus_tile_coins == {x.name: 1 for x in bonus_tiles}
+    state = state.submit(PassActionExecution(NO_RESOURCES, bonus_tiles[0]))
+
+    resources = state.players_by_id["player0"].player_state.resources
+    assert resources.coins == initial_state.players[0].player_state.resources.coins + 1
+    assert state.bonus_tile_coins == {bonus_tiles[1].name: 1}
+
+def test_GameState_create_IsReproducibleWithSeededRng():
+    player_metadata = tuple(PlayerMetadata(f"name{i}") for i in range(4))
+    first = GameState.create(player_metadata, rng=Random(11))
+    second = GameState.create(player_metadata, rng=Random(11))
+
+    assert first.setup == second.setup
+    assert [x.player_metadata for x in first.players] == [x.player_metadata for x in second.players]
+
+def _play_random_plies(history_policy: HistoryPolicy, num_plies: int) -> list:
+    rng = Random(3)
+    game_state = GameState.create(tuple(PlayerMetadata(f"name{i}") for i in range(3)),
+            setup = Setup.create_random_setup(3, rng), rng = rng, history_policy = history_policy)
+    states = [game_state]
+    for _ in range(num_plies):
+        leech_decisions = ()
+        if game_state.phase == Phase.TURN:
+            num_leech = len(game_state.active_player.player_state.leech_opportunities)
+            leech_decisions = (True,) * num_leech
+        game_state = game_state.submit(
+                rng.choice(game_state.get_available_executions()), leech_decisions)
+        states.append(game_state)
+    return states
+
+@pytest.mark.parametrize("keep_last, keyframe_interval, expected_reachable", [
+        (None, None, 40),
+        (0, None, 0),
+        (5, None, 5),
+        (None, 8, 40),
+        (12, 8, 16)])
+def test_GameState_previous_state_FollowsHistoryPolicy(
+        keep_last, keyframe_interval, expected_reachable):
+    expected_states = _play_random_plies(HistoryPolicy(), 40)
+    states = _play_random_plies(HistoryPolicy(keep_last, keyframe_interval), 40)
+
+    game_state = states[-1]
+    num_reachable = 0
+    while game_state.previous_state is not None:
+        game_state = game_state.previous_state
+        num_reachable += 1
+        expected = expected_states[-1 - num_reachable]
+        assert game_state.get_zobrist_key() == expected.get_zobrist_key()
+    assert num_reachable == expected_reachable
+
+def test_GameState_previous_state_CanContinueFromReplayedState():
+    states = _play_random_plies(HistoryPolicy(keyframe_interval=8), 30)
+    replayed = states[-1].previous_state.previous_state
+
+    assert replayed.history.ply == 28
+    assert replayed.submit(states[29].history.moves[-1].execution,
+            states[29].history.moves[-1].leech_decisions).get_zobrist_key() \
+                    == states[29].get_zobrist_key()
+    assert replayed.previous_state.get_zobrist_key() == states[27].get_zobrist_key()
+
+def test_GameState_submit_MaintainsIncomeAndEventResources():
+    rng = Random(5)
+    game_state = GameState.create(tuple(PlayerMetadata(f"name{i}") for i in range(3)),
+            setup = Setup.create_random_setup(3, rng), rng = rng, history_policy = KEEP_NO_HISTORY)
+    while game_state.phase != Phase.OVER:
+        for player in game_state.players:
+            if player.player_state is not None:
+                player_state = player.player_state
+                assert player_state.income == player.faction.get_income(player_state)
+                assert player_state.event_resources == player.faction.get_event_resources(
+                        player_state, game_state.get_round_tile())
+        game_state = game_state.submit(rng.choice(game_state.get_available_executions()),
+                (False,) * len(game_state.active_player.player_state.leech_opportunities)
+                        if game_state.phase == Phase.TURN else ())
+
+def test_GameState_submit_KeepsNoHistory(create_game_state, fixed_step):
+    edit = create_game_state().edit()
+    edit.set(history_policy=KEEP_NO_HISTORY)
+    state = edit.commit().submit(fixed_step(Step(description="pass", passed=True)))
+
+    assert state.previous_state is None
+    assert state.history is None
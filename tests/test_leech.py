@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import pytest
+
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.data.maps import DEFAULT_MAP
+from terrabot.sim.leech import ACCEPT_LEECH, DECLINE_LEECH, LeechPolicy, get_leech_amounts, \
+        get_leech_opportunities, resolve_leech, resolve_offers
+from terrabot.sim.resource import LeechOpportunity, PlayerResourceState, PowerBowlState
+from terrabot.sim.structure import StructureType
+
+def _hex_id(location_id: str) -> int:
+    return DEFAULT_MAP.locations[location_id].hex_id
+
+def _create_board() -> Bitboard:
+    """player1 has a dwelling and player2 a trading post next to A1, and player2 a stronghold next
+    to A5.
+    """
+    return Bitboard.create(DEFAULT_MAP, ("player0", "player1", "player2")) \
+            .with_structure("player1", StructureType.DWELLING, _hex_id("A2")) \
+            .with_structure("player2", StructureType.TRADING_POST, _hex_id("B1")) \
+            .with_structure("player2", StructureType.STRONGHOLD, _hex_id("B2"))
+
+def test_get_leech_amounts_AllNeighboursAtOnce():
+    board = _create_board()
+
+    assert get_leech_amounts(board, "player0", _hex_id("A1")) == (0, 1, 2)
+    assert get_leech_amounts(board, "player0", _hex_id("A5")) == (0, 0, 3)
+    assert get_leech_amounts(board, "player0", _hex_id("A10")) == (0, 0, 0)
+
+def test_get_leech_opportunities_SkipsPlayersWithoutNeighbours():
+    board = _create_board()
+
+    assert get_leech_opportunities(board, "player1", _hex_id("A1")) == \
+            {"player2": LeechOpportunity(2, "player1")}
+
+def test_resolve_leech_ClampsToRemainingCapacity():
+    resources = PlayerResourceState(power=PowerBowlState(0, 3, 9), victory_points=10)
+    opportunities = (LeechOpportunity(2, "player1"), LeechOpportunity(2, "player2"),
+            LeechOpportunity(4, "player2"))
+
+    resolved = resolve_leech(resources, opportunities, (True, True, True))
+
+    assert resolved.power == PowerBowlState(0, 0, 12)
+    assert resolved.victory_points == 9
+
+def test_resolve_leech_RejectsUnaffordablePoints():
+    resources = PlayerResourceState(victory_points=2)
+
+    with pytest.raises(ValueError):
+        resolve_leech(resources, (LeechOpportunity(5, "player1"),), (True,))
+
+def test_resolve_offers_AppliesPolicy():
+    resources = {
+            "player1": PlayerResourceState(victory_points=20),
+            "player2": PlayerResourceState(power=PowerBowlState(0, 0, 12), victory_points=20)}
+    opportunities = {
+            "player1": LeechOpportunity(3, "player0"),
+            "player2": LeechOpportunity(1, "player0")}
+
+    resolved = resolve_offers(opportunities, resources.__getitem__, ACCEPT_LEECH)
+
+    assert set(resolved) == {"player1"}
+    assert resolved["player1"].victory_points == 18
+    assert resolve_offers(opportunities, resources.__getitem__, DECLINE_LEECH) == {}
+    assert resolve_offers(opportunities, resources.__getitem__, LeechPolicy(1)) == {}
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+from terrabot.sim.data.maps import DEFAULT_MAP
+from terrabot.sim.map import MAX_SHIPPING, Terrain
+
+def test_DefaultMap_Layout():
+    terrains = [x.terrain for x in DEFAULT_MAP.hexes]
+
+    assert len(DEFAULT_MAP.hexes) == 113
+    assert terrains.count(Terrain.RIVER) == 36
+    assert all(terrains.count(x) == 11 for x in Terrain if x != Terrain.RIVER)
+
+def test_MapIndex_Adjacency():
+    index = DEFAULT_MAP.index
+    a1 = DEFAULT_MAP.locations["A1"]
+
+    assert sorted(index.location_ids[x] for x in index.get_adjacent(a1.hex_id)) == ["A2", "B1"]
+    for i in range(index.num_hexes):
+        for j in index.get_adjacent(i):
+            assert index.adjacency_masks[j] >> i & 1
+            assert index.get_distance(i, j) == 1
+
+def test_MapIndex_DistanceIsSymmetric():
+    index = DEFAULT_MAP.index
+
+    for i in range(index.num_hexes):
+        assert index.get_distance(i, i) == 0
+        for j in range(i):
+            assert index.get_distance(i, j) == index.get_distance(j, i)
+
+def test_Hex_get_hexes_of_distance():
+    a1 = DEFAULT_MAP.locations["A1"]
+
+    assert [x.location_id for x in a1.get_hexes_distance_two()] == ["A3"]
+    assert {x.location_id for x in a1.get_hexes_of_distance(2, exclude_river=False)} == \
+            {"A3", "r0", "r6", "r7"}
+
+def test_Hex_get_hexes_within_shipping():
+    c1 = DEFAULT_MAP.locations["C1"]
+
+    within_zero = {x.location_id for x in c1.get_hexes_within_shipping(0)}
+    within_one = {x.location_id for x in c1.get_hexes_within_shipping(1)}
+    assert within_zero == {x.location_id for x in c1.adjacent_hexes if x.terrain != Terrain.RIVER}
+    assert within_zero < within_one
+    assert {"A3", "B1", "B2", "D1"} <= within_one
+    for shipping in range(MAX_SHIPPING):
+        index = DEFAULT_MAP.index
+        smaller = index.get_shipping_mask(c1.hex_id, shipping)
+        assert smaller & index.get_shipping_mask(c1.hex_id, shipping + 1) == smaller
+
+def test_Map_bridge_slots_CrossRiver():
+    for bridge_slot in DEFAULT_MAP.bridge_slots:
+        first, second = bridge_slot.connected_hexes
+        assert DEFAULT_MAP.index.get_distance(first.hex_id, second.hex_id) == 2
+        assert bridge_slot.location_id in [x.location_id for x in first.bridge_slots]
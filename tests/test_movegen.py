@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+from itertools import islice
+
+import pytest
+
+from terrabot.sim.action import Phase, PassActionExecution, PlaceInitialDwellingActionExecution, \
+        TransformAndBuildActionExecution, UpgradeStructureActionExecution, get_required_conversions
+from terrabot.sim.data.factions import FACTIONS_BY_NAME
+from terrabot.sim.data.tiles import BONUS_TILES, ROUND_TILES
+from terrabot.sim.game import GameState, Setup
+from terrabot.sim.map import Terrain
+from terrabot.sim.player import PlayerMetadata
+from terrabot.sim.resource import Conversion, PlayerResourceState, PowerBowlState, \
+        ResourceDelta, ResourceType
+from terrabot.sim.structure import StructureType
+
+_FACTION_NAMES = ("Witches", "Engineers")
+
+def _submit(game_state: GameState, execution) -> GameState:
+    """Submit an execution, accepting any leech."""
+    num_leech = len(game_state.active_player.player_state.leech_opportunities) \
+            if game_state.phase == Phase.TURN else 0
+    return game_state.submit(execution, leech_decisions=(True,) * num_leech)
+
+
+def _select(game_state: GameState, predicate) -> GameState:
+    execution = next(x for x in game_state.iterate_available_executions() if predicate(x))
+    return _submit(game_state, execution)
+
+
+def _create_game_state() -> GameState:
+    """A two player game of Witches and Engineers, played through setup."""
+    player_metadata = tuple(PlayerMetadata(f"name{i}") for i in range(2))
+    setup = Setup(ROUND_TILES[:6], BONUS_TILES[:5])
+    game_state = GameState.create(player_metadata, randomize_turn_order=False, setup=setup)
+    for name in _FACTION_NAMES:
+        game_state = _select(game_state, lambda x: x.faction.name == name)
+    for location in ("E9", "F6", "E7", "F4"):
+        game_state = _select(game_state, lambda x: x.location == location)
+    for _ in range(2):
+        game_state = game_state.submit(game_state.get_available_executions()[0])
+    return game_state
+
+
+def test_GameState_submit_PlaysThroughSetup():
+    game_state = _create_game_state()
+
+    assert game_state.phase == Phase.TURN
+    assert game_state.round == 1
+    assert game_state.active_player_id == "player0"
+    witches = game_state.players_by_id["player0"]
+    assert witches.faction is FACTIONS_BY_NAME["Witches"]
+    assert tuple(x.location for x in witches.player_state.structures.structures) == ("E9", "F4")
+    assert len(witches.player_state.tiles.bonus_tiles) == 1
+    assert len(game_state.pool.bonus_tiles) == 3
+
+def test_GameState_submit_PlacesInitialDwellingsInSnakeOrder():
+    player_metadata = tuple(PlayerMetadata(f"name{i}") for i in range(2))
+    game_state = GameState.create(player_metadata, randomize_turn_order=False, setup=Setup((), ()))
+    for name in _FACTION_NAMES:
+        game_state = _select(game_state, lambda x: x.faction.name == name)
+
+    positions = []
+    while game_state.phase == Phase.PLACE_INITIAL_DWELLING:
+        positions.append(game_state.active_player_position)
+        game_state = game_state.submit(game_state.get_available_executions()[0])
+
+    assert positions == [0, 1, 1, 0]
+    assert game_state.phase == Phase.SELECT_INITIAL_BONUS_TILE
+    assert game_state.active_player_position == 1
+
+def test_get_available_executions_OnlyOffersHomeTerrainForInitialDwellings():
+    player_metadata = tuple(PlayerMetadata(f"name{i}") for i in range(2))
+    game_state = GameState.create(player_metadata, randomize_turn_order=False, setup=Setup((), ()))
+    for name in _FACTION_NAMES:
+        game_state = _select(game_state, lambda x: x.faction.name == name)
+
+    executions = game_state.get_available_executions()
+    board = game_state.board
+    assert executions
+    assert all(isinstance(x, PlaceInitialDwellingActionExecution) for x in executions)
+    assert all(board.get_terrain(board.get_hex_id(x.location)) == Terrain.FOREST
+            for x in executions)
+    assert len(executions) == game_state.count_available_executions()
+
+def test_get_available_executions_OrdersUpgradesFirstAndPassLast():
+    executions = _create_game_state().get_available_executions()
+
+    assert isinstance(executions[0], UpgradeStructureActionExecution)
+    assert isinstance(executions[-1], PassActionExecution)
+    transforms = [not x.build_dwelling for x in executions
+            if isinstance(x, TransformAndBuildActionExecution)]
+    assert transforms
+    assert transforms == sorted(transforms)
+
+def test_get_available_executions_MemoizesCompleteEnumeration():
+    game_state = _create_game_state()
+    assert game_state.available_executions is None
+
+    list(islice(game_state.iterate_available_executions(), 3))
+    assert game_state.available_executions is None
+
+    executions = game_state.get_available_executions()
+    assert game_state.available_executions is executions
+    assert game_state.get_available_executions() is executions
+    assert tuple(game_state.iterate_available_executions()) == executions
+
+    resulting_state = game_state.submit(executions[0])
+    assert resulting_state.available_executions is None
+
+def test_count_available_executions_MatchesEnumeration():
+    game_state = _create_game_state()
+    for _ in range(6):
+        count = game_state.count_available_executions()
+        executions = game_state.get_available_executions()
+        assert count == len(executions)
+        game_state = _submit(game_state, executions[len(executions) // 2])
+
+def test_GameState_submit_UpgradeToTempleRequiresFavorTile():
+    game_state = _create_game_state()
+    edit = game_state.edit()
+    resources = edit.get_player_state("player0").resources
+    edit.update_resources("player0", resources.add(ResourceDelta(workers=2)))
+    game_state = edit.commit()
+    game_state = _select(game_state, lambda x: isinstance(x, UpgradeStructureActionExecution)
+            and x.structure_type == StructureType.TRADING_POST)
+    game_state = _select(game_state, lambda x: isinstance(x, PassActionExecution))
+    game_state = _select(game_state, lambda x: isinstance(x, UpgradeStructureActionExecution)
+            and x.structure_type == StructureType.TEMPLE)
+
+    assert game_state.phase == Phase.SELECT_FAVOR_TILE
+    assert game_state.active_player_id == "player0"
+
+    game_state = _submit(game_state, game_state.get_available_executions()[0])
+    witches = game_state.players_by_id["player0"].player_state
+    assert game_state.phase == Phase.TURN
+    assert witches.favor_tile_decisions == 0
+    assert len(witches.tiles.favor_tiles) == 1
+
+def test_get_available_executions_OffersExecutionsWhichNeedConversions():
+    game_state = _create_game_state()
+    edit = game_state.edit()
+    edit.update_resources("player0", PlayerResourceState(
+            coins=0, workers=10, power=PowerBowlState(0, 0, 6)))
+    game_state = edit.commit()
+
+    execution = next(x for x in game_state.iterate_available_executions()
+            if isinstance(x, TransformAndBuildActionExecution) and x.build_dwelling)
+    conversions = get_required_conversions(game_state, execution)
+    assert conversions == (Conversion(ResourceType.POWER, ResourceType.COINS, 2),)
+
+    game_state = game_state.submit(execution, conversions_before_action=conversions)
+    witches = game_state.players_by_id["player0"].player_state
+    assert witches.resources.are_quantities_nonnegative()
+    assert witches.resources.power.bowl_three == 4
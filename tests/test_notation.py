@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+import pytest
+
+from terrabot.sim.action import Phase
+from terrabot.sim.notation import NotationError, format_game, iterate_moves, read_game, \
+        split_commands
+from terrabot.sim.resource import Conversion, ResourceType
+
+def test_split_commands_UsesShortCodes():
+    assert split_commands("action Action-PWR-Bridge-(ACT1).  bridge F2:H2") \
+            == ("action act1", "bridge f2:h2")
+    assert split_commands("pass BonusTile-6Coin-(BON3)") == ("pass bon3",)
+
+def test_read_game_ReplaysFormattedGame(play_random_game):
+    initial_state, moves, final_state = play_random_game(2)
+
+    lines = list(format_game(initial_state, moves))
+    parsed_state, parsed_moves = read_game(lines)
+    replayed = list(parsed_moves)
+
+    assert parsed_state.setup == initial_state.setup
+    assert [x for x, _ in replayed] == moves
+    assert replayed[-1][1].phase == Phase.OVER
+    assert replayed[-1][1].get_zobrist_key() == final_state.get_zobrist_key()
+
+def test_iterate_moves_AcceptsConversions(play_random_game):
+    initial_state, moves, _ = play_random_game(3)
+    game_state = initial_state
+    for move in moves:
+        if game_state.phase == Phase.TURN:
+            break
+        game_state = move.apply(game_state)
+    name = game_state.active_player.faction.name.lower()
+    description = move.execution.compute(game_state).description
+
+    ((parsed_move, resulting_state),) = iterate_moves(
+            [f"{name}: burn 1. convert 1W to 1C. {description}"], game_state)
+
+    assert parsed_move.execution == move.execution
+    assert parsed_move.conversions_before_action \
+            == (Conversion(ResourceType.WORKERS, ResourceType.COINS, 1),)
+    assert resulting_state.get_zobrist_key() \
+            != move.apply(game_state).get_zobrist_key()
+
+def test_iterate_moves_ReportsIllegalMove(play_random_game):
+    initial_state, _, _ = play_random_game(4)
+
+    with pytest.raises(NotationError) as error:
+        list(iterate_moves(["player0: select witches", "player1: select witches"], initial_state))
+    assert error.value.line_number == 2
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+from terrabot.sim.cult import PlayerCultState
+from terrabot.sim.packed import PlayerField, PlayerStateBlock, pack_player_state, packed_key, \
+        unpack_player_state
+from terrabot.sim.player import PlayerState
+from terrabot.sim.resource import PlayerResourceState, PowerBowlState
+
+_PLAYER_STATE = PlayerState(
+        dig_level = 1,
+        ship_level = 2,
+        resources = PlayerResourceState(
+                coins = 7,
+                workers = 3,
+                priests = 1,
+                priest_pool_size = 6,
+                power = PowerBowlState(2, 8, 2),
+                victory_points = 41),
+        cult_state = PlayerCultState(3, 0, 5, 10),
+        cultist_steps = 1)
+
+def test_pack_player_state_RoundTrip():
+    packed = pack_player_state(_PLAYER_STATE)
+
+    assert packed[PlayerField.VICTORY_POINTS] == 41
+    assert packed[PlayerField.POWER_BOWL_TWO] == 8
+    unpacked = unpack_player_state(packed, _PLAYER_STATE)
+    assert unpacked.resources == _PLAYER_STATE.resources
+    assert unpacked.cult_state == _PLAYER_STATE.cult_state
+    assert unpacked.dig_level == 1
+    assert unpacked.ship_level == 2
+    assert unpacked.cultist_steps == 1
+
+def test_packed_key_EqualForEqualStates():
+    assert packed_key(_PLAYER_STATE) == packed_key(unpack_player_state(
+            pack_player_state(_PLAYER_STATE)))
+    assert packed_key(_PLAYER_STATE) != packed_key(PlayerState())
+
+def test_PlayerStateBlock_RowsAndColumns():
+    block = PlayerStateBlock.from_player_states((_PLAYER_STATE, PlayerState()))
+    copied = PlayerStateBlock.frombytes(block.tobytes())
+
+    assert len(copied) == 2
+    assert list(copied.column(PlayerField.VICTORY_POINTS)) == [41, 20]
+    assert copied.row(0).tolist() == pack_player_state(_PLAYER_STATE).tolist()
+    assert copied.unpack(1).resources == PlayerResourceState()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+from terrabot.sim.data.factions import FACTIONS_BY_NAME
+from terrabot.sim.data.tiles import BONUS_TILES, FAVOR_TILES, ROUND_TILES
+from terrabot.sim.event import EventTrigger, EventType, PassTrigger, PassTriggerType, \
+        compile_pass_triggers
+from terrabot.sim.player import PlayerState
+from terrabot.sim.resource import NO_RESOURCES, ResourceDelta
+from terrabot.sim.structure import PlayerStructureState, Structure, StructureType
+from terrabot.sim.tile import Tile, TileSet, TileType
+
+def test_FactionRules_compile_BuildingCosts():
+    faction = FACTIONS_BY_NAME["Witches"]
+    costs = faction.rules.building_costs
+
+    assert costs[StructureType.TRADING_POST] == (faction.trading_post_cost_without_neighbors,
+            faction.trading_post_cost_with_neighbors)
+    assert costs[StructureType.TEMPLE] == (faction.temple_cost, faction.temple_cost)
+
+def test_FactionRules_compile_CumulativeIncome():
+    income = FACTIONS_BY_NAME["Witches"].rules.structure_income
+
+    assert income[StructureType.DWELLING][0] is NO_RESOURCES
+    assert income[StructureType.DWELLING][8] == ResourceDelta(workers=8)
+    assert income[StructureType.TRADING_POST][3] == ResourceDelta(coins=6, power=4)
+    assert income[StructureType.STRONGHOLD] == (NO_RESOURCES, ResourceDelta(power=2))
+
+def test_Faction_get_income_CountsStructures():
+    faction = FACTIONS_BY_NAME["Witches"]
+    structures = (
+            Structure(StructureType.DWELLING, "A1"),
+            Structure(StructureType.DWELLING, "A2"),
+            Structure(StructureType.TRADING_POST, "A3"),
+            Structure(StructureType.BRIDGE, "A3-A4"))
+    player_state = PlayerState(structures = PlayerStructureState(structures))
+
+    assert faction.get_income(player_state) == ResourceDelta(coins=2, workers=3, power=1)
+
+def test_Faction_get_dig_cost_ByLevel():
+    faction = FACTIONS_BY_NAME["Witches"]
+
+    assert faction.get_dig_cost(PlayerState(dig_level=0)) == ResourceDelta(workers=3)
+    assert faction.get_dig_cost(PlayerState(dig_level=2)) == ResourceDelta(workers=1)
+
+def test_Faction_get_event_resources_SumsTriggers():
+    faction = FACTIONS_BY_NAME["Witches"]
+    favor_tile = Tile("Favor", TileType.FAVOR, event_trigger = EventTrigger(
+            (EventType.BUILD_DWELLING, EventType.DIG), ResourceDelta(victory_points=2)))
+    round_tile = next(x for x in ROUND_TILES
+            if x.event_trigger.listens_for == (EventType.BUILD_DWELLING,))
+    player_state = PlayerState(tiles = TileSet(favor_tiles = (favor_tile,)))
+
+    table = faction.get_event_resources(player_state, round_tile)
+
+    assert table[EventType.BUILD_DWELLING] \
+            == ResourceDelta(victory_points=2) + round_tile.event_trigger.provides
+    assert table[EventType.DIG] == ResourceDelta(victory_points=2)
+    assert EventType.BUILD_TOWN not in table
+    assert faction.get_event_resources(player_state, round_tile) is table
+
+
+def test_Faction_get_pass_points_ScoresTilesAndStronghold():
+    bonus_tile = next(x for x in BONUS_TILES if x.name.endswith("(BON7)"))
+    favor_tile = next(x for x in FAVOR_TILES if x.name.endswith("(FAV12)"))
+    structures = (
+            Structure(StructureType.TRADING_POST, "A1"),
+            Structure(StructureType.TRADING_POST, "A2"),
+            Structure(StructureType.BRIDGE, "A2-A3"))
+    player_state = PlayerState(
+            structures = PlayerStructureState(structures),
+            tiles = TileSet(bonus_tiles = (bonus_tile,), favor_tiles = (favor_tile,)))
+    engineers = FACTIONS_BY_NAME["Engineers"]
+
+    assert FACTIONS_BY_NAME["Witches"].get_pass_points(player_state) == 4 + 3
+    assert engineers.get_pass_points(player_state) == 4 + 3
+    player_state.structures = player_state.structures.add(
+            (Structure(StructureType.STRONGHOLD, "A4"),))
+    assert engineers.get_pass_points(player_state) == 4 + 3 + 3
+    assert engineers.get_pass_points(PlayerState()) == 0
+
+def test_PassTrigger_compile_Shipping():
+    trigger = PassTrigger(PassTriggerType.SHIPPING, (0, 3, 6, 9))
+    counts = PlayerStructureState().type_counts
+
+    assert trigger.compile()(counts, 2) == 6
+    assert trigger.compile()(counts, 5) == 9
+    assert compile_pass_triggers((trigger, None, trigger))(counts, 1) == 6
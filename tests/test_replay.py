@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+
+from terrabot.replay import find_logs, replay_log, replay_logs
+from terrabot.sim.notation import format_game
+
+def _write_random_log(play_random_game, path, seed: int):
+    initial_state, moves, _ = play_random_game(seed, num_players=2)
+    path.write_text("\n".join(format_game(initial_state, moves)) + "\n")
+    return len(moves)
+
+def test_replay_log_ReportsError(play_random_game, tmp_path):
+    num_moves = _write_random_log(play_random_game, tmp_path / "game.txt", 1)
+    (tmp_path / "bad.txt").write_text(
+            (tmp_path / "game.txt").read_text().replace("player1: select", "player0: select"))
+
+    result = replay_log(str(tmp_path / "game.txt"))
+    bad_result = replay_log(str(tmp_path / "bad.txt"))
+
+    assert result.completed and result.error is None and result.num_moves == num_moves
+    assert not bad_result.completed
+    assert bad_result.error.startswith("Line 5")
+
+def test_replay_logs_ReplaysDirectory(play_random_game, tmp_path):
+    (tmp_path / "logs").mkdir()
+    for seed in range(3):
+        _write_random_log(play_random_game, tmp_path / "logs" / f"{seed}.txt", seed)
+
+    paths = find_logs([str(tmp_path / "logs")])
+    results = list(replay_logs(paths, num_workers=2, logs_per_task=2))
+
+    assert sorted(x.path for x in results) == list(paths)
+    assert all(x.completed for x in results)
@@ -1,15 +1,35 @@
 #!/usr/bin/env python
 
+from random import Random
+
 import pytest
 
-from ..terrabot.sim.resource import PowerBowlState
+from terrabot.sim.data.factions import FACTIONS
+from terrabot.sim.data.tiles import BONUS_TILES
+from terrabot.sim.resource import MAX_POWER_TOKENS, NO_RESOURCES, PowerBowlState, \
+        PlayerResourceState, ResourceDelta, ResourceType, Conversion, ConversionPlan, \
+        plan_conversions, _plan_conversions, _DEFAULT_CONVERSION_RATES
+from terrabot.util import frozendict_with_item
+
+def test_ResourceDelta_add_Zero():
+    delta = ResourceDelta(coins=2, workers=1)
+
+    assert delta + NO_RESOURCES is delta
+    assert NO_RESOURCES + delta is delta
+    assert delta - NO_RESOURCES is delta
+    assert delta + delta == ResourceDelta(coins=4, workers=2)
+
+def test_ResourceDelta_IsInterned():
+    assert len({x.dwelling_cost for x in FACTIONS}) == len({id(x.dwelling_cost) for x in FACTIONS})
+    assert all(x.immediate_resources is NO_RESOURCES for x in BONUS_TILES)
+    assert not hasattr(NO_RESOURCES, "__dict__")
 
 def test_PowerBowlState_accessors():
     power_bowl_state = PowerBowlState(3, 5, 4)
 
     assert power_bowl_state.get_num_tokens() == 12
-    assert power_bowl_state.get_available_power() == 8
-    assert power_bowl_state.get_available_capacity() == 25 # 2*(12-3) + (12-5)
+    assert power_bowl_state.get_available_power() == 6 # 4 + (5 // 2)
+    assert power_bowl_state.get_available_capacity() == 11 # 2*3 + 5
 
 def test_PowerBowlState_gain_MoreThanCapacity():
     initial_state = PowerBowlState(3, 5, 4)
@@ -38,11 +58,121 @@ def test_PowerBowlState_spend_WithoutBurn():
 def test_PowerBowlState_spend_WithBurn():
     initial_state = PowerBowlState(3, 5, 4)
 
+    # Burn 2 (bowl two loses 4, bowl three gains 2), then spend all 6 from bowl three
     resulting_state = initial_state.spend(6)
-    assert resulting_state == PowerBowlState(7, 1, 0)
+    assert resulting_state == PowerBowlState(9, 1, 0)
 
 def test_PowerBowlState_spend_MoreThanCapacity():
     initial_state = PowerBowlState(3, 5, 4)
 
     with pytest.raises(ValueError):
         initial_state.spend(7)
+
+def test_PowerBowlState_burn():
+    initial_state = PowerBowlState(3, 5, 4)
+
+    assert initial_state.burn(2) == PowerBowlState(3, 1, 6)
+    with pytest.raises(ValueError):
+        initial_state.burn(3)
+
+def _reference_gain(bowls, power):
+    bowl_one, bowl_two, bowl_three = bowls
+    from_one = min(power, bowl_one)
+    from_two = min(power - from_one, bowl_two + from_one)
+    return (bowl_one - from_one, bowl_two + from_one - from_two, bowl_three + from_two)
+
+def _reference_spend(bowls, power):
+    """None if the power can't be spent, even by burning."""
+    bowl_one, bowl_two, bowl_three = bowls
+    burned = max(power - bowl_three, 0)
+    if 2 * burned > bowl_two:
+        return None
+    return (bowl_one + power, bowl_two - 2 * burned, bowl_three + burned - power)
+
+def _iterate_bowls(max_tokens):
+    for bowl_one in range(max_tokens + 1):
+        for bowl_two in range(max_tokens + 1 - bowl_one):
+            for bowl_three in range(max_tokens + 1 - bowl_one - bowl_two):
+                yield bowl_one, bowl_two, bowl_three
+
+def _check_against_reference(bowls, power):
+    state = PowerBowlState(*bowls)
+    assert state.gain(power) == PowerBowlState(*_reference_gain(bowls, power))
+    expected = _reference_spend(bowls, power)
+    if expected is None:
+        with pytest.raises(ValueError):
+            state.spend(power)
+    else:
+        assert state.spend(power) == PowerBowlState(*expected)
+
+def test_PowerBowlState_MatchesReferenceForEveryTableEntry():
+    for bowls in _iterate_bowls(MAX_POWER_TOKENS):
+        for power in range(2 * MAX_POWER_TOKENS + 2):
+            _check_against_reference(bowls, power)
+
+def test_PowerBowlState_MatchesReferenceForRandomStates():
+    # Includes configurations with more tokens than the tables cover
+    rng = Random(23)
+    for _ in range(2000):
+        bowls = tuple(rng.randrange(3 * MAX_POWER_TOKENS) for _ in range(3))
+        _check_against_reference(bowls, rng.randrange(4 * MAX_POWER_TOKENS))
+
+def test_PowerBowlState_ReturnsSharedInstances():
+    state = PowerBowlState(3, 5, 4)
+
+    assert state.gain(2) is PowerBowlState.create(1, 7, 4)
+    assert state.spend(6) is state.spend(6)
+    assert state.gain(0) is PowerBowlState.create(3, 5, 4)
+    assert PlayerResourceState().power is PowerBowlState.create()
+    assert PowerBowlState(20, 0, 0).gain(1) == PowerBowlState(19, 1, 0)
+
+def _apply_plan(resources, plan, cost):
+    for conversion in plan.conversions:
+        resources = resources.add(conversion.get_resource_delta())
+    return resources.subtract(cost)
+
+def test_plan_conversions_NoConversionsNeeded():
+    resources = PlayerResourceState(coins=5, workers=2, power=PowerBowlState(3, 5, 4))
+
+    plan = plan_conversions(resources, ResourceDelta(coins=5, workers=2, power=4))
+    assert plan == ConversionPlan((), 0, 0)
+
+def test_plan_conversions_PrefersCheapestSource():
+    resources = PlayerResourceState(coins=1, workers=1, priests=1, power=PowerBowlState(3, 5, 4))
+    cost = ResourceDelta(coins=4, workers=2)
+
+    plan = plan_conversions(resources, cost)
+    assert plan.burn == 0
+    assert plan.loss == 8 # 1P->1W, 3PW->3C
+    assert _apply_plan(resources, plan, cost).are_quantities_nonnegative()
+
+def test_plan_conversions_Burns():
+    resources = PlayerResourceState(power=PowerBowlState(0, 6, 2))
+    cost = ResourceDelta(workers=1)
+
+    plan = plan_conversions(resources, cost)
+    assert plan.conversions == (Conversion(ResourceType.POWER, ResourceType.WORKERS, 1),)
+    assert plan.burn == 1
+    assert _apply_plan(resources, plan, cost).power == PowerBowlState(3, 4, 0)
+
+def test_plan_conversions_Unaffordable():
+    resources = PlayerResourceState(coins=1, power=PowerBowlState(12, 0, 0))
+
+    assert plan_conversions(resources, ResourceDelta(coins=2)) is None
+    assert resources.could_afford(ResourceDelta(coins=2)) == (False, None)
+
+def test_plan_conversions_PointsToCoinsRate():
+    resources = PlayerResourceState(coins=0, power=PowerBowlState(12, 0, 0), victory_points=5)
+    rates = frozendict_with_item(
+            _DEFAULT_CONVERSION_RATES, (ResourceType.POINTS, ResourceType.COINS), 1)
+
+    plan = plan_conversions(resources, ResourceDelta(coins=2), rates)
+    assert plan.conversions == (Conversion(ResourceType.POINTS, ResourceType.COINS, 2),)
+
+def test_plan_conversions_IgnoresBowlOne():
+    cost = ResourceDelta(coins=3, power=2)
+    first = plan_conversions(PlayerResourceState(power=PowerBowlState(0, 4, 1)), cost)
+    hits = _plan_conversions.cache_info().hits
+
+    assert plan_conversions(PlayerResourceState(power=PowerBowlState(5, 4, 1)), cost) is first
+    assert _plan_conversions.cache_info().hits == hits + 1
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+from frozendict import frozendict
+
+from terrabot.sim.action import PassActionExecution, Phase, Step
+from terrabot.sim.cult import Cult, CultDelta
+from terrabot.sim.game import GameState, RuleSet
+from terrabot.sim.resource import LeechOpportunity, ResourceDelta
+from terrabot.sim.search import SearchState
+from terrabot.sim.structure import Structure, StructureType
+
+_STEPS = (
+        Step(
+                description = "priest",
+                resource_delta = ResourceDelta(priests=1, power=-3),
+                cult_delta = CultDelta((Cult.FIRE, Cult.FIRE)),
+                action_slot_expended = "Action-PWR-Priest-(ACT2)"),
+        Step(
+                description = "build",
+                resource_delta = ResourceDelta(coins=-2, workers=-1, power=3),
+                new_structures = (Structure(StructureType.DWELLING, "A1"),),
+                new_leech_opportunities = frozendict({"player0": LeechOpportunity(1, "player1")})),
+        Step(description = "pass", passed = True, resource_delta = ResourceDelta(victory_points=2)))
+
+def _player_fields(game_state: GameState):
+    return tuple(
+            (x.player_state.resources, x.player_state.cult_state, x.player_state.has_passed,
+                    x.player_state.leech_opportunities, x.player_state.structures.structures,
+                    x.player_state.income)
+            for x in game_state.players)
+
+def test_SearchState_make_MatchesSubmit(create_game_state, fixed_step):
+    game_state = create_game_state()
+    search_state = SearchState.from_game_state(game_state)
+    for step in _STEPS:
+        game_state = game_state.submit(fixed_step(step))
+        search_state.make(step)
+
+    result = search_state.to_game_state()
+    assert _player_fields(result) == _player_fields(game_state)
+    assert result.active_player_position == game_state.active_player_position
+    assert result.expended_action_slots == game_state.expended_action_slots
+
+def test_SearchState_unmake_RestoresExactly(create_game_state):
+    root = create_game_state()
+    search_state = SearchState.from_game_state(root)
+    marks = [search_state.make(step) for step in _STEPS]
+    for mark in reversed(marks):
+        search_state.unmake(mark)
+
+    assert search_state.to_game_state() is root
+    assert _player_fields(SearchState(root).to_game_state()) == _player_fields(root)
+    assert search_state.active_player_position == root.active_player_position
+    assert search_state.player_states[0].structures == []
+
+def test_SearchState_make_MatchesSubmitWithImmediateLeech(create_game_state, fixed_step):
+    edit = create_game_state().edit()
+    edit.set(rule_set=RuleSet(require_immediate_leech=True))
+    game_state = edit.commit()
+    search_state = SearchState.from_game_state(game_state)
+    for step in _STEPS:
+        game_state = game_state.submit(fixed_step(step))
+        search_state.make(step)
+
+    assert _player_fields(search_state.to_game_state()) == _player_fields(game_state)
+    assert search_state.zobrist_key == game_state.get_zobrist_key()
+
+def test_SearchState_make_MatchesSubmitForPriestSpace(create_game_state, fixed_step):
+    game_state = create_game_state()
+    search_state = SearchState.from_game_state(game_state)
+    step = Step(
+            description = "send p to WATER for 3",
+            resource_delta = ResourceDelta(priests=-1),
+            cult_delta = CultDelta((Cult.WATER,) * 3),
+            priest_space = 3)
+    resulting_state = game_state.submit(fixed_step(step))
+    mark = search_state.make(step)
+
+    result = search_state.to_game_state()
+    assert _player_fields(result) == _player_fields(resulting_state)
+    assert result.priest_spaces == resulting_state.priest_spaces == ((), (3,), (), ())
+    assert result.players[0].player_state.resources.priest_pool_size == 6
+    assert search_state.zobrist_key == resulting_state.get_zobrist_key()
+
+    search_state.unmake(mark)
+    assert search_state.to_game_state() is game_state
+    assert search_state.zobrist_key == game_state.get_zobrist_key()
+
+def test_SearchState_make_ContinuesIntoNextRound(play_random_game):
+    initial_state, moves, _ = play_random_game(3, num_players=2)
+    game_state = initial_state
+    for move in moves:
+        if game_state.phase == Phase.TURN and game_state.round == 2:
+            break
+        game_state = move.apply(game_state)
+    root = game_state
+    search_state = SearchState.from_game_state(root)
+    marks = []
+    while game_state.round == 2:
+        execution = next(x for x in game_state.get_available_executions()
+                if isinstance(x, PassActionExecution))
+        marks.append(search_state.make(execution.compute(game_state)))
+        game_state = game_state.submit(execution)
+
+    result = search_state.to_game_state()
+    assert result.round == game_state.round == 3
+    assert result.phase == game_state.phase
+    assert result.get_available_actions()
+    assert [x.player_state for x in result.players] == [x.player_state for x in game_state.players]
+    assert (result.pool, result.turn_order, result.bonus_tile_coins) \
+            == (game_state.pool, game_state.turn_order, game_state.bonus_tile_coins)
+    assert search_state.zobrist_key == game_state.get_zobrist_key()
+
+    for mark in reversed(marks):
+        search_state.unmake(mark)
+    assert search_state.to_game_state() is root
+    assert search_state.zobrist_key == root.get_zobrist_key()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+from dataclasses import replace
+
+import pytest
+
+from terrabot.selfplay import get_game_seeds, play_game, run_self_play
+
+def test_play_game_PlaysToTheEnd():
+    result = play_game(seed=1, num_players=3)
+
+    assert result.completed
+    assert len(result.factions) == 3
+    assert len(set(result.factions)) == 3
+    assert result.num_plies > 0
+
+def test_play_game_IsReproducible():
+    first = play_game(seed=7, num_players=2)
+    second = play_game(seed=7, num_players=2)
+
+    assert replace(first, duration=0) == replace(second, duration=0)
+
+def test_run_self_play_StreamsEveryGame():
+    results = list(run_self_play(num_games=3, seed=5, num_players=2, num_workers=2))
+
+    assert sorted(x.seed for x in results) == sorted(get_game_seeds(5, 3))
+    assert all(x.completed for x in results)
+    expected = play_game(get_game_seeds(5, 3)[0], num_players=2)
+    actual = next(x for x in results if x.seed == expected.seed)
+    assert replace(actual, duration=0) == replace(expected, duration=0)
@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+
+from terrabot.sim.structure import PlayerStructureState, Structure, StructureType
+
+_STRUCTURES = (
+        Structure(StructureType.DWELLING, "A1"),
+        Structure(StructureType.DWELLING, "A2"),
+        Structure(StructureType.TRADING_POST, "A1"))
+
+def test_PlayerStructureState_IndexesCurrentStructures():
+    state = PlayerStructureState(_STRUCTURES)
+
+    assert state.location_mapping["A1"] == Structure(StructureType.TRADING_POST, "A1")
+    assert state.type_counts[StructureType.DWELLING] == 1
+    assert state.type_counts[StructureType.TRADING_POST] == 1
+    assert state.type_counts[StructureType.TEMPLE] == 0
+    assert state.type_locations[StructureType.DWELLING] == {"A2"}
+    assert state.type_locations[StructureType.DWELLING] == {"A2"} # readable more than once
+
+def test_PlayerStructureState_add_MatchesRebuild():
+    state = PlayerStructureState()
+    for structure in _STRUCTURES:
+        state = state.add((structure,))
+
+    rebuilt = PlayerStructureState(_STRUCTURES)
+    assert state == rebuilt
+    assert state.location_mapping == rebuilt.location_mapping
+    assert state.type_counts == rebuilt.type_counts
+    assert state.type_locations == rebuilt.type_locations
+    assert state.add(()) is state
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+from terrabot.sim.bitboard import Bitboard
+from terrabot.sim.data.maps import DEFAULT_MAP
+from terrabot.sim.structure import Structure, StructureType
+from terrabot.sim.town import TownTracker, apply_structures, get_network_size
+
+def _build(towns, board, *structures, power_requirement=7):
+    return apply_structures(towns, board, "player0",
+            tuple(Structure(t, location) for t, location in structures), power_requirement)
+
+def test_TownTracker_add_structure_FormsTownOnce():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",))
+    towns, board, formed = _build(TownTracker(), board,
+            (StructureType.TRADING_POST, "A1"),
+            (StructureType.TRADING_POST, "A2"),
+            (StructureType.TEMPLE, "A3"))
+    assert formed == 0
+    assert towns.get_cluster_power(board.get_hex_id("A1")) == 6
+
+    towns, board, formed = _build(towns, board, (StructureType.DWELLING, "A4"))
+    assert formed == 1
+    assert towns.is_in_town(board.get_hex_id("A1"))
+
+    towns, board, formed = _build(towns, board, (StructureType.STRONGHOLD, "A5"))
+    assert formed == 0
+    assert towns.num_towns == 1
+
+def test_TownTracker_SanctuaryCountsAsTwo():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",))
+    towns, board, formed = _build(TownTracker(), board,
+            (StructureType.SANCTUARY, "A1"),
+            (StructureType.TRADING_POST, "A2"),
+            (StructureType.TRADING_POST, "A3"))
+
+    assert formed == 1
+
+def test_TownTracker_upgrade_structure():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",))
+    towns, board, formed = _build(TownTracker(), board,
+            (StructureType.DWELLING, "A1"),
+            (StructureType.DWELLING, "A2"),
+            (StructureType.TRADING_POST, "A3"),
+            (StructureType.TRADING_POST, "A4"))
+    assert formed == 0
+
+    towns, board, formed = _build(towns, board, (StructureType.TEMPLE, "A3"))
+    assert formed == 0
+    towns, board, formed = _build(towns, board, (StructureType.TRADING_POST, "A1"))
+    assert formed == 1
+
+def test_TownTracker_ReducedPowerRequirement():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",))
+    towns, board, formed = _build(TownTracker(), board,
+            (StructureType.TRADING_POST, "A1"),
+            (StructureType.TRADING_POST, "A2"),
+            (StructureType.DWELLING, "A3"),
+            (StructureType.DWELLING, "A4"),
+            power_requirement=6)
+
+    assert formed == 1
+
+def test_TownTracker_MergesClusters():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",))
+    towns, board, formed = _build(TownTracker(), board,
+            (StructureType.TRADING_POST, "A1"),
+            (StructureType.TRADING_POST, "A2"),
+            (StructureType.TRADING_POST, "A4"),
+            (StructureType.TRADING_POST, "A5"))
+    assert formed == 0
+    assert len(towns.get_clusters()) == 2
+
+    towns, board, formed = _build(towns, board, (StructureType.DWELLING, "A3"))
+    assert formed == 1
+    assert len(towns.get_clusters()) == 1
+
+def test_TownTracker_IsPersistent():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",))
+    before, board, _ = _build(TownTracker(), board, (StructureType.DWELLING, "A1"))
+    after, board, _ = _build(before, board, (StructureType.DWELLING, "A2"))
+
+    assert before.get_clusters() == ((board.get_hex_id("A1"),),)
+    assert len(after.get_clusters()[0]) == 2
+
+def test_TownTracker_with_towns_RestoresTowns():
+    board = Bitboard.create(DEFAULT_MAP, ("player0",))
+    structures = (
+            (StructureType.TRADING_POST, "A1"),
+            (StructureType.TRADING_POST, "A2"),
+            (StructureType.TEMPLE, "A3"),
+            (StructureType.DWELLING, "A4"))
+    towns, _, _ = _build(TownTracker(), board, *structures)
+    untowned, _, _ = _build(TownTracker(), board, *structures, power_requirement=100)
+
+    restored = untowned.with_towns(towns.get_town_hex_ids(), towns.num_towns)
+    assert restored == towns
+    assert not untowned.is_in_town(board.get_hex_id("A1"))
+
+def test_get_network_size_JoinsStructuresByShipping():
+    board = Bitboard.create(DEFAULT_MAP, ("player0", "player1"))
+    for location in ("A1", "A2", "A6", "C3", "C2"):
+        board = board.with_location_structure("player0", StructureType.DWELLING, location)
+
+    # A1-A2 are adjacent, A6-C3 and C3-C2 are one river hex apart
+    assert get_network_size(board, "player0", 0) == 2
+    assert get_network_size(board, "player0", 1) == 3
+    assert get_network_size(board, "player1", 1) == 0
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+import random
+
+import pytest
+
+from terrabot.sim.action import Phase
+from terrabot.sim.data.actions import POWER_ACTION_2, POWER_ACTION_3, POWER_ACTION_4
+from terrabot.sim.game import GameState
+from terrabot.sim.player import PlayerMetadata
+from terrabot.sim.resource import PowerBowlState
+from terrabot.sim.search import SearchState
+from terrabot.sim.zobrist import TranspositionTable, compute_zobrist_key
+
+def _submit_action(game_state: GameState, action) -> GameState:
+    return game_state.submit(next(action.get_available_executions(game_state)))
+
+
+def test_GameState_get_zobrist_key_IsMaintainedIncrementally():
+    random.seed(1)
+    game_state = GameState.create(tuple(PlayerMetadata(f"name{i}") for i in range(3)))
+    game_state.get_zobrist_key()
+    for _ in range(30):
+        executions = game_state.get_available_executions()
+        if not executions:
+            break
+        num_leech = len(game_state.active_player.player_state.leech_opportunities) \
+                if game_state.phase == Phase.TURN else 0
+        game_state = game_state.submit(
+                random.choice(executions), leech_decisions=(False,) * num_leech)
+        assert game_state.zobrist_key == compute_zobrist_key(game_state)
+
+def test_GameState_get_zobrist_key_MatchesTranspositions(create_game_state):
+    initial_state = create_game_state(num_players=2, power=PowerBowlState(0, 0, 12))
+    initial_state.get_zobrist_key()
+
+    first = initial_state
+    for action in (POWER_ACTION_3, POWER_ACTION_4, POWER_ACTION_2):
+        first = _submit_action(first, action)
+    second = initial_state
+    for action in (POWER_ACTION_2, POWER_ACTION_4, POWER_ACTION_3):
+        second = _submit_action(second, action)
+
+    assert first.zobrist_key == second.zobrist_key
+    assert first.zobrist_key != initial_state.zobrist_key
+    assert first.zobrist_key != _submit_action(initial_state, POWER_ACTION_2).zobrist_key
+
+def test_SearchState_unmake_RestoresZobristKey(create_game_state):
+    initial_state = create_game_state(num_players=2, power=PowerBowlState(0, 0, 12))
+    search_state = SearchState(initial_state)
+    execution = next(POWER_ACTION_3.get_available_executions(initial_state))
+
+    mark = search_state.make(execution.compute(initial_state))
+    assert search_state.zobrist_key == compute_zobrist_key(search_state.to_game_state())
+    assert search_state.zobrist_key == initial_state.submit(execution).zobrist_key
+
+    search_state.unmake(mark)
+    assert search_state.zobrist_key == initial_state.zobrist_key
+
+def test_TranspositionTable_lookup_ReturnsStoredEntry():
+    table = TranspositionTable(num_slots=4)
+    table.store(5, "value", depth=2)
+
+    assert table.lookup(5).value == "value"
+    assert table.lookup(5, min_depth=3) is None
+    assert table.lookup(9) is None
+    assert 5 in table
+    assert table.get(9, "default") == "default"
+
+def test_TranspositionTable_store_PrefersDeeperEntries():
+    table = TranspositionTable(num_slots=4)
+    table.store(1, "deep", depth=5)
+    table.store(5, "shallow", depth=1)
+    table.store(9, "newer shallow", depth=1)
+
+    assert table.get(1) == "deep"
+    assert table.get(5) is None
+    assert table.get(9) == "newer shallow"
+    assert len(table) == 2
+
+def test_TranspositionTable_store_ReplacesEntriesFromOlderSearches():
+    table = TranspositionTable(num_slots=4)
+    table.store(1, "old", depth=5)
+    table.new_search()
+    table.store(5, "new", depth=1)
+
+    assert table.lookup(5).depth == 1
+    assert table.get(1) == "old"
+    table.store(9, "newest", depth=0)
+    assert table.get(1) is None
+    assert table.get(5) == "new"
+
+def test_TranspositionTable_init_RequiresPowerOfTwo():
+    with pytest.raises(ValueError):
+        TranspositionTable(num_slots=6)